@@ -3,7 +3,7 @@ from rest_framework.permissions import IsAdminUser, IsAuthenticated, AllowAny
 from rest_framework.request import Request
 from rest_framework.views import APIView
 
-from admin_app.utils import RequestLogUtils
+from admin_app.utils import RequestLogUtils, DatabaseMetricsUtils
 from auth.permissions import IsModerator
 from core.boilerplate.response_template import Resp
 
@@ -17,8 +17,9 @@ class RequestLogsAPI(APIView):
         Get all request Logs by page.
         """
         page = int(request.query_params.get("page", 1))
+        cursor = request.query_params.get("cursor")
 
-        resp = RequestLogUtils.get(page=page)
+        resp = RequestLogUtils.get(page=page, cursor=cursor)
         
         return resp.to_response()
     
@@ -30,12 +31,25 @@ class RequestLogsAPI(APIView):
         method = request.query_params.get("method", "GET")
         term = request.query_params.get("term", None)
         page = int(request.query_params.get("page", 1))
+        cursor = request.query_params.get("cursor")
 
         if term:
-            resp = RequestLogUtils.find_by_text(term=term, page=page)
+            resp = RequestLogUtils.find_by_text(term=term, page=page, cursor=cursor)
 
         else:
-            resp = RequestLogUtils.find_by_path(method=method, path=path, page=page)
+            resp = RequestLogUtils.find_by_path(method=method, path=path, page=page, cursor=cursor)
 
         
-        return resp.to_response()
\ No newline at end of file
+        return resp.to_response()
+
+
+class DatabasePoolMetricsAPI(APIView):
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request:Request, *args, **kwargs):
+        """
+        Get the MongoDB connection pool metrics of the worker serving the request.
+        """
+        resp = DatabaseMetricsUtils.get_pool_metrics()
+
+        return resp.to_response()
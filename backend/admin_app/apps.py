@@ -1,7 +1,17 @@
+from threading import Thread
+
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class AdminAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'admin_app'
     verbose_name = 'Administration App'
+
+    def ready(self) -> None:
+        if settings.MONGO_ENSURE_INDEXES:
+            from database.indexes import IndexBootstrapper
+
+            ## (prithoo): Run in the background so that a slow or unreachable cluster never holds up startup.
+            Thread(target=IndexBootstrapper.ensure, name="mongo-index-bootstrapper", daemon=True).start()
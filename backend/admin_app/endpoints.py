@@ -1,9 +1,10 @@
 from django.urls import path
 
-from admin_app.apis import RequestLogsAPI
+from admin_app.apis import RequestLogsAPI, DatabasePoolMetricsAPI
 
 PREFIX = "api/admin/"
 
 urlpatterns = [
-    path('logs/request/', RequestLogsAPI.as_view(), name='request-logs')
+    path('logs/request/', RequestLogsAPI.as_view(), name='request-logs'),
+    path('metrics/database/', DatabasePoolMetricsAPI.as_view(), name='database-pool-metrics')
 ]
\ No newline at end of file
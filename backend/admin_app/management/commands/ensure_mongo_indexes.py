@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from database.indexes import IndexBootstrapper
+
+
+class Command(BaseCommand):
+    help = "Create and reconcile the MongoDB indexes declared in `database.collections.DatabaseCollections`."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only report what would change.")
+        parser.add_argument('--rebuild', action='store_true', help="Drop and recreate indexes whose keys changed.")
+
+    def handle(self, *args, **options):
+        reports = IndexBootstrapper.ensure(dry_run=options['dry_run'], rebuild=options['rebuild'])
+
+        for collection, report in reports.items():
+            self.stdout.write(f"{collection}")
+            for key, names in report.items():
+                if names:
+                    self.stdout.write(f"    {key}: {', '.join(names)}")
+
+        if options['dry_run']:
+            self.stdout.write("Dry run; nothing was changed.")
@@ -1,8 +1,11 @@
 from rest_framework import status
 
-from core.boilerplate.response_template import Resp
+from core.boilerplate.response_template import Resp, invalid_cursor_resp
+from database.asynchrous import client as async_client
 from database.collections import DatabaseCollections
 from database.methods import SynchronousMethods
+from database.pagination import InvalidCursor
+from database.synchronous import cluster as sync_client
 
 from admin_app import logger
 
@@ -16,23 +19,34 @@ class RequestLogUtils:
         "DELETE"
     )
 
+    SORT_FIELD: str = "timestampUtc"
+
     @classmethod
-    def get(cls, page:int=1)->Resp:
+    def paginate(cls, filter_dict:dict=None, page:int=1, cursor:str=None)->Resp:
         resp = Resp()
-        results = SynchronousMethods.find(collection=DatabaseCollections.request_logs, page=page)
+
+        try:
+            results, next_cursor = SynchronousMethods.paginate(filter_dict=filter_dict, collection=DatabaseCollections.request_logs, sort_field=cls.SORT_FIELD, page=page, cursor=cursor)
+        except InvalidCursor as ex:
+            return invalid_cursor_resp(cursor=cursor, message=f"{ex}")
 
         resp.message = f"{len(results)} results retrieved."
         resp.data = {
             "page": page,
+            "next": next_cursor,
             "results": results
         }
         resp.status_code = status.HTTP_200_OK
 
         logger.info(resp.message)
         return resp
+
+    @classmethod
+    def get(cls, page:int=1, cursor:str=None)->Resp:
+        return cls.paginate(page=page, cursor=cursor)
     
     @classmethod
-    def find_by_path(cls, method:str="get", path:str=None, page:int=1)->Resp:
+    def find_by_path(cls, method:str="get", path:str=None, page:int=1, cursor:str=None)->Resp:
         resp = Resp()
 
         if not path:
@@ -69,20 +83,10 @@ class RequestLogUtils:
             ]
         }
 
-        results = SynchronousMethods.find(filter_dict=filter_dict, collection=DatabaseCollections.request_logs, page=page)
-
-        resp.message = f"{len(results)} results retrieved."
-        resp.data = {
-            "page": page,
-            "results": results
-        }
-        resp.status_code = status.HTTP_200_OK
-
-        logger.info(resp.message)
-        return resp
+        return cls.paginate(filter_dict=filter_dict, page=page, cursor=cursor)
     
     @classmethod
-    def find_by_text(cls, term:str=None, page:int=1)->Resp:
+    def find_by_text(cls, term:str=None, page:int=1, cursor:str=None)->Resp:
         resp = Resp()
 
         if not term:
@@ -100,16 +104,24 @@ class RequestLogUtils:
                 }
             }
         
-        results = SynchronousMethods.find(filter_dict=filter_dict, collection=DatabaseCollections.request_logs, page=page)
+        return cls.paginate(filter_dict=filter_dict, page=page, cursor=cursor)
 
-        resp.message = f"{len(results)} results retrieved."
+
+class DatabaseMetricsUtils:
+
+    @classmethod
+    def get_pool_metrics(cls)->Resp:
+        """
+        Connection pool counters of the MongoDB clients of the current process.
+        """
+        resp = Resp()
+
+        resp.message = "Connection pool metrics retrieved."
         resp.data = {
-            "page": page,
-            "results": results
+            "synchronous": sync_client.metrics.snapshot(),
+            "asynchronous": async_client.metrics.snapshot()
         }
         resp.status_code = status.HTTP_200_OK
 
         logger.info(resp.message)
         return resp
-
-
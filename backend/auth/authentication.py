@@ -7,10 +7,14 @@ from django.utils import timezone
 
 from rest_framework.authentication import BaseAuthentication
 from rest_framework import HTTP_HEADER_ENCODING, exceptions
+from rest_framework_simplejwt.authentication import JWTAuthentication as SimpleJWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
 
 
+from auth.context import AuthContext, UserCache, TokenCache
 from user_app.models import User, UserToken, UserTokenUsage
-from user_app.helpers import UserTokenUsageHelpers
+from user_app.usage import TokenUsageCounter
 from user_app.utils import UserTokenUtils
 
 from auth import logger
@@ -29,6 +33,42 @@ def get_authorization_header(request: HttpRequest):
     return auth
 
 
+class JWTAuthentication(SimpleJWTAuthentication):
+    """
+    JWT authentication that reuses the request's `AuthContext` when one was resolved by the middleware stack and loads
+    users through the per-process `UserCache` otherwise.
+    """
+
+    KEYWORD = 'Bearer'
+
+    def authenticate(self, request: HttpRequest):
+        context = AuthContext.from_request(request)
+        if context is not None:
+            return context.result(self.KEYWORD)
+
+        return self.authenticate_request(request)
+
+    def authenticate_request(self, request: HttpRequest):
+        """
+        Authenticate the header itself, without looking at the request's `AuthContext`; this is what resolves it.
+        """
+        return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('Token contained no recognizable user identification')
+
+        user = UserCache.get(user_id=user_id)
+        if not user:
+            raise exceptions.AuthenticationFailed('User not found', code='user_not_found')
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed('User is inactive', code='user_inactive')
+
+        return user
+
+
 class TokenAuthentication(BaseAuthentication):
     """
     Encrypted token-based authentication
@@ -44,6 +84,16 @@ class TokenAuthentication(BaseAuthentication):
         return Token
 
     def authenticate(self, request: HttpRequest):
+        context = AuthContext.from_request(request)
+        if context is not None:
+            return context.result(self.KEYWORD)
+
+        return self.authenticate_request(request)
+
+    def authenticate_request(self, request: HttpRequest):
+        """
+        Authenticate the header itself, without looking at the request's `AuthContext`; this is what resolves it.
+        """
         auth = get_authorization_header(request).split()
         if not auth or auth[0].lower() != self.KEYWORD.lower().encode():
             return None
@@ -72,18 +122,49 @@ class TokenAuthentication(BaseAuthentication):
             raise exceptions.AuthenticationFailed('User ID not found.')
 
         NOW: datetime = timezone.now()
+        hashed = UserTokenUtils.hash_token(token_part)
+
+        token_obj = TokenCache.get(hashed=hashed)
+        if not token_obj:
+            token_obj = model.objects.filter(
+                Q(user__id=user_id)
+                & Q(token=hashed)
+                & Q(expires_at__gte=NOW)
+            ).select_related('user').first()
+
+            if not token_obj:
+                token_obj = self.authenticate_legacy_credentials(user_id=user_id, token_part=token_part, hashed=hashed)
+
+            if not token_obj:
+                logger.error('Token object not found or is expired.')
+                raise exceptions.AuthenticationFailed('Token does not exist or is expired.')
+
+            TokenCache.set(hashed=hashed, token=token_obj)
+
+        if f"{token_obj.user_id}" != f"{user_id}":
+            raise exceptions.AuthenticationFailed('Token does not exist or is expired.')
+
+        TokenUsageCounter.hit(token_id=token_obj.id)
+        return token_obj.user, token_obj
+
+    def authenticate_legacy_credentials(self, user_id: str = None, token_part: str = None, hashed: str = None):
+        """
+        Verify `token_part` against the tokens of the user still stored as password hashes and, on a match, replace the
+        stored hash with the HMAC digest so that the next request takes the indexed lookup above.
+        """
+        model = self.get_model()
         user_tokens = model.objects.filter(
             Q(user__id=user_id)
-            & Q(expires_at__gte=NOW)
+            & Q(expires_at__gte=timezone.now())
+            & ~Q(token__startswith=UserTokenUtils.HMAC_PREFIX)
         ).select_related('user')
-        if not user_tokens:
-            logger.error('Token object not found or is expired.')
-            raise exceptions.AuthenticationFailed('Token object not found or is expired.')
 
         for token_obj in user_tokens:
             if check_password(token_part, token_obj.token):
-                UserTokenUsageHelpers.create(data = {"token": f"{token_obj.id}", "created": NOW})
-                return token_obj.user, token_obj
+                ## (prithoo): `.update()` so that re-hashing does not fire the `UserToken` signals or bump `updated`.
+                model.objects.filter(pk=token_obj.pk).update(token=hashed)
+                token_obj.token = hashed
+                logger.info(f"Token '{token_obj.alias}' of user '{user_id}' migrated to a HMAC digest.")
+                return token_obj
 
-        raise exceptions.AuthenticationFailed(
-            'Token does not exist or is expired.')
+        return None
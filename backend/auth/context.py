@@ -0,0 +1,157 @@
+from collections import OrderedDict
+from copy import copy
+from threading import Lock
+from time import monotonic
+
+from django.conf import settings
+from django.http import HttpRequest
+from django.utils import timezone
+
+from user_app.models import User, UserToken
+
+from auth import logger
+
+
+class AuthContext:
+    """
+    Outcome of authenticating the `Authorization` header of a single request.
+
+    It is resolved once (see `auth.resolver.RequestAuthResolver`), attached to the request and then consumed by the
+    custom middlewares and the DRF authentication classes, so that no one decodes the same header twice.
+    """
+    ATTRIBUTE: str = "auth_context"
+
+    def __init__(self, scheme: str = None, user: User = None, auth=None, error: Exception = None):
+        self.scheme = scheme
+        self.user = user
+        self.auth = auth
+        self.error = error
+
+    def __repr__(self):
+        return f"AuthContext(scheme={self.scheme}, user={self.user}, error={self.error})"
+
+    @classmethod
+    def from_request(cls, request: HttpRequest):
+        return getattr(request, cls.ATTRIBUTE, None)
+
+    def attach(self, request: HttpRequest) -> None:
+        setattr(request, self.ATTRIBUTE, self)
+
+    def result(self, scheme: str):
+        """
+        Return what a DRF authentication class handling `scheme` should return for this request:
+        `None` if the header was meant for another scheme, `(user, auth)` on success; the original error is re-raised.
+        """
+        if self.scheme != scheme:
+            return None
+
+        if self.error:
+            raise self.error
+
+        if not self.user:
+            return None
+
+        return self.user, self.auth
+
+
+class UserCache:
+    """
+    Bounded, short-lived, per-process cache of users loaded during authentication.
+
+    Entries are evicted by the `User` signals of this process; other processes pick changes up once `TTL` expires.
+    Callers get a copy of the cached instance so that concurrent requests never share a mutable model object.
+    """
+    MAX_SIZE: int = settings.AUTH_USER_CACHE_SIZE
+    TTL: int = settings.AUTH_USER_CACHE_TTL
+
+    _users: OrderedDict = OrderedDict()
+    _lock: Lock = Lock()
+
+    @classmethod
+    def get(cls, user_id: str = None) -> User:
+        if not user_id:
+            return None
+
+        key = f"{user_id}"
+        with cls._lock:
+            cached = cls._users.get(key)
+            if cached and cached[0] >= monotonic():
+                cls._users.move_to_end(key)
+                return copy(cached[1])
+
+        try:
+            user = User.objects.filter(pk=key).first()
+        except Exception as ex:
+            logger.warn(f"{ex}")
+            return None
+
+        if not user:
+            return None
+
+        with cls._lock:
+            cls._users[key] = (monotonic() + cls.TTL, user)
+            cls._users.move_to_end(key)
+            while len(cls._users) > cls.MAX_SIZE:
+                cls._users.popitem(last=False)
+
+        return copy(user)
+
+    @classmethod
+    def evict(cls, user_id: str = None) -> None:
+        with cls._lock:
+            cls._users.pop(f"{user_id}", None)
+
+
+class TokenCache:
+    """
+    Bounded, short-lived, per-process cache of verified permanent tokens, keyed by their stored digest.
+
+    A hit skips the database entirely; the user is resolved through `UserCache` so that a change to the user is picked up
+    the same way it is for JWTs. Entries never outlive the token itself and are evicted by the `UserToken` signals.
+    """
+    MAX_SIZE: int = settings.AUTH_TOKEN_CACHE_SIZE
+    TTL: int = settings.AUTH_TOKEN_CACHE_TTL
+
+    _tokens: OrderedDict = OrderedDict()
+    _lock: Lock = Lock()
+
+    @classmethod
+    def get(cls, hashed: str = None) -> UserToken:
+        if not hashed:
+            return None
+
+        with cls._lock:
+            cached = cls._tokens.get(hashed)
+            if not cached or cached[0] < monotonic():
+                return None
+            cls._tokens.move_to_end(hashed)
+            token = copy(cached[1])
+
+        user = UserCache.get(user_id=token.user_id)
+        if not user:
+            return None
+
+        token.user = user
+        return token
+
+    @classmethod
+    def set(cls, hashed: str = None, token: UserToken = None) -> None:
+        if not hashed or not token:
+            return
+
+        ttl = cls.TTL
+        if token.expires_at:
+            ttl = min(ttl, (token.expires_at - timezone.now()).total_seconds())
+        if ttl <= 0:
+            return
+
+        with cls._lock:
+            cls._tokens[hashed] = (monotonic() + ttl, token)
+            cls._tokens.move_to_end(hashed)
+            while len(cls._tokens) > cls.MAX_SIZE:
+                cls._tokens.popitem(last=False)
+
+    @classmethod
+    def evict(cls, hashed: str = None) -> None:
+        with cls._lock:
+            cls._tokens.pop(hashed, None)
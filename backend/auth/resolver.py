@@ -0,0 +1,71 @@
+from django.http import HttpRequest
+from django.utils.functional import SimpleLazyObject
+
+from rest_framework import exceptions
+
+from auth.authentication import JWTAuthentication, TokenAuthentication, get_authorization_header
+from auth.context import AuthContext
+
+from auth import logger
+
+
+class RequestAuthResolver:
+    """
+    Authenticate the `Authorization` header of a request exactly once and attach the outcome to the request.
+    """
+    AUTHENTICATORS = (JWTAuthentication, TokenAuthentication)
+
+    @classmethod
+    def get_scheme(cls, request: HttpRequest) -> str:
+        header = get_authorization_header(request).split()
+        if not header:
+            return None
+
+        try:
+            return header[0].decode()
+        except UnicodeError:
+            return None
+
+    @classmethod
+    def resolve(cls, request: HttpRequest) -> AuthContext:
+        context = AuthContext.from_request(request)
+        if context is not None:
+            return context
+
+        context = cls.authenticate(request=request)
+        context.attach(request=request)
+        return context
+
+    @classmethod
+    def resolve_lazily(cls, request: HttpRequest) -> None:
+        """
+        Attach a context that only authenticates the header when something reads it, e.g. a DRF view reading
+        `request.user`; views that never look at the user cost nothing.
+        """
+        if AuthContext.from_request(request) is not None:
+            return
+
+        setattr(request, AuthContext.ATTRIBUTE, SimpleLazyObject(lambda: cls.authenticate(request=request)))
+
+    @classmethod
+    def authenticate(cls, request: HttpRequest) -> AuthContext:
+        context = AuthContext(scheme=cls.get_scheme(request=request))
+
+        for authenticator_class in cls.AUTHENTICATORS:
+            if not context.scheme or context.scheme.lower() != authenticator_class.KEYWORD.lower():
+                continue
+
+            context.scheme = authenticator_class.KEYWORD
+            try:
+                result = authenticator_class().authenticate_request(request)
+                if result:
+                    context.user, context.auth = result
+            except exceptions.AuthenticationFailed as ex:
+                logger.info(f"{ex}")
+                context.error = ex
+            except Exception as ex:
+                #(prithoo): An outage (database, Redis) must not turn every request into a 500; the request goes on anonymous.
+                logger.warn(f"Could not authenticate the '{context.scheme}' header: {ex}")
+            break
+
+        return context
@@ -54,3 +54,17 @@ class Resp:
             detail=self.to_text(),
             code=self.error
         )
+
+
+def invalid_cursor_resp(cursor: str = None, message: str = None) -> Resp:
+    """
+    The 400 every cursor-paginated endpoint answers a cursor it cannot decode with.
+    """
+    resp = Resp()
+    resp.error = "Invalid Cursor"
+    resp.message = message or f"Invalid cursor '{cursor}'."
+    resp.data = {"cursor": cursor}
+    resp.status_code = status.HTTP_400_BAD_REQUEST
+
+    logger.warn(resp.to_text())
+    return resp
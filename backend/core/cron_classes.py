@@ -6,9 +6,13 @@ MIDDLEWARE_APP_CRON = [
     'middleware_app.cron.DeleteOldUserIPAddresses',
     'middleware_app.cron.DeleteOldUserMACAdresses',
 ]
+POST_APP_CRON = [
+    'post_app.cron.DrainPostOutbox',
+]
 USER_APP_CRON = [
     'user_app.cron.DeleteInactiveUsers',
     'user_app.cron.DeleteAbandonedUsers',
     'user_app.cron.DeleteExpiredLoginOTPs',
-    'user_app.cron.DeleteExpiredUserLoginTokens'
+    'user_app.cron.DeleteExpiredUserLoginTokens',
+    'user_app.cron.FlushTokenUsage'
 ]
\ No newline at end of file
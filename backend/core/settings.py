@@ -4,7 +4,7 @@ import redis
 from os import path, makedirs, environ
 
 from core.apps import DEFAULT_APPS, THIRD_PARTY_APPS, CUSTOM_APPS
-from core.cron_classes import JOB_HANDLER_APP_CRON, MIDDLEWARE_APP_CRON, USER_APP_CRON
+from core.cron_classes import JOB_HANDLER_APP_CRON, MIDDLEWARE_APP_CRON, POST_APP_CRON, USER_APP_CRON
 from core.middleware import DEFAULT_MIDDLEWARE, THIRD_PARTY_MIDDLEWARE, CUSTOM_MIDDLEWARE
 from core.rq_constants import JobQ
 
@@ -75,6 +75,19 @@ MONGO_HOST = environ.get("MONGO_HOST")
 MONGO_PORT = int(environ.get("MONGO_PORT", 27017))
 MONGO_USER = environ.get("MONGO_USER", None)
 MONGO_PASSWORD = environ.get("MONGO_PASSWORD", None)
+## MongoDB client/pool settings; clients are only built on first use, once per process (see `database.clients`).
+MONGO_MAX_POOL_SIZE = int(environ.get("MONGO_MAX_POOL_SIZE", 100))
+MONGO_MIN_POOL_SIZE = int(environ.get("MONGO_MIN_POOL_SIZE", 0))
+MONGO_MAX_IDLE_TIME_MS = int(environ.get("MONGO_MAX_IDLE_TIME_MS", 60_000))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(environ.get("MONGO_WAIT_QUEUE_TIMEOUT_MS", 5_000))
+MONGO_CONNECT_TIMEOUT_MS = int(environ.get("MONGO_CONNECT_TIMEOUT_MS", 5_000))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5_000))
+MONGO_SOCKET_TIMEOUT_MS = int(environ.get("MONGO_SOCKET_TIMEOUT_MS", 30_000))
+MONGO_READ_PREFERENCE = environ.get("MONGO_READ_PREFERENCE", "primary")
+MONGO_WRITE_CONCERN = environ.get("MONGO_WRITE_CONCERN", "1")
+## Reconcile the declared MongoDB indexes in the background whenever Django starts (see `admin_app.apps`); off by default,
+## as every process would do it: deploys run `manage.py ensure_mongo_indexes` instead (see `scripts/migrations.sh`).
+MONGO_ENSURE_INDEXES = eval(environ.get("MONGO_ENSURE_INDEXES", "False"))
 
 USE_REDIS = eval(environ.get("USE_REDIS", "True"))
 if USE_REDIS:
@@ -92,7 +105,7 @@ if USE_REDIS:
 
 CRON_ENABLED = eval(environ.get("CRON_ENABLED", "True"))
 if CRON_ENABLED:
-    CRON_CLASSES = JOB_HANDLER_APP_CRON + MIDDLEWARE_APP_CRON + USER_APP_CRON
+    CRON_CLASSES = JOB_HANDLER_APP_CRON + MIDDLEWARE_APP_CRON + POST_APP_CRON + USER_APP_CRON
 
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -112,7 +125,7 @@ AUTH_PASSWORD_VALIDATORS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'auth.authentication.JWTAuthentication',
     )
 }
 
@@ -177,19 +190,53 @@ LOGGING = {
     },
 }
 
+#(prithoo): Buffered request logging used by the `RequestLogger` middleware; records are flushed by a background thread
+#           whenever a batch fills up or the interval elapses, the oldest records are dropped once the buffer is full.
+REQUEST_LOG_BUFFER_SIZE = int(environ.get("REQUEST_LOG_BUFFER_SIZE", 10_000))
+REQUEST_LOG_BATCH_SIZE = int(environ.get("REQUEST_LOG_BATCH_SIZE", 500))
+REQUEST_LOG_FLUSH_INTERVAL = float(environ.get("REQUEST_LOG_FLUSH_INTERVAL", 2.0))
+REQUEST_LOG_RETENTION_DAYS = int(environ.get("REQUEST_LOG_RETENTION_DAYS", 30))
+
+#(prithoo): Pages of the latest posts feed cached in Redis, see `post_app.feeds.LatestPostsFeed`.
+POST_FEED_CACHED_PAGES = int(environ.get("POST_FEED_CACHED_PAGES", 5))
+POST_FEED_CACHE_TTL = int(environ.get("POST_FEED_CACHE_TTL", 300))
+#(prithoo): Per-process cache of tag IDs by name, see `post_app.caches.TagCache`.
+TAG_CACHE_SIZE = int(environ.get("TAG_CACHE_SIZE", 10_000))
+TAG_CACHE_TTL = int(environ.get("TAG_CACHE_TTL", 600))
+#(prithoo): Posts written to MongoDB per `bulk_write` when draining the outbox, see `post_app.outbox.PostOutboxUtils`.
+POST_OUTBOX_BATCH_SIZE = int(environ.get("POST_OUTBOX_BATCH_SIZE", 500))
+POST_OUTBOX_MAX_ATTEMPTS = int(environ.get("POST_OUTBOX_MAX_ATTEMPTS", 5))
+
 IP_HEADER = environ.get("IP_HEADER", "ip")
 MAC_HEADER = environ.get("MAC_HEADER", "mac")
 
+#(prithoo): Known IP/MAC verdict cache used by the `IpAddressChecker` middleware; the local tier lives in each worker process
+#           and is kept short-lived as it cannot be invalidated from other processes, Redis holds the shared tier.
+KNOWN_ADDRESS_LOCAL_CACHE_SIZE = int(environ.get("KNOWN_ADDRESS_LOCAL_CACHE_SIZE", 10_000))
+KNOWN_ADDRESS_LOCAL_CACHE_TTL = int(environ.get("KNOWN_ADDRESS_LOCAL_CACHE_TTL", 60))
+KNOWN_ADDRESS_REDIS_CACHE_TTL = int(environ.get("KNOWN_ADDRESS_REDIS_CACHE_TTL", 3_600))
+
 LANGUAGE_CODE = environ.get("LANGUAGE_CODE", "en-us")
 TIME_ZONE = environ.get("TIME_ZONE", "utc")
 USE_I18N = eval(environ.get("USE_I18N", "True"))
 USE_TZ = eval(environ.get("USE_TZ", "True"))
 
+#(prithoo): Per-process cache of users loaded while authenticating a request, see `auth.context.UserCache`.
+AUTH_USER_CACHE_SIZE = int(environ.get('AUTH_USER_CACHE_SIZE', 1_000))
+AUTH_USER_CACHE_TTL = int(environ.get('AUTH_USER_CACHE_TTL', 30))
+
 #(prithoo): Salt sizes used in determining the user part in the permanent token;
 #           Looked cleaner when decalred in the `conf` module of the project.
 SALT_01_SIZE = int(environ.get('SALT_01_SIZE', 4))
 SALT_02_SIZE = int(environ.get('SALT_02_SIZE', 6))
 
+#(prithoo): Key of the HMAC-SHA256 digest stored for permanent tokens, see `user_app.utils.UserTokenUtils.hash_token`;
+#           rotating it invalidates every token issued under the old key.
+USER_TOKEN_HMAC_KEY = environ.get('USER_TOKEN_HMAC_KEY', SECRET_KEY)
+#(prithoo): Per-process cache of verified permanent tokens, see `auth.context.TokenCache`.
+AUTH_TOKEN_CACHE_SIZE = int(environ.get('AUTH_TOKEN_CACHE_SIZE', 1_000))
+AUTH_TOKEN_CACHE_TTL = int(environ.get('AUTH_TOKEN_CACHE_TTL', 60))
+
 STATIC_URL = '/static/'
 STATIC_ROOT = 'static'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -207,6 +254,15 @@ EMAIL_USE_SSL = eval(environ.get('EMAIL_USE_SSL', 'False'))
 
 OTP_ATTEMPT_LIMIT = int(environ.get('OTP_ATTEMPT_LIMIT', 10000))
 OTP_ATTEMPT_TIMEOUT = int(environ.get('OTP_ATTEMPT_TIMEOUT', 0))
+#(prithoo): Count failed logins in Redis instead of the `User` row, see `user_app.utils.LoginAttemptUtils`;
+#           a streak of failures older than `LOGIN_ATTEMPT_WINDOW` seconds is forgotten.
+LOGIN_ATTEMPTS_IN_REDIS = USE_REDIS and eval(environ.get('LOGIN_ATTEMPTS_IN_REDIS', 'False'))
+LOGIN_ATTEMPT_WINDOW = int(environ.get('LOGIN_ATTEMPT_WINDOW', 900))
+
+#(prithoo): Login OTPs and password reset tokens, see `user_app.stores.ShortLivedSecretStore`.
+SHORT_SECRET_PEPPER = environ.get('SHORT_SECRET_PEPPER', SECRET_KEY)
+SHORT_SECRET_MAX_ATTEMPTS = int(environ.get('SHORT_SECRET_MAX_ATTEMPTS', 5))
+SHORT_SECRETS_IN_REDIS = USE_REDIS and eval(environ.get('SHORT_SECRETS_IN_REDIS', 'False'))
 
 AWS_ACCESS_KEY_ID = environ.get("AWS_ACCESS_KEY_ID")
 AWS_SECRET_ACCESS_KEY = environ.get("AWS_SECRET_ACCESS_KEY")
@@ -1,6 +1,6 @@
 import motor.motor_asyncio
 
-from core.settings import MONGO_HOST, MONGO_NAME, MONGO_PASSWORD, MONGO_PORT, MONGO_URI, MONGO_USER
+from database.clients import LazyClient, LazyDatabase
 
-client = motor.motor_asyncio.AsyncIOMotorClient(MONGO_URI)
-as_db = client[MONGO_NAME]
\ No newline at end of file
+client = LazyClient(motor.motor_asyncio.AsyncIOMotorClient)
+as_db = LazyDatabase(client)
@@ -0,0 +1,167 @@
+from os import getpid
+from threading import Lock, local
+from time import monotonic
+
+from pymongo import monitoring
+
+from core.settings import MONGO_URI, MONGO_NAME, MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, MONGO_MAX_IDLE_TIME_MS, \
+    MONGO_WAIT_QUEUE_TIMEOUT_MS, MONGO_CONNECT_TIMEOUT_MS, MONGO_SERVER_SELECTION_TIMEOUT_MS, MONGO_SOCKET_TIMEOUT_MS, \
+    MONGO_READ_PREFERENCE, MONGO_WRITE_CONCERN
+
+from database import logger
+
+
+def client_options() -> dict:
+    """
+    Keyword arguments shared by every MongoDB client the project builds.
+    """
+    return {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": MONGO_MAX_IDLE_TIME_MS,
+        "waitQueueTimeoutMS": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "socketTimeoutMS": MONGO_SOCKET_TIMEOUT_MS,
+        "readPreference": MONGO_READ_PREFERENCE,
+        "w": int(MONGO_WRITE_CONCERN) if MONGO_WRITE_CONCERN.isdigit() else MONGO_WRITE_CONCERN,
+    }
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """
+    Connection pool listener keeping running counters for one client; read them with `snapshot()`.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._local = local()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.open = 0
+            self.checked_out = 0
+            self.checkouts = 0
+            self.checkout_failures = 0
+            self.total_wait = 0.0
+            self.max_wait = 0.0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "open": self.open,
+                "checkedOut": self.checked_out,
+                "checkouts": self.checkouts,
+                "checkoutFailures": self.checkout_failures,
+                "avgWaitMs": round((self.total_wait / self.checkouts) * 1000, 3) if self.checkouts else 0.0,
+                "maxWaitMs": round(self.max_wait * 1000, 3),
+            }
+
+    def _waited(self) -> float:
+        started = getattr(self._local, "started", None)
+        self._local.started = None
+        return monotonic() - started if started else 0.0
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open -= 1
+
+    def connection_check_out_started(self, event):
+        self._local.started = monotonic()
+
+    def connection_check_out_failed(self, event):
+        waited = self._waited()
+        with self._lock:
+            self.checkout_failures += 1
+            self.total_wait += waited
+
+    def connection_checked_out(self, event):
+        waited = self._waited()
+        with self._lock:
+            self.checked_out += 1
+            self.checkouts += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+
+class LazyClient:
+    """
+    Build a MongoDB client on first use instead of at import time, and build a fresh one after a fork.
+
+    Pymongo (and thus Motor) clients are not fork-safe: a client created in a gunicorn/rq master and inherited by its
+    workers would share sockets between processes. Tracking the pid means every process gets its own pool, and a process
+    that never touches MongoDB never opens a connection or pays for the handshake.
+    """
+
+    def __init__(self, client_class, uri: str = MONGO_URI, name: str = MONGO_NAME):
+        self.client_class = client_class
+        self.uri = uri
+        self.name = name
+        self.metrics = PoolMetrics()
+
+        self._client = None
+        self._pid: int = None
+        self._lock = Lock()
+
+    def __repr__(self):
+        return f"LazyClient({self.client_class.__name__}, connected={self._client is not None and self._pid == getpid()})"
+
+    def get_client(self):
+        if self._client is not None and self._pid == getpid():
+            return self._client
+
+        with self._lock:
+            if self._client is None or self._pid != getpid():
+                if self._client is not None:
+                    logger.info(f"Process forked; building a new {self.client_class.__name__} for pid {getpid()}.")
+                    self.metrics.reset()
+                self._client = self.client_class(self.uri, event_listeners=[self.metrics], **client_options())
+                self._pid = getpid()
+
+        return self._client
+
+    def get_db(self):
+        return self.get_client()[self.name]
+
+
+class LazyDatabase:
+    """
+    Stand-in for a `Database` object that resolves the real one from its `LazyClient` on every access,
+    so `db[collection]` and `db.command(...)` keep working unchanged.
+    """
+
+    def __init__(self, client: LazyClient):
+        self.client = client
+
+    def __repr__(self):
+        return f"LazyDatabase({self.client.name})"
+
+    def __getitem__(self, collection: str):
+        return self.client.get_db()[collection]
+
+    def __getattr__(self, attribute: str):
+        return getattr(self.client.get_db(), attribute)
@@ -1,3 +1,10 @@
+from datetime import timedelta
+
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+
+from core.settings import REQUEST_LOG_RETENTION_DAYS
+
+
 class DatabaseCollections:
     request_logs = "requestLogs"
     raw_request_logs = "rawRequestLogs"
@@ -9,4 +16,65 @@ class DatabaseCollections:
     user_white_listed_ips = "userWhitelistedIps"
 
     user_posts = "userPosts"
-    content_tags = "contentTags"
\ No newline at end of file
+    content_tags = "contentTags"
+
+    ## (prithoo): Collections that MongoDB should expire by itself, as `collection: (date field, retention period)`.
+    ##            The field MUST hold a BSON date (i.e. a `datetime`) for the TTL monitor to pick the document up.
+    TTL_INDEXES = {
+        user_ips: ("timestampUtc", timedelta(days=90)),
+        user_mac_addresses: ("timestampUtc", timedelta(days=90)),
+        request_logs: ("timestampUtc", timedelta(days=REQUEST_LOG_RETENTION_DAYS)),
+    }
+
+    ## (prithoo): Indexes the queries in the codebase rely on, reconciled by `database.indexes.IndexBootstrapper`.
+    ##            Every index MUST be named, that is how existing indexes are matched against these declarations.
+    ##            The TTL indexes above are added to these by the bootstrapper.
+    INDEXES = {
+        user_ips: [
+            IndexModel([("user", ASCENDING), ("ip", ASCENDING)], name="user_ip"),
+        ],
+        user_mac_addresses: [
+            IndexModel([("user", ASCENDING), ("mac", ASCENDING)], name="user_mac"),
+        ],
+        user_white_listed_ips: [
+            IndexModel([("user", ASCENDING), ("ip", ASCENDING)], name="user_ip"),
+        ],
+        user_posts: [
+            IndexModel([("created", DESCENDING), ("_id", DESCENDING)], name="created_id"),
+            IndexModel([("tags", ASCENDING)], name="tags"),
+            IndexModel([("author.email", ASCENDING)], name="author_email"),
+            IndexModel([("author._id", ASCENDING)], name="author_id"),
+            IndexModel(
+                [("title", TEXT), ("blurb", TEXT), ("author.username", TEXT), ("tags", TEXT)],
+                weights={"title": 10, "tags": 5, "author.username": 3, "blurb": 1},
+                name="post_text"
+            ),
+        ],
+        request_logs: [
+            IndexModel([("timestampUtc", DESCENDING), ("_id", DESCENDING)], name="timestampUtc_id"),
+            IndexModel([("method", ASCENDING), ("timestampUtc", DESCENDING)], name="method_timestampUtc"),
+            IndexModel(
+                [("path", TEXT), ("user.username", TEXT), ("user.email", TEXT)],
+                name="request_text"
+            ),
+        ],
+    }
+
+    @classmethod
+    def ttl_index(cls, collection: str = None) -> IndexModel:
+        if collection not in cls.TTL_INDEXES:
+            return None
+
+        field, retention = cls.TTL_INDEXES.get(collection)
+        return IndexModel([(field, ASCENDING)], name=f"{field}_ttl", expireAfterSeconds=int(retention.total_seconds()))
+
+    @classmethod
+    def index_models(cls, collection: str = None) -> list:
+        """
+        Every index declared for the collection, TTL index included.
+        """
+        models = list(cls.INDEXES.get(collection, []))
+        ttl = cls.ttl_index(collection=collection)
+        if ttl:
+            models.append(ttl)
+        return models
@@ -0,0 +1,125 @@
+from typing import Dict, List
+
+from pymongo import TEXT
+from pymongo.errors import OperationFailure
+
+from database.collections import DatabaseCollections
+from database.methods import SynchronousMethods
+
+from database import logger
+
+
+class IndexBootstrapper:
+    """
+    Create and reconcile the indexes declared in `DatabaseCollections.INDEXES` (and `TTL_INDEXES`), idempotently.
+
+    Declared indexes are matched to existing ones by name:
+        - missing indexes are created,
+        - TTL indexes whose retention changed are updated in place via `collMod`,
+        - indexes whose keys changed are reported as `conflicting` and only rebuilt when asked to,
+        - indexes that exist but are not declared are reported as `unknown`,
+        - indexes that have not served a single operation since the server started are reported as `unused`.
+    """
+    ID_INDEX: str = "_id_"
+
+    @classmethod
+    def get_db(cls):
+        return SynchronousMethods.db
+
+    @classmethod
+    def collections(cls) -> List[str]:
+        return sorted(set(DatabaseCollections.INDEXES.keys()) | set(DatabaseCollections.TTL_INDEXES.keys()))
+
+    @classmethod
+    def same_keys(cls, current: dict = None, spec: dict = None) -> bool:
+        declared = list(spec.get("key").items())
+        text_fields = {field for field, kind in declared if kind == TEXT}
+
+        ## (prithoo): MongoDB stores text indexes as `_fts`/`_ftsx` keys with the indexed fields as `weights`.
+        if text_fields:
+            return set(current.get("weights", {}).keys()) == text_fields
+
+        return [(field, int(kind) if isinstance(kind, float) else kind) for field, kind in current.get("key")] == declared
+
+    @classmethod
+    def get_unused(cls, collection: str = None) -> List[str]:
+        try:
+            stats = cls.get_db()[collection].aggregate([{"$indexStats": {}}])
+            return sorted(
+                item.get("name") for item in stats
+                if item.get("name") != cls.ID_INDEX and not item.get("accesses", {}).get("ops")
+            )
+        except OperationFailure as ex:
+            logger.info(f"Could not read index statistics of '{collection}': {ex}")
+            return []
+
+    @classmethod
+    def reconcile(cls, collection: str = None, dry_run: bool = False, rebuild: bool = False) -> Dict[str, List[str]]:
+        db = cls.get_db()
+        report = {
+            "created": [],
+            "updated": [],
+            "conflicting": [],
+            "unknown": [],
+            "unused": []
+        }
+
+        existing = db[collection].index_information()
+        declared = DatabaseCollections.index_models(collection=collection)
+        declared_names = set()
+
+        for model in declared:
+            spec = model.document
+            name = spec.get("name")
+            declared_names.add(name)
+            current = existing.get(name)
+
+            if not current:
+                if not dry_run:
+                    db[collection].create_indexes([model])
+                report["created"].append(name)
+                continue
+
+            if not cls.same_keys(current=current, spec=spec):
+                if rebuild and not dry_run:
+                    db[collection].drop_index(name)
+                    db[collection].create_indexes([model])
+                report["conflicting"].append(name)
+                continue
+
+            if current.get("expireAfterSeconds") != spec.get("expireAfterSeconds"):
+                if not dry_run:
+                    db.command(
+                        {
+                            "collMod": collection,
+                            "index": {
+                                "name": name,
+                                "expireAfterSeconds": spec.get("expireAfterSeconds")
+                            }
+                        }
+                    )
+                report["updated"].append(name)
+
+        report["unknown"] = sorted(name for name in existing.keys() if name != cls.ID_INDEX and name not in declared_names)
+        report["unused"] = cls.get_unused(collection=collection)
+
+        return report
+
+    @classmethod
+    def ensure(cls, dry_run: bool = False, rebuild: bool = False) -> Dict[str, Dict[str, List[str]]]:
+        """
+        Reconcile the indexes of every collection that declares any; returns the report per collection.
+        """
+        reports = {}
+        for collection in cls.collections():
+            try:
+                reports[collection] = cls.reconcile(collection=collection, dry_run=dry_run, rebuild=rebuild)
+            except Exception as ex:
+                logger.warn(f"Could not reconcile the indexes of '{collection}': {ex}")
+                continue
+
+            changes = {key: value for key, value in reports[collection].items() if value}
+            if changes:
+                logger.info(f"Indexes of '{collection}': {changes}")
+
+        return reports
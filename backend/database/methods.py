@@ -1,8 +1,11 @@
 import pymongo
+import pymongo.errors
+from time import sleep
 from uuid import uuid4
 
 from core.settings import MAX_ITEMS_PER_PAGE
 from database.asynchrous import as_db
+from database.pagination import CursorPagination
 from database.synchronous import s_db
 
 from database import logger
@@ -33,14 +36,65 @@ class AsynchronousMethods:
         return new
 
     @classmethod
-    async def find(cls, filter_dict: dict = None, collection: str = None, page: int = 1) -> list:
+    async def insert(cls, data: dict = None, collection: str = None) -> dict:
+        """
+        Insert a document in a single round-trip.
+        Relies on the unique `_id` index instead of checking for the `_id` beforehand and returns the document as it
+        was built locally instead of reading it back; returns an empty dict if the `_id` already exists.
+        """
+        if not data.get("_id"):
+            data["_id"] = f"{uuid4()}".replace("-", "").upper()
+
+        try:
+            _ = await cls.db[collection].insert_one(data)
+        except pymongo.errors.DuplicateKeyError:
+            logger.warn(f"_id '{data.get('_id')}' already exists.")
+            return {}
+
+        return data
+
+    @classmethod
+    async def insert_many(cls, data: list = None, collection: str = None) -> dict:
+        """
+        Insert a batch of documents in a single unordered round-trip; a failing document does not stop the rest.
+        Returns the `_id`s that were inserted and the errors of the ones that were not.
+        """
+        if not data:
+            return {"inserted": [], "errors": []}
+
+        for item in data:
+            if not item.get("_id"):
+                item["_id"] = f"{uuid4()}".replace("-", "").upper()
+
+        try:
+            _ = await cls.db[collection].insert_many(data, ordered=False)
+        except pymongo.errors.BulkWriteError as ex:
+            return SynchronousMethods.bulk_insert_report(data=data, error=ex, collection=collection)
+
+        return {"inserted": [item["_id"] for item in data], "errors": []}
+
+    @classmethod
+    async def find(cls, filter_dict: dict = None, collection: str = None, page: int = 1, projection: dict = None) -> list:
         if not filter_dict:
-            results = await cls.db[collection].find().skip((page-1)*MAX_ITEMS_PER_PAGE).limit(MAX_ITEMS_PER_PAGE)
+            results = await cls.db[collection].find({}, projection).skip((page-1)*MAX_ITEMS_PER_PAGE).limit(MAX_ITEMS_PER_PAGE)
         else:
-            results = await cls.db[collection].find(filter_dict).skip((page-1)*MAX_ITEMS_PER_PAGE).limit(MAX_ITEMS_PER_PAGE)
+            results = await cls.db[collection].find(filter_dict, projection).skip((page-1)*MAX_ITEMS_PER_PAGE).limit(MAX_ITEMS_PER_PAGE)
 
         return list(results)
 
+    @classmethod
+    async def find_by_cursor(cls, filter_dict: dict = None, collection: str = None, sort_field: str = "_id", cursor: str = None, limit: int = MAX_ITEMS_PER_PAGE, projection: dict = None) -> tuple:
+        """
+        Keyset-paginated find, ordered by `(sort_field, _id)` descending.
+        Returns the page and the cursor of the next page (`None` on the last page).
+        """
+        query = CursorPagination.build_filter(filter_dict=filter_dict, sort_field=sort_field, cursor=cursor)
+        projection = CursorPagination.projection(projection=projection, sort_field=sort_field)
+        results = await cls.db[collection].find(query, projection).sort(CursorPagination.sort_spec(sort_field=sort_field)).limit(limit).to_list(length=limit)
+
+        next_cursor = CursorPagination.encode(document=results[-1], sort_field=sort_field) if len(results) == limit else None
+        return results, next_cursor
+
     @classmethod
     async def find_distinct(cls, filter_dict: dict = None, collection: str = None, page: int = 1) -> list:
         results = await cls.db[collection].distinct(filter=filter_dict).skip(
@@ -94,6 +148,75 @@ class SynchronousMethods:
 
         return new
     
+    @classmethod
+    def insert(cls, data: dict = None, collection: str = None) -> dict:
+        """
+        Insert a document in a single round-trip.
+        Relies on the unique `_id` index instead of checking for the `_id` beforehand and returns the document as it
+        was built locally instead of reading it back; returns an empty dict if the `_id` already exists.
+        """
+        if not data.get("_id"):
+            data["_id"] = f"{uuid4()}".replace("-", "").upper()
+
+        try:
+            _ = cls.db[collection].insert_one(data)
+        except pymongo.errors.DuplicateKeyError:
+            logger.warn(f"_id '{data.get('_id')}' already exists.")
+            return {}
+
+        return data
+
+    @classmethod
+    def insert_many(cls, data: list = None, collection: str = None) -> dict:
+        """
+        Insert a batch of documents in a single unordered round-trip; a failing document does not stop the rest.
+        Returns the `_id`s that were inserted and the errors of the ones that were not.
+        """
+        if not data:
+            return {"inserted": [], "errors": []}
+
+        for item in data:
+            if not item.get("_id"):
+                item["_id"] = f"{uuid4()}".replace("-", "").upper()
+
+        try:
+            _ = cls.db[collection].insert_many(data, ordered=False)
+        except pymongo.errors.BulkWriteError as ex:
+            return cls.bulk_insert_report(data=data, error=ex, collection=collection)
+
+        return {"inserted": [item["_id"] for item in data], "errors": []}
+
+    @classmethod
+    def bulk_write(cls, operations: list = None, collection: str = None, ordered: bool = True):
+        """
+        Apply a batch of `pymongo` write operations (`ReplaceOne`, `DeleteOne`, ...) in a single round-trip.
+        """
+        if not operations:
+            return None
+
+        return cls.db[collection].bulk_write(operations, ordered=ordered)
+
+    @classmethod
+    def bulk_insert_report(cls, data: list = None, error: pymongo.errors.BulkWriteError = None, collection: str = None) -> dict:
+        """
+        Split a failed unordered bulk insert into the documents that made it and a per-document error report.
+        """
+        errors = [
+            {
+                "index": item.get("index"),
+                "_id": data[item.get("index")].get("_id"),
+                "code": item.get("code"),
+                "message": item.get("errmsg")
+            } for item in error.details.get("writeErrors", [])
+        ]
+        failed = {item.get("index") for item in errors}
+        logger.warn(f"{len(errors)} document(s) could not be inserted into '{collection}'.")
+
+        return {
+            "inserted": [item["_id"] for index, item in enumerate(data) if index not in failed],
+            "errors": errors
+        }
+
     @classmethod
     def find_one(cls, _id:str=None, collection:str=None):
         res = cls.db[collection].find_one({"_id":_id})
@@ -118,26 +241,69 @@ class SynchronousMethods:
         return True
 
     @classmethod
-    def find(cls, filter_dict: dict = None, collection: str = None, page: int = 1) -> list:
+    def update_many(cls, filter_dict: dict = None, data: dict = None, collection: str = None) -> int:
+        """
+        `$set` the same fields on every document matching the query in one round-trip; returns how many changed.
+        """
+        if not filter_dict or not data:
+            return 0
+
+        return cls.db[collection].update_many(filter_dict, {"$set": data}).modified_count
+
+    @classmethod
+    def find(cls, filter_dict: dict = None, collection: str = None, page: int = 1, projection: dict = None) -> list:
+        """
+        `projection` restricts the fields returned, e.g. `{"title": 1, "author.username": 1}`.
+        """
         if not filter_dict:
-            results = cls.db[collection].find().skip(
+            results = cls.db[collection].find({}, projection).skip(
                 (page-1)*MAX_ITEMS_PER_PAGE).limit(MAX_ITEMS_PER_PAGE)
         else:
-            results = cls.db[collection].find(filter_dict).skip(
+            results = cls.db[collection].find(filter_dict, projection).skip(
                 (page-1)*MAX_ITEMS_PER_PAGE).limit(MAX_ITEMS_PER_PAGE)
 
         return list(results)
     
     @classmethod
-    def find_and_order(cls, filter_dict:dict=None, collection:str=None, sort_field:str=None, page:int=1) -> list:
+    def find_and_order(cls, filter_dict:dict=None, collection:str=None, sort_field:str=None, page:int=1, projection:dict=None) -> list:
         """
         Find via a query and order by a given field name.
         Useful when implementing a search.
         """
-        results = cls.db[collection].find(filter_dict).sort(sort_field, pymongo.DESCENDING).skip((page-1)*MAX_ITEMS_PER_PAGE).limit(MAX_ITEMS_PER_PAGE)
+        results = cls.db[collection].find(filter_dict, projection).sort(sort_field, pymongo.DESCENDING).skip((page-1)*MAX_ITEMS_PER_PAGE).limit(MAX_ITEMS_PER_PAGE)
         return list(results)
 
 
+    @classmethod
+    def find_by_cursor(cls, filter_dict: dict = None, collection: str = None, sort_field: str = "_id", cursor: str = None, limit: int = MAX_ITEMS_PER_PAGE, projection: dict = None) -> tuple:
+        """
+        Keyset-paginated find, ordered by `(sort_field, _id)` descending.
+        Returns the page and the cursor of the next page (`None` on the last page).
+        """
+        query = CursorPagination.build_filter(filter_dict=filter_dict, sort_field=sort_field, cursor=cursor)
+        projection = CursorPagination.projection(projection=projection, sort_field=sort_field)
+        results = list(cls.db[collection].find(query, projection).sort(CursorPagination.sort_spec(sort_field=sort_field)).limit(limit))
+
+        next_cursor = CursorPagination.encode(document=results[-1], sort_field=sort_field) if len(results) == limit else None
+        return results, next_cursor
+
+    @classmethod
+    def paginate(cls, filter_dict: dict = None, collection: str = None, sort_field: str = "_id", page: int = 1, cursor: str = None, projection: dict = None) -> tuple:
+        """
+        Paginate by cursor when one is given (and for the first page, so it can hand out the first cursor);
+        fall back to `.skip()` for callers still asking for a deeper page by number.
+        Both paths share the same `(sort_field, _id)` descending order.
+        Returns the page and the cursor of the next page, if any.
+        """
+        if cursor or page <= 1:
+            return cls.find_by_cursor(filter_dict=filter_dict, collection=collection, sort_field=sort_field, cursor=cursor, projection=projection)
+
+        projection = CursorPagination.projection(projection=projection, sort_field=sort_field)
+        results = list(cls.db[collection].find(filter_dict or {}, projection).sort(CursorPagination.sort_spec(sort_field=sort_field)).skip(
+            (page-1)*MAX_ITEMS_PER_PAGE).limit(MAX_ITEMS_PER_PAGE))
+        next_cursor = CursorPagination.encode(document=results[-1], sort_field=sort_field) if len(results) == MAX_ITEMS_PER_PAGE else None
+        return results, next_cursor
+
     @classmethod
     def find_distinct(cls, filter_dict: dict = None, collection: str = None, page: int = 1) -> list:
         results = cls.db[collection].distinct(filter=filter_dict).skip(
@@ -145,9 +311,40 @@ class SynchronousMethods:
         return results
     
     @classmethod
-    def count_documents(cls, filter_dict: dict = {}, collection: str = None)->int:
+    def distinct(cls, field: str = None, filter_dict: dict = None, collection: str = None) -> list:
+        """
+        Get the distinct values of a single field across the documents matching the query.
+        """
+        return cls.db[collection].distinct(field, filter=filter_dict)
+
+    @classmethod
+    def estimated_count(cls, collection: str = None) -> int:
+        """
+        Document count of the whole collection read from its metadata; no scan, but may be off after an unclean shutdown.
+        """
+        return cls.db[collection].estimated_document_count()
+
+    @classmethod
+    def count_documents(cls, filter_dict: dict = {}, collection: str = None, limit: int = None)->int:
+        """
+        Count the documents matching the query; with `limit`, stop counting there so the count stays cheap.
+        """
+        if limit:
+            return cls.db[collection].count_documents(filter=filter_dict, limit=limit)
         return cls.db[collection].count_documents(filter=filter_dict)
 
+    @classmethod
+    def text_search(cls, filter_dict: dict = None, collection: str = None, tie_breaker: str = "_id", page: int = 1, projection: dict = None) -> list:
+        """
+        Run a query containing a `$text` clause and order the matches by relevance (`score`), then by `tie_breaker`.
+        Requires a text index on the collection.
+        """
+        score = {"$meta": "textScore"}
+        projection = {**(projection or {}), "score": score}
+        results = cls.db[collection].find(filter_dict, projection).sort(
+            [("score", score), (tie_breaker, pymongo.DESCENDING)]).skip((page-1)*MAX_ITEMS_PER_PAGE).limit(MAX_ITEMS_PER_PAGE)
+        return list(results)
+
     @classmethod
     def exists(cls, filter_dict: dict = None, collection: str = None) -> bool:
         if not filter_dict:
@@ -168,3 +365,42 @@ class SynchronousMethods:
             return False
         
         return True
+
+    @classmethod
+    def delete_many(cls, filter_dict: dict = None, collection: str = None, batch_size: int = 1_000, pause: float = 0.0) -> int:
+        """
+        Delete every document matching the query in `_id`-range chunks of at most `batch_size` documents,
+        sleeping `pause` seconds between chunks so that a large purge does not starve the cluster.
+        Returns the number of documents deleted.
+        """
+        if filter_dict is None:
+            logger.warn("Refusing to delete without a filter.")
+            return 0
+
+        deleted = 0
+        while True:
+            ids = [item["_id"] for item in cls.db[collection].find(filter_dict, {"_id": 1}).sort("_id", pymongo.ASCENDING).limit(batch_size)]
+            if not ids:
+                break
+
+            try:
+                result = cls.db[collection].delete_many(
+                    {
+                        "$and": [
+                            filter_dict,
+                            {"_id": {"$gte": ids[0], "$lte": ids[-1]}}
+                        ]
+                    }
+                )
+            except Exception as ex:
+                logger.exception(f"{ex}")
+                break
+
+            deleted += result.deleted_count
+            if len(ids) < batch_size or result.deleted_count == 0:
+                break
+            if pause:
+                sleep(pause)
+
+        logger.info(f"{deleted} document(s) deleted from '{collection}'.")
+        return deleted
@@ -0,0 +1,90 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from json import JSONDecodeError
+
+import pymongo
+from bson import json_util
+
+from database import logger
+
+
+class InvalidCursor(ValueError):
+    """
+    Raised when a pagination cursor cannot be decoded.
+    """
+
+
+class CursorPagination:
+    """
+    Keyset pagination over MongoDB collections, keyed on `(sort_field, _id)`.
+
+    Instead of `.skip()`-ing every document before the requested page, the next page starts strictly after the last
+    document of the previous one, so a deep page costs the same as the first as long as `(sort_field, _id)` is indexed.
+    Cursors are opaque to the client: an url-safe base64 encoding of the last document's sort key.
+    """
+    ID_FIELD: str = "_id"
+
+    @classmethod
+    def encode(cls, document: dict = None, sort_field: str = ID_FIELD) -> str:
+        if not document:
+            return None
+
+        return cls.encode_key(value=document.get(sort_field), _id=document.get(cls.ID_FIELD))
+
+    @classmethod
+    def encode_key(cls, value=None, _id=None) -> str:
+        """
+        Encode a raw `(value, _id)` sort key; also used for keyset pagination over Django querysets.
+        """
+        return urlsafe_b64encode(json_util.dumps([value, _id]).encode("utf8")).decode("ascii")
+
+    @classmethod
+    def decode(cls, cursor: str = None) -> list:
+        try:
+            key = json_util.loads(urlsafe_b64decode(cursor.encode("ascii")).decode("utf8"))
+        except (BinasciiError, JSONDecodeError, UnicodeError, ValueError, AttributeError) as ex:
+            logger.warn(f"Invalid cursor '{cursor}': {ex}")
+            raise InvalidCursor(f"Invalid cursor '{cursor}'.")
+
+        if not isinstance(key, list) or len(key) != 2:
+            raise InvalidCursor(f"Invalid cursor '{cursor}'.")
+
+        return key
+
+    @classmethod
+    def projection(cls, projection: dict = None, sort_field: str = ID_FIELD) -> dict:
+        """
+        Make sure an inclusive `projection` keeps `sort_field`, which the next cursor is built from.
+        """
+        if not projection or not any(value for key, value in projection.items() if key != cls.ID_FIELD):
+            return projection
+        return {**projection, sort_field: 1}
+
+    @classmethod
+    def sort_spec(cls, sort_field: str = ID_FIELD) -> list:
+        if sort_field == cls.ID_FIELD:
+            return [(cls.ID_FIELD, pymongo.DESCENDING)]
+        return [(sort_field, pymongo.DESCENDING), (cls.ID_FIELD, pymongo.DESCENDING)]
+
+    @classmethod
+    def build_filter(cls, filter_dict: dict = None, sort_field: str = ID_FIELD, cursor: str = None) -> dict:
+        """
+        Restrict `filter_dict` to the documents that come after `cursor` in descending `(sort_field, _id)` order.
+        """
+        if not cursor:
+            return filter_dict or {}
+
+        value, _id = cls.decode(cursor)
+        if sort_field == cls.ID_FIELD:
+            after = {cls.ID_FIELD: {"$lt": _id}}
+        else:
+            after = {
+                "$or": [
+                    {sort_field: {"$lt": value}},
+                    {sort_field: value, cls.ID_FIELD: {"$lt": _id}}
+                ]
+            }
+
+        if not filter_dict:
+            return after
+        return {"$and": [filter_dict, after]}
@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta
+
+from django.test import SimpleTestCase
+
+from database.pagination import CursorPagination, InvalidCursor
+
+
+def matches(document: dict, filter_dict: dict) -> bool:
+    """
+    Just enough of MongoDB's query language to evaluate the filters `CursorPagination` builds.
+    """
+    for key, condition in filter_dict.items():
+        if key == "$and":
+            if not all(matches(document, part) for part in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(document, part) for part in condition):
+                return False
+        elif isinstance(condition, dict):
+            if not document.get(key) < condition["$lt"]:
+                return False
+        elif document.get(key) != condition:
+            return False
+    return True
+
+
+class CursorPaginationTestCase(SimpleTestCase):
+
+    def setUp(self):
+        start = datetime(2026, 1, 1)
+        ## Three posts share every `created`, so pages have to break ties on `_id`.
+        self.documents = [
+            {"_id": f"post-{day}-{n}", "created": start + timedelta(days=day), "author": n % 2}
+            for day in range(4) for n in range(3)
+        ]
+
+    def page(self, cursor: str = None, size: int = 5, filter_dict: dict = None) -> list:
+        query = CursorPagination.build_filter(filter_dict=filter_dict, sort_field="created", cursor=cursor)
+        ordered = sorted(self.documents, key=lambda document: (document["created"], document["_id"]), reverse=True)
+        return [document for document in ordered if matches(document, query)][:size]
+
+    def walk(self, filter_dict: dict = None) -> list:
+        seen, cursor = [], None
+        while True:
+            page = self.page(cursor=cursor, filter_dict=filter_dict)
+            if not page:
+                return seen
+            seen.extend(document["_id"] for document in page)
+            cursor = CursorPagination.encode(document=page[-1], sort_field="created")
+
+    def test_cursor_round_trip(self):
+        cursor = CursorPagination.encode(document=self.documents[0], sort_field="created")
+
+        self.assertEqual(CursorPagination.decode(cursor), [self.documents[0]["created"], self.documents[0]["_id"]])
+
+    def test_pages_through_ties_without_gaps_or_repeats(self):
+        seen = self.walk()
+
+        self.assertEqual(len(seen), len(self.documents))
+        self.assertEqual(set(seen), {document["_id"] for document in self.documents})
+
+    def test_cursor_is_combined_with_the_filter(self):
+        seen = self.walk(filter_dict={"author": 1})
+
+        self.assertEqual(set(seen), {document["_id"] for document in self.documents if document["author"] == 1})
+
+    def test_no_cursor_keeps_the_filter(self):
+        self.assertEqual(CursorPagination.build_filter(filter_dict={"author": 1}), {"author": 1})
+        self.assertEqual(CursorPagination.build_filter(), {})
+
+    def test_invalid_cursors(self):
+        for cursor in ("not a cursor", "bm90IGpzb24=", CursorPagination.encode_key(value=1)[:-4]):
+            with self.assertRaises(InvalidCursor):
+                _ = CursorPagination.decode(cursor)
+
+    def test_projection_keeps_the_sort_field(self):
+        self.assertEqual(CursorPagination.projection({"title": 1}, sort_field="created"), {"title": 1, "created": 1})
+        self.assertEqual(CursorPagination.projection({"body": 0}, sort_field="created"), {"body": 0})
+        self.assertIsNone(CursorPagination.projection(None, sort_field="created"))
@@ -0,0 +1,170 @@
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic, time
+
+from django.conf import settings
+
+from middleware_app import logger
+
+
+class KnownAddressCache:
+    """
+    Two-tier cache of positive (user, ip) and (user, mac) verdicts for the `IpAddressChecker` middleware.
+
+    1. A bounded LRU in the current worker process, checked first and costing a single dictionary lookup.
+    2. A Redis sorted set per user, shared by all workers, so a verdict learnt by one process is a cheap hit for the
+       others. Every address is scored with its own expiry (`REDIS_TTL` after it was last verified against MongoDB);
+       a hit never extends it, so an address MongoDB has expired stops being "known" within `REDIS_TTL` even for a
+       user who stays active, without the retention crons having to tell the cache.
+
+    Only addresses that are KNOWN are cached; a miss always falls through to MongoDB, so a fresh login or whitelisting
+    from another process can never be shadowed by a stale negative verdict.
+    """
+    IP: str = "ip"
+    MAC: str = "mac"
+
+    KEY_PREFIX: str = "known_addresses:v2"  #(prithoo): v1 keys were plain sets.
+    SEPARATOR: str = "|"
+
+    LOCAL_MAX_SIZE: int = settings.KNOWN_ADDRESS_LOCAL_CACHE_SIZE
+    LOCAL_TTL: int = settings.KNOWN_ADDRESS_LOCAL_CACHE_TTL
+    REDIS_TTL: int = settings.KNOWN_ADDRESS_REDIS_CACHE_TTL
+
+    _local: OrderedDict = OrderedDict()
+    _lock: Lock = Lock()
+
+    @classmethod
+    def get_redis(cls):
+        if not settings.USE_REDIS:
+            return None
+        return settings.REDIS_CONN
+
+    @classmethod
+    def redis_key(cls, user_id: str) -> str:
+        return f"{cls.KEY_PREFIX}:{user_id}"
+
+    @classmethod
+    def member(cls, kind: str, value: str) -> str:
+        return f"{kind}{cls.SEPARATOR}{value}"
+
+    @classmethod
+    def _local_get(cls, key: tuple) -> bool:
+        with cls._lock:
+            expires_at = cls._local.get(key)
+            if expires_at is None:
+                return False
+            if expires_at < monotonic():
+                del cls._local[key]
+                return False
+            cls._local.move_to_end(key)
+            return True
+
+    @classmethod
+    def _local_set(cls, key: tuple) -> None:
+        with cls._lock:
+            cls._local[key] = monotonic() + cls.LOCAL_TTL
+            cls._local.move_to_end(key)
+            while len(cls._local) > cls.LOCAL_MAX_SIZE:
+                cls._local.popitem(last=False)
+
+    @classmethod
+    def is_known(cls, user_id: str = None, kind: str = IP, value: str = None) -> bool:
+        """
+        Check whether the address was already verified for the user, without touching MongoDB.
+        """
+        if not user_id or not value:
+            return False
+
+        key = (user_id, kind, value)
+        if cls._local_get(key):
+            return True
+
+        conn = cls.get_redis()
+        if not conn:
+            return False
+
+        try:
+            expires_at = conn.zscore(cls.redis_key(user_id), cls.member(kind, value))
+        except Exception as ex:
+            logger.warn(f"{ex}")
+            return False
+
+        found = expires_at is not None and expires_at > time()
+        if found:
+            cls._local_set(key)
+        return found
+
+    @classmethod
+    def remember(cls, user_id: str = None, kind: str = IP, value: str = None) -> None:
+        """
+        Warm both tiers with an address that is known to be valid for the user.
+        """
+        if not user_id or not value:
+            return None
+
+        cls._local_set((user_id, kind, value))
+
+        conn = cls.get_redis()
+        if not conn:
+            return None
+
+        try:
+            key = cls.redis_key(user_id)
+            now = time()
+            pipe = conn.pipeline()
+            pipe.zadd(key, {cls.member(kind, value): now + cls.REDIS_TTL})
+            pipe.zremrangebyscore(key, "-inf", now)
+            ## The key outlives none of its members; it only goes away once the user has been idle for `REDIS_TTL`.
+            pipe.expire(key, cls.REDIS_TTL)
+            pipe.execute()
+        except Exception as ex:
+            logger.warn(f"{ex}")
+
+        return None
+
+    @classmethod
+    def forget(cls, user_id: str = None, kind: str = IP, value: str = None) -> None:
+        """
+        Drop a single address for the user from both tiers.
+
+        NOTE: Other worker processes may keep answering from their local tier for up to `LOCAL_TTL` seconds.
+        """
+        if not user_id or not value:
+            return None
+
+        with cls._lock:
+            cls._local.pop((user_id, kind, value), None)
+
+        conn = cls.get_redis()
+        if not conn:
+            return None
+
+        try:
+            conn.zrem(cls.redis_key(user_id), cls.member(kind, value))
+        except Exception as ex:
+            logger.warn(f"{ex}")
+
+        return None
+
+    @classmethod
+    def invalidate_user(cls, user_id: str = None) -> None:
+        """
+        Drop every cached address for the user from both tiers.
+        """
+        if not user_id:
+            return None
+
+        with cls._lock:
+            for key in [key for key in cls._local.keys() if key[0] == user_id]:
+                del cls._local[key]
+
+        conn = cls.get_redis()
+        if not conn:
+            return None
+
+        try:
+            conn.delete(cls.redis_key(user_id))
+        except Exception as ex:
+            logger.warn(f"{ex}")
+
+        return None
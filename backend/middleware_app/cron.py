@@ -1,4 +1,4 @@
-from datetime import datetime, timedelta
+from datetime import datetime
 import pytz
 
 from django_cron import CronJobBase, Schedule
@@ -7,6 +7,7 @@ from django.conf import settings
 
 from database.collections import DatabaseCollections
 from database.methods import SynchronousMethods
+from middleware_app.caches import KnownAddressCache
 
 from middleware_app import logger
 
@@ -23,18 +24,31 @@ class DeleteOldUserIPAddresses(CronJobBase):
     def do(self):
         """
         Delete IP addresses older than 90 days or approximately, 3 months.
+
+        NOTE: MongoDB expires these documents itself through the TTL index declared in `DatabaseCollections.TTL_INDEXES`
+              (created by `manage.py ensure_mongo_indexes`); this only catches up on whatever the TTL monitor has not
+              removed yet.
         """
-        NINETY_DAYS_AGO = datetime.now(pytz.timezone(settings.TIME_ZONE)) - timedelta(days=90)
+        field, retention = DatabaseCollections.TTL_INDEXES[DatabaseCollections.user_ips]
+        CUTOFF = datetime.now(pytz.timezone(settings.TIME_ZONE)) - retention
         logger.info("Deleting old IP addresses.")
+        filter_dict = {
+            field: {
+                "$lt": CUTOFF
+            }
+        }
         try:
-            SynchronousMethods.delete(
-                filter_dict={
-                    "timestampUtc": {
-                        "$lt": NINETY_DAYS_AGO
-                    }
-                },
+            users = SynchronousMethods.distinct(
+                field="user",
+                filter_dict=filter_dict,
+                collection=DatabaseCollections.user_ips
+            )
+            SynchronousMethods.delete_many(
+                filter_dict=filter_dict,
                 collection=DatabaseCollections.user_ips
             )
+            for user_id in users:
+                KnownAddressCache.invalidate_user(user_id=user_id)
         except Exception as ex:
             logger.warn(f"{ex}")
 
@@ -50,18 +64,31 @@ class DeleteOldUserMACAdresses(CronJobBase):
     
     def do(self):
         """
-        Delete MAC addresses older than 30 days.
+        Delete MAC addresses older than 90 days or approximately, 3 months.
+
+        NOTE: MongoDB expires these documents itself through the TTL index declared in `DatabaseCollections.TTL_INDEXES`
+              (created by `manage.py ensure_mongo_indexes`); this only catches up on whatever the TTL monitor has not
+              removed yet.
         """
-        NINETY_DAYS_AGO = datetime.now(pytz.timezone(settings.TIME_ZONE)) - timedelta(days=90)
+        field, retention = DatabaseCollections.TTL_INDEXES[DatabaseCollections.user_mac_addresses]
+        CUTOFF = datetime.now(pytz.timezone(settings.TIME_ZONE)) - retention
         logger.info("Deleting old MAC addresses.")
+        filter_dict = {
+            field: {
+                "$lt": CUTOFF
+            }
+        }
         try:
-            SynchronousMethods.delete(
-                filter_dict={
-                    "timestampUtc": {
-                        "$lt": NINETY_DAYS_AGO
-                    }
-                },
+            users = SynchronousMethods.distinct(
+                field="user",
+                filter_dict=filter_dict,
+                collection=DatabaseCollections.user_mac_addresses
+            )
+            SynchronousMethods.delete_many(
+                filter_dict=filter_dict,
                 collection=DatabaseCollections.user_mac_addresses
             )
+            for user_id in users:
+                KnownAddressCache.invalidate_user(user_id=user_id)
         except Exception as ex:
             logger.warn(f"{ex}")
\ No newline at end of file
@@ -0,0 +1,18 @@
+from django.http import HttpRequest
+
+from auth.resolver import RequestAuthResolver
+
+
+class AuthContextResolver(object):
+    """
+    Middleware to attach the (lazily resolved) authentication of the `Authorization` header before any other custom
+    middleware runs. The header is authenticated once, the first time the `auth.context.AuthContext` is read, and the
+    result is reused by the middlewares below it and by the DRF authentication classes in `auth.authentication`.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest):
+        RequestAuthResolver.resolve_lazily(request=request)
+        return self.get_response(request)
@@ -1,13 +1,11 @@
-from os import environ
-from jose import jwt
-
+from auth.resolver import RequestAuthResolver
 from database.collections import DatabaseCollections
 from database.methods import SynchronousMethods
 from django.http import HttpRequest, HttpResponseForbidden
 
-from core.settings import SECRET_KEY, IP_HEADER, MAC_HEADER
+from core.settings import IP_HEADER, MAC_HEADER
+from middleware_app.caches import KnownAddressCache
 from user_app.models import User
-from user_app.utils import UserTokenUtils
 
 from middleware_app import logger
 
@@ -34,35 +32,6 @@ class IpAddressChecker(object):
             return resp
         return self.get_response(request)
 
-    def get_jwt_user(
-        self,
-        headers: dict = None,
-        token_prefix: str = "Bearer"
-    ):
-        """
-        Method to get the user from the header of the request, if authentication is handled
-        by a JWT.
-
-        Change `token_prefix` to whatever prefix your system uses.
-        """
-
-        if not headers.get("Authorization"):
-            logger.warn("No authorization header.")
-            return None
-
-        try:
-            if headers.get("Authorization").split(" ")[0] != token_prefix:
-                logger.warn("Inavlid token prefix.")
-                return None
-
-            token = headers.get("Authorization").split(" ")[1]
-            validated = jwt.decode(token=token, key=SECRET_KEY, algorithms=[
-                                   environ.get('JWT_ALGORITHM'),])
-            return User.objects.filter(pk=validated.get("user_id")).first()
-        except Exception as ex:
-            logger.info(f"{ex}")
-            return None
-
     def get_client_ip(self, request: HttpRequest):
         try:
             x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
@@ -79,6 +48,9 @@ class IpAddressChecker(object):
             return None
 
     def check_previous_ip(self, user_id: str = None, ip: str = None):
+        if KnownAddressCache.is_known(user_id=user_id, kind=KnownAddressCache.IP, value=ip):
+            return True
+
         filter_dict = {
             "$and": [
                 {
@@ -91,6 +63,8 @@ class IpAddressChecker(object):
         }
         _exists = SynchronousMethods.exists(filter_dict=filter_dict, collection=DatabaseCollections.user_ips) or SynchronousMethods.exists(
             filter_dict=filter_dict, collection=DatabaseCollections.user_white_listed_ips)
+        if _exists:
+            KnownAddressCache.remember(user_id=user_id, kind=KnownAddressCache.IP, value=ip)
         return _exists
 
     def process_request(self, request: HttpRequest):
@@ -101,10 +75,10 @@ class IpAddressChecker(object):
 
         if (not user or not type(user) == User):
             ## We don't need to check the IP if the user is using a permanent Token, as that would overcomplicate things on the user's end.
-            if headers.get(self.AUTHORIZATION_KEY, "").split(" ")[0] == self.JWT_HEADER: 
-                user = self.get_jwt_user(headers=headers)
-            else:
-                user = None
+            ## The scheme is read off the header, so a permanent Token is never authenticated here.
+            scheme = RequestAuthResolver.get_scheme(request=request)
+            is_jwt = scheme and scheme.lower() == self.JWT_HEADER.lower()
+            user = RequestAuthResolver.resolve(request=request).user if is_jwt else None
 
 
         if user \
@@ -119,6 +93,9 @@ class IpAddressChecker(object):
         return headers.get(self.MAC_ADDRESS_HEADER_NAME, None)
 
     def check_previous_mac(self, user_id: str = None, mac: str = None):
+        if KnownAddressCache.is_known(user_id=user_id, kind=KnownAddressCache.MAC, value=mac):
+            return True
+
         filter_dict = {
             "$and": [
                 {
@@ -131,4 +108,6 @@ class IpAddressChecker(object):
         }
         _exists = SynchronousMethods.exists(
             filter_dict=filter_dict, collection=DatabaseCollections.user_mac_addresses)
+        if _exists:
+            KnownAddressCache.remember(user_id=user_id, kind=KnownAddressCache.MAC, value=mac)
         return _exists
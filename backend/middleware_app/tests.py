@@ -0,0 +1,85 @@
+from time import time
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+from middleware_app.caches import KnownAddressCache
+
+
+@override_settings(USE_REDIS=False)
+class KnownAddressCacheLocalTestCase(TestCase):
+
+    def setUp(self):
+        KnownAddressCache._local.clear()
+
+    def test_remembered_address_is_known(self):
+        KnownAddressCache.remember(user_id="user-1", kind=KnownAddressCache.IP, value="10.0.0.1")
+
+        self.assertTrue(KnownAddressCache.is_known(user_id="user-1", kind=KnownAddressCache.IP, value="10.0.0.1"))
+        self.assertFalse(KnownAddressCache.is_known(user_id="user-1", kind=KnownAddressCache.MAC, value="10.0.0.1"))
+        self.assertFalse(KnownAddressCache.is_known(user_id="user-2", kind=KnownAddressCache.IP, value="10.0.0.1"))
+
+    def test_forget_and_invalidate_user(self):
+        KnownAddressCache.remember(user_id="user-1", value="10.0.0.1")
+        KnownAddressCache.remember(user_id="user-1", value="10.0.0.2")
+        KnownAddressCache.remember(user_id="user-2", value="10.0.0.1")
+
+        KnownAddressCache.forget(user_id="user-1", value="10.0.0.1")
+        self.assertFalse(KnownAddressCache.is_known(user_id="user-1", value="10.0.0.1"))
+        self.assertTrue(KnownAddressCache.is_known(user_id="user-1", value="10.0.0.2"))
+
+        KnownAddressCache.invalidate_user(user_id="user-1")
+        self.assertFalse(KnownAddressCache.is_known(user_id="user-1", value="10.0.0.2"))
+        self.assertTrue(KnownAddressCache.is_known(user_id="user-2", value="10.0.0.1"))
+
+    def test_least_recently_used_is_evicted(self):
+        with mock.patch.object(KnownAddressCache, "LOCAL_MAX_SIZE", 2):
+            KnownAddressCache.remember(user_id="user-1", value="10.0.0.1")
+            KnownAddressCache.remember(user_id="user-1", value="10.0.0.2")
+            self.assertTrue(KnownAddressCache.is_known(user_id="user-1", value="10.0.0.1"))
+            KnownAddressCache.remember(user_id="user-1", value="10.0.0.3")
+
+        self.assertTrue(KnownAddressCache.is_known(user_id="user-1", value="10.0.0.1"))
+        self.assertFalse(KnownAddressCache.is_known(user_id="user-1", value="10.0.0.2"))
+        self.assertTrue(KnownAddressCache.is_known(user_id="user-1", value="10.0.0.3"))
+
+    def test_local_entries_expire(self):
+        with mock.patch.object(KnownAddressCache, "LOCAL_TTL", -1):
+            KnownAddressCache.remember(user_id="user-1", value="10.0.0.1")
+
+        self.assertFalse(KnownAddressCache.is_known(user_id="user-1", value="10.0.0.1"))
+
+
+@skipUnless(settings.USE_REDIS, "Redis is off.")
+class KnownAddressCacheRedisTestCase(TestCase):
+
+    def setUp(self):
+        self.patch = mock.patch.object(KnownAddressCache, "KEY_PREFIX", "test:known_addresses")
+        self.patch.start()
+        KnownAddressCache._local.clear()
+
+    def tearDown(self):
+        settings.REDIS_CONN.delete(KnownAddressCache.redis_key("user-1"))
+        self.patch.stop()
+        KnownAddressCache._local.clear()
+
+    def test_other_workers_share_verdicts(self):
+        KnownAddressCache.remember(user_id="user-1", value="10.0.0.1")
+        KnownAddressCache._local.clear()
+
+        self.assertTrue(KnownAddressCache.is_known(user_id="user-1", value="10.0.0.1"))
+
+    def test_each_address_expires_on_its_own(self):
+        KnownAddressCache.remember(user_id="user-1", value="10.0.0.1")
+        settings.REDIS_CONN.zadd(KnownAddressCache.redis_key("user-1"), {KnownAddressCache.member(KnownAddressCache.IP, "10.0.0.2"): time() - 1})
+        KnownAddressCache._local.clear()
+
+        self.assertTrue(KnownAddressCache.is_known(user_id="user-1", value="10.0.0.1"))
+        self.assertFalse(KnownAddressCache.is_known(user_id="user-1", value="10.0.0.2"))
+
+    def test_forget_reaches_redis(self):
+        KnownAddressCache.remember(user_id="user-1", value="10.0.0.1")
+        KnownAddressCache.forget(user_id="user-1", value="10.0.0.1")
+
+        self.assertFalse(KnownAddressCache.is_known(user_id="user-1", value="10.0.0.1"))
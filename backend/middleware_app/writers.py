@@ -0,0 +1,121 @@
+import atexit
+from collections import deque
+from os import getpid
+from threading import Event, Lock, Thread
+from typing import Any, Callable, List
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from database.collections import DatabaseCollections
+from database.methods import SynchronousMethods
+from middleware_app.models import RequestLog
+
+from middleware_app import logger
+
+
+class BufferedWriter:
+    """
+    Buffer records in memory and write them in batches from a background thread, so that the request thread only pays
+    for an append.
+
+    The buffer is a ring: once `max_size` records are waiting, the oldest ones are dropped (and counted in `dropped`)
+    instead of blocking the request. The worker thread is started lazily in each process, so forked workers do not
+    inherit a dead thread, and whatever is left in the buffer is flushed when the interpreter shuts down.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        flush_func: Callable[[List[Any]], Any],
+        max_size: int = settings.REQUEST_LOG_BUFFER_SIZE,
+        batch_size: int = settings.REQUEST_LOG_BATCH_SIZE,
+        flush_interval: float = settings.REQUEST_LOG_FLUSH_INTERVAL
+    ):
+        self.name = name
+        self.flush_func = flush_func
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped: int = 0
+
+        self._buffer: deque = deque(maxlen=max_size)
+        self._lock = Lock()
+        self._flush_lock = Lock()
+        self._wakeup = Event()
+        self._thread: Thread = None
+        self._pid: int = None
+
+    def __repr__(self):
+        return f"BufferedWriter({self.name}, pending={len(self._buffer)}, dropped={self.dropped})"
+
+    def append(self, item: Any) -> None:
+        self._ensure_worker()
+
+        with self._lock:
+            if len(self._buffer) == self._buffer.maxlen:
+                self.dropped += 1
+            self._buffer.append(item)
+            should_wake = len(self._buffer) >= self.batch_size
+
+        if should_wake:
+            self._wakeup.set()
+
+    def _ensure_worker(self) -> None:
+        if self._pid == getpid() and self._thread and self._thread.is_alive():
+            return
+
+        with self._lock:
+            if self._pid == getpid() and self._thread and self._thread.is_alive():
+                return
+
+            if self._pid is None:
+                atexit.register(self.flush)
+
+            self._pid = getpid()
+            self._thread = Thread(target=self._run, name=f"{self.name}-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(timeout=self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def _take_batch(self) -> List[Any]:
+        with self._lock:
+            return [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+
+    def flush(self) -> None:
+        """
+        Write everything that is currently buffered, one batch at a time.
+        """
+        with self._flush_lock:
+            while True:
+                batch = self._take_batch()
+                if not batch:
+                    break
+
+                try:
+                    self.flush_func(batch)
+                except Exception as ex:
+                    logger.warn(f"{self.name}: could not write {len(batch)} record(s): {ex}")
+
+            with self._lock:
+                dropped, self.dropped = self.dropped, 0
+            if dropped:
+                logger.warn(f"{self.name}: {dropped} record(s) dropped as the buffer was full.")
+
+
+def write_request_logs_to_nosql(batch: List[dict]) -> None:
+    _ = SynchronousMethods.insert_many(data=batch, collection=DatabaseCollections.request_logs)
+
+
+def write_request_logs_to_sql(batch: List[RequestLog]) -> None:
+    try:
+        _ = RequestLog.objects.bulk_create(batch)
+    finally:
+        close_old_connections()
+
+
+nosql_request_log_writer = BufferedWriter(name="nosql-request-log", flush_func=write_request_logs_to_nosql)
+sql_request_log_writer = BufferedWriter(name="sql-request-log", flush_func=write_request_logs_to_sql)
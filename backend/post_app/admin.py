@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from post_app.models import Tag, Post
+from post_app.models import Tag, Post, PostOutbox
 
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
@@ -21,4 +21,11 @@ class PostAdmin(admin.ModelAdmin):
         'author__slug',
         'author__email'
     )
-    ordering = ('-created', '-updated')
\ No newline at end of file
+    ordering = ('-created', '-updated')
+
+@admin.register(PostOutbox)
+class PostOutboxAdmin(admin.ModelAdmin):
+    list_display = ('id', 'post_id', 'attempts', 'created')
+    list_filter = ('attempts',)
+    search_fields = ('post_id',)
+    ordering = ('id',)
@@ -4,6 +4,7 @@ from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from post_app.constants import PostSearchConstants
 from post_app.utils import TagModelUtils, PostModelUtils
 
 
@@ -64,9 +65,10 @@ class PostAPI(APIView):
         _id = request.query_params.get("id")
         _all = bool(request.query_params.get("all", False))
         page = int(request.query_params.get("page", 1))
+        cursor = request.query_params.get("cursor")
 
         if _all:
-            resp = PostModelUtils.get_all(page=page)
+            resp = PostModelUtils.get_all(page=page, cursor=cursor)
         else:
             resp = PostModelUtils.get(id=_id)
         
@@ -79,6 +81,8 @@ class PostAPI(APIView):
         """
         term = request.query_params.get("search", "")
         page = int(request.query_params.get("page", 1))
+        cursor = request.query_params.get("cursor")
+        mode = request.query_params.get("mode", PostSearchConstants.TEXT_MODE)
 
-        resp = PostModelUtils.search(term=term, page=page)        
+        resp = PostModelUtils.search(term=term, page=page, cursor=cursor, mode=mode)        
         return resp.to_response()
\ No newline at end of file
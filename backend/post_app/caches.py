@@ -0,0 +1,48 @@
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+from typing import Dict, List
+
+from django.conf import settings
+
+
+class TagCache:
+    """
+    Bounded, per-process cache of tag name -> tag ID used by `TagModelUtils.resolve`.
+
+    Tags are only ever created, so a cached ID only goes stale when a tag is deleted: the `Tag` signals evict it in this
+    process and `TTL` takes care of the others.
+    """
+    MAX_SIZE: int = settings.TAG_CACHE_SIZE
+    TTL: int = settings.TAG_CACHE_TTL
+
+    _tags: OrderedDict = OrderedDict()
+    _lock: Lock = Lock()
+
+    @classmethod
+    def get_many(cls, names: List[str] = None) -> Dict[str, str]:
+        now = monotonic()
+        found = {}
+        with cls._lock:
+            for name in names or []:
+                cached = cls._tags.get(name)
+                if cached and cached[0] >= now:
+                    cls._tags.move_to_end(name)
+                    found[name] = cached[1]
+
+        return found
+
+    @classmethod
+    def set_many(cls, tags: Dict[str, str] = None) -> None:
+        expires = monotonic() + cls.TTL
+        with cls._lock:
+            for name, tag_id in (tags or {}).items():
+                cls._tags[name] = (expires, tag_id)
+                cls._tags.move_to_end(name)
+            while len(cls._tags) > cls.MAX_SIZE:
+                cls._tags.popitem(last=False)
+
+    @classmethod
+    def evict(cls, name: str = None) -> None:
+        with cls._lock:
+            cls._tags.pop(name, None)
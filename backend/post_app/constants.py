@@ -2,4 +2,30 @@ import re
 
 class FormatRegex:
 
-    title_regex = re.compile(r'^[a-zA-Z]{5,}')
\ No newline at end of file
+    title_regex = re.compile(r'^[a-zA-Z]{5,}')
+
+class PostSearchConstants:
+
+    TEXT_MODE = "text"
+    REGEX_MODE = "regex"
+    MODES = (TEXT_MODE, REGEX_MODE)
+
+    ## (prithoo): Counting every match of a broad search costs as much as the search itself, so the hit count stops here.
+    HITS_LIMIT = 1_000
+
+    uuid_regex = re.compile(r'^[0-9a-fA-F]{8}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{12}$')
+    email_regex = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+
+class PostDocumentConstants:
+
+    ## (prithoo): List views only need enough of a post to render its card; the author's email and the `updated`
+    ##            timestamp stay in MongoDB (they are still searchable) but are not shipped with every result.
+    LIST_PROJECTION = {
+        "title": 1,
+        "blurb": 1,
+        "author._id": 1,
+        "author.username": 1,
+        "tags": 1,
+        "created": 1,
+    }
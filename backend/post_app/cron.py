@@ -0,0 +1,16 @@
+from django_cron import CronJobBase, Schedule
+
+from post_app.outbox import PostOutboxUtils
+
+
+class DrainPostOutbox(CronJobBase):
+    """
+    Syncs the posts left in the outbox to MongoDB; the only drain when Redis is not in use.
+    """
+    RUN_EVERY_MINUTES = 1 # Run every minute
+    schedule = Schedule(run_every_mins=RUN_EVERY_MINUTES)
+
+    code = 'drain_post_outbox'
+
+    def do(self):
+        _ = PostOutboxUtils.drain()
@@ -0,0 +1,76 @@
+from typing import Optional, Tuple
+
+from bson import json_util
+from django.conf import settings
+
+from post_app import logger
+
+
+class LatestPostsFeed:
+    """
+    Redis cache of the pages served by `PostModelUtils.get_all` (`/api/post/?all=1`), stored as pre-serialized JSON.
+
+    Pages are keyed by a feed version that `invalidate()` bumps whenever a post is written to MongoDB, so a change makes
+    every cached page unreachable at once instead of deleting them one by one; unreachable pages simply expire.
+    The version is read BEFORE the page is built from MongoDB and the page is stored under that version, so a page built
+    from data older than a concurrent write can never be served once the write has bumped the version.
+    """
+    KEY_PREFIX: str = "post_feed"
+    VERSION_KEY: str = f"{KEY_PREFIX}:version"
+
+    CACHED_PAGES: int = settings.POST_FEED_CACHED_PAGES
+    TTL: int = settings.POST_FEED_CACHE_TTL
+
+    @classmethod
+    def get_redis(cls):
+        if not settings.USE_REDIS:
+            return None
+        return settings.REDIS_CONN
+
+    @classmethod
+    def page_key(cls, version: int, page: int = 1, cursor: str = None) -> str:
+        return f"{cls.KEY_PREFIX}:{version}:{cursor if cursor else f'page-{page}'}"
+
+    @classmethod
+    def is_cacheable(cls, page: int = 1, cursor: str = None) -> bool:
+        return bool(cursor) or page <= cls.CACHED_PAGES
+
+    @classmethod
+    def read(cls, page: int = 1, cursor: str = None) -> Tuple[Optional[int], Optional[dict]]:
+        """
+        Returns the current feed version and the cached page, if any; the version is None when caching is off.
+        """
+        redis = cls.get_redis()
+        if not redis or not cls.is_cacheable(page=page, cursor=cursor):
+            return None, None
+
+        try:
+            version = int(redis.get(cls.VERSION_KEY) or 0)
+            cached = redis.get(cls.page_key(version=version, page=page, cursor=cursor))
+        except Exception as ex:
+            logger.warn(f"Could not read the latest posts feed from Redis: {ex}")
+            return None, None
+
+        return version, json_util.loads(cached) if cached else None
+
+    @classmethod
+    def write(cls, version: int = None, page: int = 1, cursor: str = None, data: dict = None) -> None:
+        redis = cls.get_redis()
+        if not redis or version is None:
+            return
+
+        try:
+            redis.set(cls.page_key(version=version, page=page, cursor=cursor), json_util.dumps(data), ex=cls.TTL)
+        except Exception as ex:
+            logger.warn(f"Could not cache page {cursor or page} of the latest posts feed: {ex}")
+
+    @classmethod
+    def invalidate(cls) -> None:
+        redis = cls.get_redis()
+        if not redis:
+            return
+
+        try:
+            redis.incr(cls.VERSION_KEY)
+        except Exception as ex:
+            logger.warn(f"Could not invalidate the latest posts feed: {ex}")
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from post_app.outbox import PostOutboxUtils
+
+
+class Command(BaseCommand):
+    help = "Rewrite the `userPosts` MongoDB collection from the posts in Postgres."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=PostOutboxUtils.BATCH_SIZE, help="Posts per bulk write.")
+        parser.add_argument('--prune', action='store_true', help="Also delete documents of posts that no longer exist.")
+        parser.add_argument('--drain', action='store_true', help="Only write the posts pending in the outbox.")
+
+    def handle(self, *args, **options):
+        if options['drain']:
+            written = PostOutboxUtils.drain()
+            self.stdout.write(f"{written} document(s) synced from the outbox.")
+            return
+
+        report = PostOutboxUtils.rebuild(batch_size=options['batch_size'], prune=options['prune'])
+        self.stdout.write(f"{report.get('written')} document(s) written, {report.get('pruned')} pruned.")
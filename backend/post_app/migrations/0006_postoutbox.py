@@ -0,0 +1,30 @@
+# Generated by Django 4.2 on 2026-10-18 14:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('post_app', '0005_tag_tag_name_trgm_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostOutbox',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('post_id', models.UUIDField()),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Post Outbox Entry',
+                'verbose_name_plural': 'Post Outbox',
+                'ordering': ('id',),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='postoutbox',
+            index=models.Index(fields=['post_id'], name='post_app_po_post_id_dc0688_idx'),
+        ),
+    ]
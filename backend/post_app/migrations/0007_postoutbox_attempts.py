@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 19:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('post_app', '0006_postoutbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='postoutbox',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
 from django.template.defaultfilters import slugify
 
@@ -28,7 +29,8 @@ class Tag(TemplateModel):
         ordering = ("-created",)
         indexes = (
             models.Index(fields=('id',)),
-            models.Index(fields=('name',))
+            models.Index(fields=('name',)),
+            GinIndex(fields=('name',), name='tag_name_trgm_idx', opclasses=('gin_trgm_ops',))
         )
 
 
@@ -69,3 +71,30 @@ class Post(TemplateModel):
             models.Index(fields=('author',)),
             models.Index(fields=('title', 'author'))
         )
+
+
+class PostOutbox(models.Model):
+    """
+    Posts whose MongoDB document has to be brought up to date, written in the same transaction as the change itself and
+    drained by `post_app.outbox.PostOutboxUtils.drain`.
+    Rows only name the post: the worker always writes the post as it is at drain time (or deletes its document when the
+    post is gone), so any number of changes to one post collapse into a single write.
+    """
+    id = models.BigAutoField(primary_key=True)
+    post_id = models.UUIDField()
+    attempts = models.PositiveSmallIntegerField(default=0)
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Sync of post '{self.post_id}' queued at {self.created}"
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+    class Meta:
+        verbose_name = "Post Outbox Entry"
+        verbose_name_plural = "Post Outbox"
+        ordering = ("id",)
+        indexes = (
+            models.Index(fields=('post_id',)),
+        )
@@ -0,0 +1,267 @@
+from typing import Iterable, List, Set, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from pymongo import DeleteOne, ReplaceOne
+from pymongo.errors import BulkWriteError
+
+from core.rq_constants import JobQ
+from database.collections import DatabaseCollections
+from database.methods import SynchronousMethods
+from job_handler_app.utils import enqueue_job
+from post_app.feeds import LatestPostsFeed
+from post_app.models import Post, PostOutbox
+from user_app.models import User
+
+from post_app import logger
+
+
+class PostOutboxUtils:
+    """
+    Transactional outbox mirroring posts into the `userPosts` MongoDB collection.
+
+    The `Post` signals only insert a `PostOutbox` row, inside the transaction that changed the post, and schedule a drain
+    once it commits; the request never waits on MongoDB. The drain runs as an RQ job (and from the `DrainPostOutbox` cron,
+    which also covers deployments without Redis), one at a time thanks to a Redis lock:
+        - rows are read in insertion order, a batch at a time,
+        - every post of the batch is written once, as it is in Postgres at that moment, with a single `bulk_write`,
+        - the rows are deleted only after MongoDB acknowledged the write, so a failed drain is simply retried,
+        - a post that keeps failing is parked after `MAX_ATTEMPTS` drains instead of blocking the ones behind it.
+    """
+    LOCK_KEY: str = "post_outbox:drain"
+    SCHEDULED_KEY: str = "post_outbox:scheduled"
+    LOCK_TIMEOUT: int = 300
+    BATCH_SIZE: int = settings.POST_OUTBOX_BATCH_SIZE
+    MAX_ATTEMPTS: int = settings.POST_OUTBOX_MAX_ATTEMPTS
+
+    @classmethod
+    def get_redis(cls):
+        if not settings.USE_REDIS:
+            return None
+        return settings.REDIS_CONN
+
+    @classmethod
+    def record(cls, post_ids: Iterable[str] = None) -> None:
+        rows = [PostOutbox(post_id=post_id) for post_id in post_ids or []]
+        if not rows:
+            return
+
+        _ = PostOutbox.objects.bulk_create(rows)
+        transaction.on_commit(cls.schedule)
+
+    @classmethod
+    def schedule(cls) -> None:
+        """
+        Enqueue a drain unless one is already waiting in the queue.
+        """
+        redis = cls.get_redis()
+        if not redis:
+            return
+
+        try:
+            if redis.set(cls.SCHEDULED_KEY, 1, nx=True, ex=cls.LOCK_TIMEOUT):
+                _ = enqueue_job(func=drain_post_outbox, job_q=JobQ.DEFAULT_Q)
+        except Exception as ex:
+            logger.warn(f"Could not schedule a drain of the post outbox; the cron will pick it up: {ex}")
+
+    @classmethod
+    def to_document(cls, post: Post) -> dict:
+        return {
+            "_id": f"{post.id}",
+            "title": post.title,
+            "author": cls.author_document(user=post.author) if post.author else None,
+            "blurb": post.blurb,
+            "tags": [tag.name for tag in post.tags.all()],
+            "created": post.created,
+            "updated": post.updated
+        }
+
+    @classmethod
+    def author_document(cls, user) -> dict:
+        return {
+            "_id": f"{user.id}",
+            "username": user.username,
+            "email": user.email
+        }
+
+    @classmethod
+    def refresh_author(cls, user_id: str = None) -> int:
+        """
+        Rewrite the author sub-document of every post by `user_id` with a single `update_many`; returns how many changed.
+        Posts of a deleted user have their author set to None, matching what `SET_NULL` did in Postgres.
+        """
+        if not user_id:
+            return 0
+
+        user = User.objects.filter(pk=user_id).only("id", "username", "email").first()
+        author = cls.author_document(user=user) if user else None
+        filter_dict = {"author._id": f"{user_id}"}
+        if author:
+            #(prithoo): Saving a user without touching these fields then matches, but modifies, nothing.
+            filter_dict["$or"] = [{f"author.{field}": {"$ne": value}} for field, value in author.items() if field != "_id"]
+
+        modified = SynchronousMethods.update_many(
+            filter_dict=filter_dict,
+            data={"author": author},
+            collection=DatabaseCollections.user_posts
+        )
+        if modified:
+            LatestPostsFeed.invalidate()
+        return modified
+
+    @classmethod
+    def schedule_author_refresh(cls, user_id: str = None) -> None:
+        """
+        Refresh the author's posts from an RQ job once the transaction commits; inline when Redis is off.
+        """
+        def refresh():
+            if cls.get_redis() and enqueue_job(func=refresh_post_authors, job_q=JobQ.DEFAULT_Q, user_id=f"{user_id}"):
+                return
+
+            try:
+                _ = cls.refresh_author(user_id=user_id)
+            except Exception as ex:
+                logger.warn(f"Could not refresh the author of the posts of user '{user_id}': {ex}")
+
+        transaction.on_commit(refresh)
+
+    @classmethod
+    def write_batch(cls, post_ids: List[str] = None) -> Tuple[int, Set[str]]:
+        """
+        Make the documents of `post_ids` match Postgres in one round-trip: upsert the posts that exist, delete the rest.
+        Returns how many documents were written or deleted and the ids of the posts that could not be.
+        Only per-document failures are reported this way; anything else (e.g. MongoDB being unreachable) is raised.
+        """
+        if not post_ids:
+            return 0, set()
+
+        posts = {
+            f"{post.id}": post
+            for post in Post.objects.filter(pk__in=post_ids).select_related("author").prefetch_related("tags")
+        }
+
+        failed: Set[str] = set()
+        operations, operation_ids = [], []
+        for _id in post_ids:
+            try:
+                operation = ReplaceOne({"_id": _id}, cls.to_document(post=posts[_id]), upsert=True) if _id in posts \
+                    else DeleteOne({"_id": _id})
+            except Exception as ex:
+                logger.warn(f"Could not build the document of post '{_id}': {ex}")
+                failed.add(_id)
+                continue
+            operations.append(operation)
+            operation_ids.append(_id)
+
+        if not operations:
+            return 0, failed
+
+        try:
+            _ = SynchronousMethods.bulk_write(operations=operations, collection=DatabaseCollections.user_posts, ordered=False)
+        except BulkWriteError as ex:
+            if ex.details.get("writeConcernErrors"):
+                raise
+            for error in ex.details.get("writeErrors", []):
+                logger.warn(f"Could not write the document of post '{operation_ids[error.get('index')]}': {error.get('errmsg')}")
+                failed.add(operation_ids[error.get("index")])
+
+        return len(post_ids) - len(failed), failed
+
+    @classmethod
+    def write(cls, post_ids: List[str] = None) -> int:
+        written, failed = cls.write_batch(post_ids=post_ids)
+        if failed:
+            logger.warn(f"{len(failed)} post document(s) could not be written: {sorted(failed)}")
+        return written
+
+    @classmethod
+    def drain(cls) -> int:
+        """
+        Write every pending post to MongoDB; returns the number of documents written or deleted.
+
+        A row whose post cannot be written is kept and its `attempts` counted; once it reaches `MAX_ATTEMPTS` it is
+        parked, i.e. left in the table (see the admin) but skipped by later drains, so one bad post cannot hold the
+        rest of the outbox back. Reset its `attempts` to retry it.
+        """
+        redis = cls.get_redis()
+        lock = redis.lock(cls.LOCK_KEY, timeout=cls.LOCK_TIMEOUT) if redis else None
+        if lock and not lock.acquire(blocking=False):
+            ## (prithoo): The running drain re-checks the outbox once it is done; let later commits schedule again.
+            logger.warn("Another drain of the post outbox is still running.")
+            redis.delete(cls.SCHEDULED_KEY)
+            return 0
+
+        written = 0
+        last_id = 0
+        drained = False
+        try:
+            if redis:
+                redis.delete(cls.SCHEDULED_KEY)
+
+            while True:
+                batch = list(
+                    PostOutbox.objects.filter(id__gt=last_id, attempts__lt=cls.MAX_ATTEMPTS)
+                    .order_by("id").values_list("id", "post_id")[:cls.BATCH_SIZE]
+                )
+                if not batch:
+                    drained = True
+                    break
+                last_id = batch[-1][0]
+
+                post_ids = list(dict.fromkeys(f"{post_id}" for _, post_id in batch))
+                try:
+                    written_now, failed = cls.write_batch(post_ids=post_ids)
+                except Exception as ex:
+                    logger.warn(f"Could not sync {len(post_ids)} post(s) to MongoDB; they stay in the outbox: {ex}")
+                    break
+                written += written_now
+
+                _ = PostOutbox.objects.filter(id__in=[row_id for row_id, post_id in batch if f"{post_id}" not in failed]).delete()
+                if failed:
+                    _ = PostOutbox.objects.filter(id__in=[row_id for row_id, post_id in batch if f"{post_id}" in failed]) \
+                        .update(attempts=F("attempts") + 1)
+                LatestPostsFeed.invalidate()
+        finally:
+            if lock:
+                try:
+                    lock.release()
+                except Exception as ex:
+                    logger.warn(f"Could not release the post outbox lock: {ex}")
+
+        ## Rows committed after the last read, whose drain found the lock taken, would otherwise wait for the cron.
+        if drained and PostOutbox.objects.filter(id__gt=last_id, attempts__lt=cls.MAX_ATTEMPTS).exists():
+            cls.schedule()
+
+        return written
+
+    @classmethod
+    def rebuild(cls, batch_size: int = BATCH_SIZE, prune: bool = False) -> dict:
+        """
+        Rewrite the document of every post from Postgres; with `prune`, also delete documents of posts that are gone.
+        """
+        written = 0
+        post_ids = []
+        for post_id in Post.objects.order_by("created").values_list("id", flat=True).iterator(chunk_size=batch_size):
+            post_ids.append(f"{post_id}")
+            if len(post_ids) >= batch_size:
+                written += cls.write(post_ids=post_ids)
+                post_ids = []
+        written += cls.write(post_ids=post_ids)
+
+        pruned = 0
+        if prune:
+            stale = set(SynchronousMethods.distinct(field="_id", collection=DatabaseCollections.user_posts)) \
+                - {f"{post_id}" for post_id in Post.objects.values_list("id", flat=True)}
+            pruned = cls.write(post_ids=sorted(stale))
+
+        LatestPostsFeed.invalidate()
+        return {"written": written, "pruned": pruned}
+
+
+def drain_post_outbox() -> int:
+    return PostOutboxUtils.drain()
+
+
+def refresh_post_authors(user_id: str = None) -> int:
+    return PostOutboxUtils.refresh_author(user_id=user_id)
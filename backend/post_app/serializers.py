@@ -1,4 +1,5 @@
-from rest_framework.serializers import ModelSerializer
+from django.db.models import QuerySet
+from rest_framework.serializers import ModelSerializer, DateTimeField
 
 from post_app.models import Tag, Post
 from user_app.serializers import ShowUserSerializer
@@ -20,9 +21,52 @@ class PostInputSerializer(ModelSerializer):
 
 
 class PostOutputSerializer(ModelSerializer):
+    """
+    Declares the related objects it reads (`setup_queryset`) so that callers can fetch them up front, and offers a plain
+    dict fast path (`to_dict`) producing the same output without DRF's per-instance field machinery.
+    """
     tags = TagSerializer(many=True)
     author = ShowUserSerializer()
 
+    SELECT_RELATED = ("author",)
+    PREFETCH_RELATED = ("tags",)
+
+    _datetime = DateTimeField()
+
     class Meta:
         model = Post
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+    @classmethod
+    def setup_queryset(cls, queryset: QuerySet = None) -> QuerySet:
+        """
+        `queryset` with everything this serializer reads loaded in a fixed number of queries, whatever its size.
+        """
+        if queryset is None:
+            queryset = Post.objects.all()
+        return queryset.select_related(*cls.SELECT_RELATED).prefetch_related(*cls.PREFETCH_RELATED)
+
+    @classmethod
+    def datetime(cls, value):
+        return cls._datetime.to_representation(value) if value else None
+
+    @classmethod
+    def to_dict(cls, post: Post) -> dict:
+        author = post.author
+        return {
+            "id": f"{post.id}",
+            "tags": [{"name": tag.name} for tag in post.tags.all()],
+            "author": {
+                "id": f"{author.id}",
+                "username": author.username,
+                "email": author.email,
+                "date_joined": cls.datetime(author.date_joined),
+                "slug": author.slug
+            } if author else None,
+            "created": cls.datetime(post.created),
+            "updated": cls.datetime(post.updated),
+            "title": post.title,
+            "blurb": post.blurb,
+            "slug": post.slug,
+            "body": post.body
+        }
\ No newline at end of file
@@ -1,7 +1,9 @@
-from django.db.models.signals import post_save, pre_save, post_delete, pre_delete
+from django.db.models.signals import post_save, pre_save, post_delete, m2m_changed
 
+from post_app.caches import TagCache
 from post_app.models import Tag, Post
-from post_app.utils import PostModelUtils
+from post_app.outbox import PostOutboxUtils
+from user_app.models import User
 
 from post_app import logger
 
@@ -11,20 +13,83 @@ class PostSignalReciever:
     @classmethod
     def created(cls, sender, instance, created, *args, **kwargs):
         if created:
-            _ = PostModelUtils.insert_to_mongo(post=instance)
+            PostOutboxUtils.record(post_ids=[instance.id])
             logger.info(f"New Post: '{instance.__str__()}' created.")
 
     @classmethod
     def updated(cls, sender, instance, created, *args, **kwargs):
         if not created:
-            _ = PostModelUtils.update_mongo_record(post=instance)
+            PostOutboxUtils.record(post_ids=[instance.id])
             logger.info(f"Post: '{instance.__str__()}' updated.")
 
     @classmethod
-    def pre_delete(cls, sender, instance, *args, **kwargs):
-        _ = PostModelUtils.delete_mongo_record(post=instance)
+    def post_delete(cls, sender, instance, *args, **kwargs):
+        PostOutboxUtils.record(post_ids=[instance.id])
+
+    @classmethod
+    def tags_changed(cls, sender, instance, action, reverse, pk_set, *args, **kwargs):
+        """
+        `post_save` fires before a post's tags are set, so tag changes are recorded on their own.
+        """
+        if action not in ("post_add", "post_remove", "post_clear"):
+            return
+
+        if not reverse:
+            PostOutboxUtils.record(post_ids=[instance.id])
+        elif pk_set:
+            PostOutboxUtils.record(post_ids=pk_set)
 
 
 post_save.connect(receiver=PostSignalReciever.created, sender=PostSignalReciever.model)
 post_save.connect(receiver=PostSignalReciever.updated, sender=PostSignalReciever.model)
-pre_delete.connect(receiver=PostSignalReciever.pre_delete, sender=PostSignalReciever.model)
\ No newline at end of file
+post_delete.connect(receiver=PostSignalReciever.post_delete, sender=PostSignalReciever.model)
+m2m_changed.connect(receiver=PostSignalReciever.tags_changed, sender=PostSignalReciever.model.tags.through)
+
+
+class TagSignalReciever:
+    model = Tag
+
+    @classmethod
+    def post_delete(cls, sender, instance, *args, **kwargs):
+        TagCache.evict(name=instance.name)
+
+
+post_delete.connect(receiver=TagSignalReciever.post_delete, sender=TagSignalReciever.model)
+
+
+class AuthorSignalReciever:
+    """
+    Post documents carry a copy of their author; it is refreshed for all of an author's posts at once when the user changes.
+    """
+    model = User
+    FIELDS = ("username", "email")
+
+    @classmethod
+    def watches(cls, update_fields=None) -> bool:
+        return update_fields is None or any(field in update_fields for field in cls.FIELDS)
+
+    @classmethod
+    def pre_save(cls, sender, instance: User, *args, **kwargs):
+        if instance._state.adding or not cls.watches(update_fields=kwargs.get("update_fields")):
+            return
+        instance._author_before = User.objects.filter(pk=instance.pk).values_list(*cls.FIELDS).first()
+
+    @classmethod
+    def updated(cls, sender, instance: User, created, *args, **kwargs):
+        if created or not cls.watches(update_fields=kwargs.get("update_fields")):
+            return
+
+        #(prithoo): Most saves (logins, profile names, attempt counters) leave the copied fields alone.
+        before = instance.__dict__.pop("_author_before", None)
+        if before is not None and before == tuple(getattr(instance, field) for field in cls.FIELDS):
+            return
+        PostOutboxUtils.schedule_author_refresh(user_id=instance.id)
+
+    @classmethod
+    def post_delete(cls, sender, instance: User, *args, **kwargs):
+        PostOutboxUtils.schedule_author_refresh(user_id=instance.id)
+
+
+pre_save.connect(receiver=AuthorSignalReciever.pre_save, sender=AuthorSignalReciever.model)
+post_save.connect(receiver=AuthorSignalReciever.updated, sender=AuthorSignalReciever.model)
+post_delete.connect(receiver=AuthorSignalReciever.post_delete, sender=AuthorSignalReciever.model)
@@ -1,3 +1,174 @@
-from django.test import TestCase
+from unittest import mock, skipUnless
+from uuid import uuid4
 
-# Create your tests here.
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, override_settings
+from pymongo.errors import BulkWriteError
+
+from post_app.feeds import LatestPostsFeed
+from post_app.models import PostOutbox
+from post_app.outbox import PostOutboxUtils
+from user_app.models import User
+
+
+@override_settings(USE_REDIS=False)
+class PostOutboxTestCase(TestCase):
+
+    def setUp(self):
+        self.post_ids = [f"{uuid4()}" for _ in range(3)]
+        _ = PostOutbox.objects.bulk_create([PostOutbox(post_id=post_id) for post_id in self.post_ids])
+
+    def failing_write(self, post_id: str):
+        def bulk_write(operations: list = None, **kwargs):
+            index = [operation._filter["_id"] for operation in operations].index(post_id)
+            raise BulkWriteError({"writeErrors": [{"index": index, "errmsg": "boom"}], "writeConcernErrors": []})
+        return bulk_write
+
+    def test_drain_empties_the_outbox(self):
+        with mock.patch("post_app.outbox.SynchronousMethods.bulk_write") as bulk_write:
+            written = PostOutboxUtils.drain()
+
+        self.assertEqual(written, 3)
+        self.assertEqual(bulk_write.call_count, 1)
+        self.assertFalse(PostOutbox.objects.exists())
+
+    def test_failing_post_does_not_block_the_rest(self):
+        bad = self.post_ids[0]
+        with mock.patch("post_app.outbox.SynchronousMethods.bulk_write", side_effect=self.failing_write(bad)):
+            written = PostOutboxUtils.drain()
+
+        self.assertEqual(written, 2)
+        self.assertEqual(list(PostOutbox.objects.values_list("attempts", flat=True)), [1])
+        self.assertEqual(f"{PostOutbox.objects.get().post_id}", bad)
+
+    def test_failing_post_is_parked(self):
+        bad = self.post_ids[0]
+        with mock.patch("post_app.outbox.SynchronousMethods.bulk_write", side_effect=self.failing_write(bad)):
+            for _ in range(PostOutboxUtils.MAX_ATTEMPTS):
+                _ = PostOutboxUtils.drain()
+
+        with mock.patch("post_app.outbox.SynchronousMethods.bulk_write") as bulk_write:
+            written = PostOutboxUtils.drain()
+
+        self.assertEqual(written, 0)
+        bulk_write.assert_not_called()
+        self.assertEqual(PostOutbox.objects.get().attempts, PostOutboxUtils.MAX_ATTEMPTS)
+
+    def test_unreachable_mongo_keeps_the_rows(self):
+        with mock.patch("post_app.outbox.SynchronousMethods.bulk_write", side_effect=ConnectionError("down")):
+            written = PostOutboxUtils.drain()
+
+        self.assertEqual(written, 0)
+        self.assertEqual(list(PostOutbox.objects.values_list("attempts", flat=True)), [0, 0, 0])
+
+    def test_running_drain_is_not_waited_on(self):
+        lock = mock.Mock()
+        lock.acquire.return_value = False
+        redis = mock.Mock()
+        redis.lock.return_value = lock
+        with mock.patch.object(PostOutboxUtils, "get_redis", return_value=redis), \
+                mock.patch("post_app.outbox.SynchronousMethods.bulk_write") as bulk_write:
+            written = PostOutboxUtils.drain()
+
+        self.assertEqual(written, 0)
+        lock.acquire.assert_called_once_with(blocking=False)
+        redis.delete.assert_called_once_with(PostOutboxUtils.SCHEDULED_KEY)
+        bulk_write.assert_not_called()
+        self.assertEqual(PostOutbox.objects.count(), 3)
+
+    def test_rows_committed_after_the_last_read_are_scheduled(self):
+        lock = mock.Mock()
+        lock.acquire.return_value = True
+        ## A post committed after the drain read the outbox for the last time, whose own drain found the lock taken.
+        lock.release.side_effect = lambda: PostOutbox.objects.create(post_id=f"{uuid4()}")
+        redis = mock.Mock()
+        redis.lock.return_value = lock
+        with mock.patch.object(PostOutboxUtils, "get_redis", return_value=redis), \
+                mock.patch.object(PostOutboxUtils, "schedule") as schedule, \
+                mock.patch("post_app.outbox.SynchronousMethods.bulk_write"):
+            written = PostOutboxUtils.drain()
+
+        self.assertEqual(written, 3)
+        schedule.assert_called_once_with()
+        self.assertEqual(PostOutbox.objects.count(), 1)
+
+class AuthorSignalRecieverTestCase(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username="author.001", email="author.001@email.com", password="R4nd0mPa$$word")
+
+    def test_unrelated_saves_do_not_refresh(self):
+        with mock.patch("post_app.signals.PostOutboxUtils.schedule_author_refresh") as refresh:
+            self.user.first_name = "Author"
+            self.user.save(update_fields=["first_name"])
+            self.user.save()
+
+        refresh.assert_not_called()
+
+    def test_username_change_refreshes(self):
+        with mock.patch("post_app.signals.PostOutboxUtils.schedule_author_refresh") as refresh:
+            self.user.username = "author.002"
+            self.user.save()
+
+        refresh.assert_called_once_with(user_id=self.user.id)
+
+
+@override_settings(USE_REDIS=False)
+class LatestPostsFeedWithoutRedisTestCase(SimpleTestCase):
+
+    def test_nothing_is_cached(self):
+        LatestPostsFeed.write(version=0, page=1, data={"results": []})
+
+        self.assertEqual(LatestPostsFeed.read(page=1), (None, None))
+
+
+@skipUnless(settings.USE_REDIS, "Redis is off.")
+class LatestPostsFeedTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.patches = [
+            mock.patch.object(LatestPostsFeed, "KEY_PREFIX", "test:post_feed"),
+            mock.patch.object(LatestPostsFeed, "VERSION_KEY", "test:post_feed:version"),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        redis = settings.REDIS_CONN
+        keys = list(redis.scan_iter(match=f"{LatestPostsFeed.KEY_PREFIX}:*"))
+        if keys:
+            redis.delete(*keys)
+        for patch in self.patches:
+            patch.stop()
+
+    def test_page_is_served_until_invalidated(self):
+        version, cached = LatestPostsFeed.read(page=1)
+        self.assertIsNone(cached)
+
+        LatestPostsFeed.write(version=version, page=1, data={"results": [{"title": "Hello"}]})
+        self.assertEqual(LatestPostsFeed.read(page=1), (version, {"results": [{"title": "Hello"}]}))
+
+        LatestPostsFeed.invalidate()
+        self.assertEqual(LatestPostsFeed.read(page=1), (version + 1, None))
+
+    def test_page_built_before_a_write_is_never_served(self):
+        version, _ = LatestPostsFeed.read(page=1)
+        LatestPostsFeed.invalidate()
+        LatestPostsFeed.write(version=version, page=1, data={"results": [{"title": "Stale"}]})
+
+        self.assertEqual(LatestPostsFeed.read(page=1), (version + 1, None))
+
+    def test_pages_and_cursors_are_cached_apart(self):
+        version, _ = LatestPostsFeed.read(page=1)
+        LatestPostsFeed.write(version=version, page=1, data={"page": 1})
+        LatestPostsFeed.write(version=version, cursor="abc", data={"cursor": "abc"})
+
+        self.assertEqual(LatestPostsFeed.read(page=1)[1], {"page": 1})
+        self.assertEqual(LatestPostsFeed.read(cursor="abc")[1], {"cursor": "abc"})
+
+    def test_deep_pages_are_not_cached(self):
+        page = LatestPostsFeed.CACHED_PAGES + 1
+        version, _ = LatestPostsFeed.read(page=1)
+        LatestPostsFeed.write(version=version, page=page, data={"page": page})
+
+        self.assertEqual(LatestPostsFeed.read(page=page), (None, None))
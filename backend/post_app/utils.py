@@ -1,12 +1,21 @@
+import re
 from typing import Optional, List
+from uuid import UUID
 
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import transaction
 from django.db.models import Q, QuerySet
 
+from pymongo.errors import OperationFailure
 from rest_framework import status
 
-from core.boilerplate.response_template import Resp
+from core.boilerplate.response_template import Resp, invalid_cursor_resp
 from database.collections import DatabaseCollections
 from database.methods import AsynchronousMethods, SynchronousMethods
+from database.pagination import InvalidCursor
+from post_app.caches import TagCache
+from post_app.constants import PostDocumentConstants, PostSearchConstants
+from post_app.feeds import LatestPostsFeed
 from post_app.models import Tag, Post
 from post_app.serializers import TagSerializer, PostInputSerializer, PostOutputSerializer
 from user_app.models import User
@@ -24,16 +33,58 @@ class TagModelUtils:
             return Tag.objects.filter(name=name).first()
         
     @classmethod
-    def search(cls, term:str=None)->List[Tag]:
-        return Tag.objects.filter(
-            Q(pk__icontains=term)
-            | Q(name__icontains=term)
-        ).order_by("name")
+    def search(cls, term:str=None, limit:int=None)->List[Tag]:
+        """
+        Tags whose name contains `term` (served by the trigram index on `name`), most similar first;
+        a UUID is looked up by primary key instead.
+        """
+        if not term:
+            return Tag.objects.none()
+
+        try:
+            return Tag.objects.filter(pk=UUID(term))
+        except ValueError:
+            pass
+
+        term = term.strip().lower()
+        tags = Tag.objects.filter(name__contains=term).annotate(
+            rank=TrigramSimilarity("name", term)
+        ).order_by("-rank", "name")
+
+        return tags[:limit] if limit else tags
     
     @classmethod
     def create(cls, name:str=None)->Tag:
         tag, _ = Tag.objects.get_or_create(name=name.lower())
         return tag
+
+    @classmethod
+    def resolve(cls, names:List[str]=None)->List[str]:
+        """
+        IDs of the tags called `names`, creating the missing ones, in the order given and without duplicates.
+        Costs no query when every name is cached, and at most three otherwise, however many tags there are.
+        """
+        names = list(dict.fromkeys(f"{name}".strip().lower() for name in names or [] if f"{name}".strip()))
+        if not names:
+            return []
+
+        tag_ids = TagCache.get_many(names=names)
+        missing = [name for name in names if name not in tag_ids]
+        if missing:
+            found = {name: f"{tag_id}" for name, tag_id in Tag.objects.filter(name__in=missing).values_list("name", "id")}
+
+            to_create = [name for name in missing if name not in found]
+            if to_create:
+                ## (prithoo): `ignore_conflicts` as another request may create the same tag in the meantime; hence the re-select.
+                _ = Tag.objects.bulk_create([Tag(name=name) for name in to_create], ignore_conflicts=True)
+                found.update(
+                    {name: f"{tag_id}" for name, tag_id in Tag.objects.filter(name__in=to_create).values_list("name", "id")}
+                )
+
+            TagCache.set_many(tags=found)
+            tag_ids.update(found)
+
+        return [tag_ids[name] for name in names if name in tag_ids]
     
 
 class PostModelUtils:
@@ -44,12 +95,18 @@ class PostModelUtils:
         "body"
     )
 
+    @classmethod
+    def queryset(cls)->QuerySet:
+        """
+        Posts with their author and tags loaded for `PostOutputSerializer`.
+        """
+        return PostOutputSerializer.setup_queryset(Post.objects.all())
 
     @classmethod
     def get(cls, id:str=None)->Resp:
         resp = Resp()
 
-        obj = Post.objects.filter(pk=id).first()
+        obj = cls.queryset().filter(pk=id).first()
         if not obj:
             resp.error = "Post Not Found"
             resp.message = f"Post with ID: '{id}' not found."
@@ -59,7 +116,7 @@ class PostModelUtils:
             logger.warn(resp.to_text())
             return resp
         
-        serialized = PostOutputSerializer(obj).data
+        serialized = PostOutputSerializer.to_dict(post=obj)
 
         resp.message = f"{obj.__repr__()} retrieved successfully."
         resp.data = serialized
@@ -75,8 +132,8 @@ class PostModelUtils:
         to_store = data.copy()
 
         to_store["author"] = f"{user.id}"
-        if to_store.get("tags"):
-            to_store["tags"] = [TagModelUtils.create(name=item).id for item in to_store.get("tags")]
+        #(prithoo): Tags are set from the resolved IDs directly; validating them as `PrimaryKeyRelatedField`s costs a query each.
+        tag_ids = TagModelUtils.resolve(names=to_store.pop("tags", None))
 
         deserialized = PostInputSerializer(data=to_store)
         if not deserialized.is_valid():
@@ -88,9 +145,11 @@ class PostModelUtils:
             logger.warn(resp.to_text())
             return resp
         
-        deserialized.save()
-
-        _ = cls.update_tags_in_mongo(post=deserialized.instance)
+        ## (prithoo): The post, its tags and its `PostOutbox` rows commit together.
+        with transaction.atomic():
+            deserialized.save()
+            if tag_ids:
+                deserialized.instance.tags.set(tag_ids)
 
         resp.message = "Post saved successfully."
         resp.data = PostOutputSerializer(deserialized.instance).data
@@ -103,7 +162,7 @@ class PostModelUtils:
     def update(cls, user:User=None, id:str=None, data:dict=None, *args, **kwargs)->Resp:
         resp = Resp()
 
-        obj = Post.objects.filter(
+        obj = cls.queryset().filter(
             Q(pk=id)
             & Q(author=user)
         ).first()
@@ -140,8 +199,8 @@ class PostModelUtils:
             logger.warn(resp.to_text())
             return resp
         
-        deserialized.save()
-        _ = cls.update_tags_in_mongo(post=deserialized.instance)
+        with transaction.atomic():
+            deserialized.save()
 
         resp.message = f"User Post '{obj.__str__()}' updated successfully."
         resp.data = PostOutputSerializer(instance=deserialized.instance).data
@@ -154,7 +213,7 @@ class PostModelUtils:
     def update_tags(cls, user:User=None, id:str=None, data:List[str]=None, *args, **kwargs)->Resp:
         resp = Resp()
 
-        obj = Post.objects.filter(
+        obj = cls.queryset().filter(
             Q(pk=id)
             & Q(author=user)
         ).first()
@@ -167,9 +226,10 @@ class PostModelUtils:
             logger.warn(resp.to_text())
             return resp
         
-        obj.tags.set([TagModelUtils.create(name=item) for item in data])
-        obj.save()
-        _ = cls.update_tags_in_mongo(post=obj)
+        tags = TagModelUtils.resolve(names=data)
+        with transaction.atomic():
+            obj.tags.set(tags)
+            obj.save()
 
         resp.message = f"Tags updated successfully for '{obj.__str__()}'."
         resp.data = PostOutputSerializer(obj).data
@@ -182,7 +242,7 @@ class PostModelUtils:
     def delete(cls, user:User=None, id:str=None)->Resp:
         resp = Resp()
 
-        obj = Post.objects.filter(
+        obj = cls.queryset().filter(
             Q(pk=id)
             & Q(author=user)
         ).first()
@@ -196,7 +256,8 @@ class PostModelUtils:
             return resp
         
         obj_data = PostOutputSerializer(obj).data
-        obj.delete()
+        with transaction.atomic():
+            obj.delete()
 
         resp.message = f"Post '{obj_data.get('id')}' deleted successfully."
         resp.data = obj_data
@@ -206,80 +267,85 @@ class PostModelUtils:
         return resp
 
     @classmethod
-    def insert_to_mongo(cls, post:Post)->None:
-        data = {
-            "_id": f"{post.id}",
-            "title": post.title,
-            "author": {
-                "_id": f"{post.author.id}",
-                "username": post.author.username,
-                "email": post.author.email 
-            },
-            "blurb": post.blurb,
-            "created": post.created,
-            "updated": post.updated
-        }
-
-        try:
-            _ = SynchronousMethods.insert_one(data=data, collection=DatabaseCollections.user_posts)
-        except Exception as ex:
-            logger.warn(f"{ex}")
-
+    def exact_filter(cls, term:str)->dict:
+        """
+        Filters for terms that can only mean one thing, served by a plain index lookup instead of a search.
+        """
+        term = term.strip()
+        if PostSearchConstants.uuid_regex.match(term):
+            return {"_id": f"{UUID(term)}"}
+        if PostSearchConstants.email_regex.match(term):
+            return {"author.email": term.lower()}
         return None
-    
+
     @classmethod
-    def update_tags_in_mongo(cls, post:Post)->None:
+    def text_filter(cls, term:str)->dict:
         """
-        Separate callable function to update the tags for a user post as 'ManyToMany' relation is trash in Django and the 
-        `post_save` signal cannot handle the relationship.
+        Full-text match against the `post_text` index, plus a prefix match on tags for every word of the term.
         """
-        _id = f"{post.id}"
-        data = {
-            "tags": [i.name for i in post.tags.all()]
+        tags = [word.lstrip("#") for word in term.strip().lower().split() if word.lstrip("#")]
+        return {
+            "$or": [
+                {"$text": {"$search": term}}
+            ] + [
+                {"tags": {"$regex": f"^{re.escape(tag)}"}} for tag in tags
+            ]
         }
-        try:
-            _ = SynchronousMethods.update_one(_id=_id, data=data, collection=DatabaseCollections.user_posts)
-        except Exception as ex:
-            logger.warn(f"{ex}")
 
-        return None
-    
     @classmethod
-    def update_mongo_record(cls, post:Post)->None:
-        _id = f"{post.id}"
-
-        data = {
-            "title": post.title,
-            "author": {
-                "_id": f"{post.author.id}",
-                "username": post.author.username,
-                "email": post.author.email 
-            },
-            "blurb": post.blurb,
-            "created": post.created,
-            "updated": post.updated
-        }
+    def search(cls, term:str, page:int=1, cursor:str=None, mode:str=PostSearchConstants.TEXT_MODE)->Resp:
+        """
+        Search user posts.
 
-        record = SynchronousMethods.update_one(_id=_id, data=data, collection=DatabaseCollections.user_posts)
-        tags = cls.update_tags_in_mongo(post=post)
-        if not record or not tags:
-            logger.warn(f"Could not update the MongoDB record of User Post: '{_id}' in the {DatabaseCollections.user_posts} collection.")
+        In `text` mode (default) the term is matched against the text index and results are ranked by relevance,
+        with exact lookups for post IDs and author emails; `hits` is capped at `PostSearchConstants.HITS_LIMIT`.
+        `regex` mode is the unindexed substring search, kept for callers that need substring matches or cursors.
+        """
+        if mode == PostSearchConstants.REGEX_MODE or not term or not term.strip():
+            return cls.search_by_regex(term=term or "", page=page, cursor=cursor)
 
-        return None
-    
-    @classmethod
-    def delete_mongo_record(cls, post:Post)->None:
-        _id = f"{post.id}"
-        filter_dict = {
-            "_id": _id
-        }
+        resp = Resp()
+        filter_dict = cls.exact_filter(term=term)
+        next_cursor = None
         try:
-            _ = SynchronousMethods.delete(filter_dict=filter_dict, collection=DatabaseCollections.user_posts)
-        except Exception as ex:
-            logger.warn(f"{ex}")
+            if filter_dict:
+                results, next_cursor = SynchronousMethods.paginate(filter_dict=filter_dict, collection=DatabaseCollections.user_posts, sort_field="created", page=page, cursor=cursor, projection=PostDocumentConstants.LIST_PROJECTION)
+            else:
+                filter_dict = cls.text_filter(term=term)
+                results = SynchronousMethods.text_search(filter_dict=filter_dict, collection=DatabaseCollections.user_posts, tie_breaker="created", page=page, projection=PostDocumentConstants.LIST_PROJECTION)
+            item_count = SynchronousMethods.count_documents(filter_dict=filter_dict, collection=DatabaseCollections.user_posts, limit=PostSearchConstants.HITS_LIMIT)
+        except InvalidCursor as ex:
+            return invalid_cursor_resp(cursor=cursor, message=f"{ex}")
+        except OperationFailure as ex:
+            logger.warn(f"Text search unavailable on '{DatabaseCollections.user_posts}', falling back to regex search: {ex}")
+            return cls.search_by_regex(term=term, page=page, cursor=cursor)
+
+        if not results:
+            resp.error = "No Results Found"
+            resp.message = f"No user posts found matching '{term}'."
+            resp.data = {
+                "term": term,
+                "page": page
+            }
+            resp.status_code = status.HTTP_404_NOT_FOUND
+
+            logger.warn(resp.to_text())
+            return resp
+
+        resp.message = f"{len(results)} items retrieved"
+        resp.data = {
+            "page": page,
+            "next": next_cursor,
+            "hits": item_count,
+            "results": results
+        }
+        resp.status_code = status.HTTP_200_OK
+
+        logger.info(resp.message)
+        return resp
 
     @classmethod
-    def search(cls, term:str, page:int=1)->Resp:
+    def search_by_regex(cls, term:str, page:int=1, cursor:str=None)->Resp:
         resp = Resp()
         filter_dict = {
             "$or": [
@@ -309,7 +375,11 @@ class PostModelUtils:
             ]
         }
 
-        results = SynchronousMethods.find_and_order(filter_dict=filter_dict, collection=DatabaseCollections.user_posts, sort_field="created", page=page)
+        try:
+            results, next_cursor = SynchronousMethods.paginate(filter_dict=filter_dict, collection=DatabaseCollections.user_posts, sort_field="created", page=page, cursor=cursor, projection=PostDocumentConstants.LIST_PROJECTION)
+        except InvalidCursor as ex:
+            return invalid_cursor_resp(cursor=cursor, message=f"{ex}")
+
         item_count = SynchronousMethods.count_documents(filter_dict=filter_dict, collection=DatabaseCollections.user_posts)
         if not results:
             resp.error = "No Results Found"
@@ -326,6 +396,7 @@ class PostModelUtils:
         resp.message = f"{len(results)} items retrieved"
         resp.data = {
             "page": page,
+            "next": next_cursor,
             "hits": item_count,
             "results": results
         }
@@ -335,19 +406,35 @@ class PostModelUtils:
         return resp
 
     @classmethod
-    def get_all(cls, page:int=1)->Resp:
+    def get_all(cls, page:int=1, cursor:str=None)->Resp:
         resp = Resp()
 
-        results = SynchronousMethods.find_and_order(collection=DatabaseCollections.user_posts, sort_field='created', page=page)
-        total = SynchronousMethods.count_documents(collection=DatabaseCollections.user_posts)
+        version, cached = LatestPostsFeed.read(page=page, cursor=cursor)
+        if cached:
+            resp.message = "Latest posts retrieved successfully"
+            resp.data = cached
+            resp.status_code = status.HTTP_200_OK
+
+            logger.info(resp.message)
+            return resp
+
+        try:
+            results, next_cursor = SynchronousMethods.paginate(collection=DatabaseCollections.user_posts, sort_field='created', page=page, cursor=cursor, projection=PostDocumentConstants.LIST_PROJECTION)
+        except InvalidCursor as ex:
+            return invalid_cursor_resp(cursor=cursor, message=f"{ex}")
+
+        total = SynchronousMethods.estimated_count(collection=DatabaseCollections.user_posts)
         resp.message = "Latest posts retrieved successfully"
         resp.data = {
             "page": page,
+            "next": next_cursor,
             "total": total,
             "results": results
         }
         resp.status_code = status.HTTP_200_OK
 
+        LatestPostsFeed.write(version=version, page=page, cursor=cursor, data=resp.data)
+
         logger.info(resp.message)
         return resp
 
@@ -1,2 +1,3 @@
 python manage.py makemigrations
-python manage.py migrate --noinput
\ No newline at end of file
+python manage.py migrate --noinput
+python manage.py ensure_mongo_indexes
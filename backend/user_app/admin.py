@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from user_app.models import User, UserProfile, UserLoginOTP, UserPasswordResetToken, UserToken, UserTokenUsage
+from user_app.models import User, UserProfile, UserLoginOTP, UserPasswordResetToken, UserToken, UserTokenUsage, UserTokenUsageRollup
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
@@ -70,3 +70,17 @@ class UserTokenUsageAdmin(admin.ModelAdmin):
     )
     raw_id_fields = ("token",)
     ordering = ("-created",)
+
+
+@admin.register(UserTokenUsageRollup)
+class UserTokenUsageRollupAdmin(admin.ModelAdmin):
+    list_display = ("id", "token", "window", "hits")
+    search_fields = (
+        "id",
+        "token__alias",
+        "token__user__id",
+        "token__user__username",
+        "token__user__email"
+    )
+    raw_id_fields = ("token",)
+    ordering = ("-window",)
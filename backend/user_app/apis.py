@@ -2,9 +2,8 @@ from rest_framework import status
 from rest_framework.permissions import IsAdminUser, IsAuthenticated, AllowAny
 from rest_framework.request import Request
 from rest_framework.views import APIView
-from rest_framework_simplejwt.authentication import JWTAuthentication
 
-from auth.authentication import TokenAuthentication
+from auth.authentication import JWTAuthentication, TokenAuthentication
 from core.boilerplate.response_template import Resp
 from user_app.serializers import ShowUserSerializer
 from user_app.helpers import UserModelHelpers, UserProfileModelHelpers, UserTokenHelpers
@@ -120,8 +119,9 @@ class UserAPI(APIView):
     def post(self, request: Request, page: int = 1, *args, **kwargs):
         term = request.query_params.get("term", "")
         page = int(request.query_params.get("page", 1))
+        cursor = request.query_params.get("cursor")
 
-        resp = UserModelHelpers.search(term=term, page=page)
+        resp = UserModelHelpers.search(term=term, page=page, cursor=cursor)
 
         return resp.to_response()
 
@@ -156,8 +156,9 @@ class WhiteListIpAddressAPI(APIView):
         Get all IP addresses whitelisted for user.
         """
         page = int(request.query_params.get("page", 1))
+        cursor = request.query_params.get("cursor")
         resp = UserModelHelpers.get_whitelisted_ips(
-            user=request.user, page=page)
+            user=request.user, page=page, cursor=cursor)
 
         return resp.to_response()
 
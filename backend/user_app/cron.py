@@ -7,6 +7,7 @@ from django.db.models import Q
 from django.utils import timezone
 
 from user_app.models import User, UserLoginOTP, UserToken
+from user_app.usage import TokenUsageCounter
 
 class DeleteInactiveUsers(CronJobBase):
     """
@@ -45,6 +46,7 @@ class DeleteAbandonedUsers(CronJobBase):
 class DeleteExpiredLoginOTPs(CronJobBase):
     """
     Deletes expired Login OTPs.
+    Only needed while OTPs are stored in Postgres; with `SHORT_SECRETS_IN_REDIS` they expire on their own.
     """
     RUN_EVERY_MINUTES = 5 # Run every 5 minutes
     schedule = Schedule(run_every_mins=RUN_EVERY_MINUTES)
@@ -72,4 +74,18 @@ class DeleteExpiredUserLoginTokens(CronJobBase):
         NOW: datetime = timezone.now()
         _ = UserToken.objects.filter(
             expires_at__lte=NOW
-        ).delete()
\ No newline at end of file
+        ).delete()
+
+
+class FlushTokenUsage(CronJobBase):
+    """
+    Writes the permanent token usage counted in Redis as `UserTokenUsageRollup` rows.
+    """
+
+    RUN_EVERY_MINUTES = 1 # Run every minute
+    schedule = Schedule(run_every_mins=RUN_EVERY_MINUTES)
+
+    code = 'flush_token_usage'
+
+    def do(self):
+        _ = TokenUsageCounter.flush()
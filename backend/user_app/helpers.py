@@ -1,28 +1,32 @@
 from datetime import datetime, timezone, timedelta
+from decimal import Decimal, InvalidOperation
 from typing import List, Dict
-from uuid import uuid4
+from uuid import UUID, uuid4
 
 from django.conf import settings
 from django.contrib.auth.hashers import make_password, check_password
-from django.core.paginator import Paginator
-from django.db.models import Q, QuerySet
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db.models import DecimalField, Q, QuerySet
+from django.db.models.functions import Cast, Greatest
 from django.http import HttpRequest
 from django.utils import timezone
 
 from rest_framework import status
 
 from communications_app.email_utils import DjangoEmailUtils
-from core.boilerplate.response_template import Resp
+from core.boilerplate.response_template import Resp, invalid_cursor_resp
 from core.settings import MAC_HEADER
 from database.collections import DatabaseCollections
 from database.methods import SynchronousMethods
-from database.synchronous import s_db
+from database.pagination import CursorPagination, InvalidCursor
+from middleware_app.caches import KnownAddressCache
 from user_app.models import User, UserProfile, UserLoginOTP, UserPasswordResetToken, UserToken
 from user_app.model_choices import UserModelChoices
 from user_app.serializers import UserRegisterSerializer, ShowUserSerializer, UserProfileInputSerializer, UserProfileOutputSerializer,\
     UserLoginOTPInputSerializer, UserLoginOTPOutputSerializer, UserPasswordResetTokenInputSerializer, UserPasswordResetTokenOutputSerializer, \
     UserTokenInputSerializer, UserTokenOutputSerializer, UserTokenUsageInputSerializer, UserTokenUsageOutputSerializer
-from user_app.utils import JWTUtils, LoginOTPUtils, UserTokenUtils
+from user_app.stores import LoginOTPStore
+from user_app.utils import JWTUtils, LoginAttemptUtils, LoginOTPUtils, UserTokenUtils
 
 from user_app import logger
 
@@ -67,28 +71,92 @@ class UserModelHelpers:
         return resp
 
     @classmethod
-    def search(cls, term: str = None, page: int = 1, *args, **kwargs) -> Resp:
+    def exact_search(cls, term: str = None) -> QuerySet:
+        """
+        Fast paths served by unique indexes: a UUID is a user or profile ID, an email address is matched as a whole.
+        Returns None when the term is neither, or when nothing matched exactly.
+        """
+        try:
+            users = UserProfile.objects.filter(Q(pk=UUID(term)) | Q(user__pk=UUID(term))).select_related("user")
+            return users if users else None
+        except ValueError:
+            pass
+
+        if "@" in term:
+            users = UserProfile.objects.filter(user__email=term.lower()).select_related("user")
+            return users if users else None
+
+        return None
+
+    @classmethod
+    def ranked_search(cls, term: str = None, page: int = 1, cursor: str = None) -> tuple:
+        """
+        Match `term` against usernames, emails and names (each backed by a trigram index), best match first.
+
+        Paginated by keyset on `(rank, id)` when a cursor is given (and for the first page), by offset otherwise; there is
+        never a `COUNT(*)`: one extra row is fetched to tell whether there is a next page.
+        The rank is cast to a fixed-point number so that the cursor compares exactly: a `real` would not survive the
+        round-trip through the cursor, and rows tied with the last one of a page would be skipped.
+        Returns the page and the cursor of the next page, if any.
+        """
+        lowered = term.lower()
+        users = UserProfile.objects.filter(
+            Q(user__username__contains=lowered)
+            | Q(user__email__contains=lowered)
+            | Q(first_name__icontains=term)
+            | Q(last_name__icontains=term)
+        ).annotate(
+            rank=Cast(
+                Greatest(
+                    TrigramWordSimilarity(term, "user__username"),
+                    TrigramWordSimilarity(term, "user__email"),
+                    TrigramWordSimilarity(term, "first_name"),
+                    TrigramWordSimilarity(term, "last_name")
+                ),
+                output_field=DecimalField(max_digits=7, decimal_places=6)
+            )
+        ).select_related("user").order_by("-rank", "-id")
+
+        if cursor:
+            rank, profile_id = CursorPagination.decode(cursor=cursor)
+            try:
+                rank, profile_id = Decimal(rank), UUID(profile_id)
+            except (InvalidOperation, TypeError, ValueError):
+                raise InvalidCursor(f"Invalid cursor '{cursor}'.")
+            users = users.filter(Q(rank__lt=rank) | Q(rank=rank, id__lt=profile_id))
+        elif page > 1:
+            users = users[(page-1)*settings.MAX_ITEMS_PER_PAGE:]
+
+        results = list(users[:settings.MAX_ITEMS_PER_PAGE+1])
+        if len(results) <= settings.MAX_ITEMS_PER_PAGE:
+            return results, None
+
+        results = results[:settings.MAX_ITEMS_PER_PAGE]
+        return results, CursorPagination.encode_key(value=f"{results[-1].rank}", _id=f"{results[-1].id}")
+
+    @classmethod
+    def search(cls, term: str = None, page: int = 1, cursor: str = None, *args, **kwargs) -> Resp:
         """
         Search for users via string argument.
         """
         resp = Resp()
+        term = term.strip() if term else term
         if not term:
             resp.error = "Invalid Data"
             resp.message = "Please provide a valid search term."
             resp.data = term
             resp.status_code = status.HTTP_400_BAD_REQUEST
 
-            logger.warn(resp.text())
+            logger.warn(resp.to_text())
             return resp
 
-        users = UserProfile.objects.filter(
-            Q(pk__icontains=term)
-            | Q(first_name__icontains=term)
-            | Q(last_name__icontains=term)
-            | Q(user__pk__icontains=term)
-            | Q(user__username__icontains=term)
-            | Q(user__email__icontains=term)
-        ).select_related("user").order_by("user__username")
+        next_cursor = None
+        try:
+            users = cls.exact_search(term=term) if not cursor else None
+            if users is None:
+                users, next_cursor = cls.ranked_search(term=term, page=page, cursor=cursor)
+        except InvalidCursor as ex:
+            return invalid_cursor_resp(cursor=cursor, message=f"{ex}")
 
         if not users:
             resp.error = "No Users Found"
@@ -96,18 +164,16 @@ class UserModelHelpers:
             resp.data = term
             resp.status_code = status.HTTP_200_OK
 
-            logger.info(resp.text())
+            logger.info(resp.to_text())
             return resp
 
-        paginated = Paginator(users, settings.MAX_ITEMS_PER_PAGE)
-        users = paginated.get_page(page)
-
         serialized = UserProfileOutputSerializer(users, many=True).data
 
         resp.message = "Search results obtained."
         resp.data = {
             "page": page,
-            "results": serialized
+            "results": serialized,
+            "next": next_cursor
         }
 
         logger.info(resp.message)
@@ -193,9 +259,12 @@ class UserModelHelpers:
             logger.warn(resp.message)
             return resp
 
-        user.unsuccessful_login_attempts = 0
-        user.blocked_until = timezone.now() + timezone.timedelta(minutes=blocked_until)
-        user.save()
+        LoginAttemptUtils.block(user=user, minutes=blocked_until)
+        return cls.blocked_response(user=user, blocked_until=blocked_until)
+
+    @classmethod
+    def blocked_response(cls, user: User = None, blocked_until: int = settings.OTP_ATTEMPT_TIMEOUT) -> Resp:
+        resp = Resp()
 
         resp.error = "User Blocked"
         resp.message = f"Too many unsuccessfull login attempts. User {user.email} is blocked for {blocked_until} minutes, until {user.blocked_until}."
@@ -239,8 +308,9 @@ class UserModelHelpers:
                     "timestampUtc": datetime.utcnow()
                 }
 
-                _ = SynchronousMethods.insert_one(
+                _ = SynchronousMethods.insert(
                     data=data, collection=DatabaseCollections.user_ips)
+                KnownAddressCache.remember(user_id=user, kind=KnownAddressCache.IP, value=ip)
             except Exception as ex:
                 logger.warn(f"{ex}")
 
@@ -283,12 +353,9 @@ class UserModelHelpers:
             return resp
 
         if not check_password(password=password, encoded=user.password):
-            user.unsuccessful_login_attempts += 1
-            user.save()
-
-            if user.unsuccessful_login_attempts > settings.OTP_ATTEMPT_LIMIT:
-                resp = cls.block_user(user=user)
-                return resp
+            attempts = LoginAttemptUtils.record_failure(user=user)
+            if attempts > settings.OTP_ATTEMPT_LIMIT:
+                return cls.blocked_response(user=user)
 
             resp.error = "Invalid Credentials"
             resp.message = "The entered password is incorrect."
@@ -296,20 +363,12 @@ class UserModelHelpers:
                 "username": username,
                 "email": email,
                 "password": password,
-                "attemptsLeft": settings.OTP_ATTEMPT_LIMIT - user.unsuccessful_login_attempts
+                "attemptsLeft": settings.OTP_ATTEMPT_LIMIT - attempts
             }
             resp.status_code = status.HTTP_403_FORBIDDEN
             return resp
 
-        if user.unsuccessful_login_attempts != 0:
-            user.unsuccessful_login_attempts = 0
-            user.save()
-        if user.blocked_until:
-            user.blocked_until = None
-            user.save()
-
-        user.last_login = timezone.now()
-        user.save()
+        LoginAttemptUtils.record_success(user=user)
 
         tokens = JWTUtils.get_tokens_for_user(user=user)
 
@@ -395,12 +454,10 @@ class UserModelHelpers:
     @classmethod
     def login_via_otp(cls, otp: str = None, otp_id: str = None) -> Resp:
         resp = Resp()
-        otp_object = UserLoginOTP.objects.filter(pk=otp_id).first()
+        check = LoginOTPStore.verify(secret_id=otp_id, secret=otp)
+        otp_object: UserLoginOTP = check.data
         if not otp_object:
-            resp.error = "Invalid OTP"
-            resp.message = "The OTP entered is invalid."
-            resp.status_code = status.HTTP_400_BAD_REQUEST
-            return resp
+            return check
 
         user = otp_object.user
 
@@ -410,36 +467,16 @@ class UserModelHelpers:
             resp.status_code = status.HTTP_401_UNAUTHORIZED
             return resp
 
-        if otp_object.otp_expires_at < timezone.now():
-            resp.error = "OTP Expired"
-            resp.message = "The OTP entered is expired; please request a new one."
-            resp.status_code = status.HTTP_400_BAD_REQUEST
-            return resp
+        if check.error:
+            attempts = LoginAttemptUtils.record_failure(user=user)
+            if attempts > settings.OTP_ATTEMPT_LIMIT:
+                return cls.blocked_response(user=user)
 
-        if not check_password(password=otp, encoded=otp_object.otp):
-            user.unsuccessful_login_attempts += 1
-            user.save()
-            if user.unsuccessful_login_attempts > settings.OTP_ATTEMPT_LIMIT:
-                resp = cls.block_user(user=user)
-                return resp
-
-            resp.error = "Invalid OTP"
-            resp.message = "The OTP entered is invalid."
-            resp.status_code = status.HTTP_400_BAD_REQUEST
-
-            logger.warn(resp.to_text())
-            return resp
+            check.data = None
+            logger.warn(check.to_text())
+            return check
 
-        if user.unsuccessful_login_attempts != 0:
-            user.unsuccessful_login_attempts = 0
-            user.save()
-
-        if user.blocked_until:
-            user.blocked_until = None
-            user.save()
-
-        user.last_login = timezone.now()
-        user.save()
+        LoginAttemptUtils.record_success(user=user)
 
         tokens = JWTUtils.get_tokens_for_user(user=user)
 
@@ -471,7 +508,7 @@ class UserModelHelpers:
             data["timestamp"] = timezone.now().strftime(
                 '%Y-%m-%dT%H:%M:%S.%f%z')
 
-            return SynchronousMethods.insert_one(data=data, collection=DatabaseCollections.deleted_users)
+            return SynchronousMethods.insert(data=data, collection=DatabaseCollections.deleted_users)
         except Exception as ex:
             logger.warn(f"{ex}")
             return {}
@@ -516,7 +553,7 @@ class UserModelHelpers:
         return resp
 
     @classmethod
-    def get_whitelisted_ips(cls, user: User = None, page: int = 1) -> Resp:
+    def get_whitelisted_ips(cls, user: User = None, page: int = 1, cursor: str = None) -> Resp:
         resp = Resp()
 
         if not user:
@@ -534,12 +571,16 @@ class UserModelHelpers:
             "user": f"{user.id}"
         }
 
-        results = SynchronousMethods.find(
-            filter_dict=filter_dict, collection=DatabaseCollections.user_white_listed_ips, page=page)
+        try:
+            results, next_cursor = SynchronousMethods.paginate(
+                filter_dict=filter_dict, collection=DatabaseCollections.user_white_listed_ips, page=page, cursor=cursor)
+        except InvalidCursor as ex:
+            return invalid_cursor_resp(cursor=cursor, message=f"{ex}")
 
         resp.message = f"White-listed IP addresses for '{user.email}' retrieved successfully."
         resp.data = {
             "page": page,
+            "next": next_cursor,
             "results": results
         }
         resp.status_code = status.HTTP_200_OK
@@ -574,8 +615,9 @@ class UserModelHelpers:
                     logger.warn(
                         "This IP is already whitelisted for this user.")
                 else:
-                    _ = SynchronousMethods.insert_one(
+                    _ = SynchronousMethods.insert(
                         data=data, collection=DatabaseCollections.user_white_listed_ips)
+                KnownAddressCache.remember(user_id=f"{user.id}", kind=KnownAddressCache.IP, value=ip)
             except Exception as ex:
                 resp.error = "Error in MongoDB Insertion"
                 resp.message = f"{ex}"
@@ -661,6 +703,11 @@ class UserModelHelpers:
             logger.warn(resp.to_text())
             return resp
 
+        if ip and not _id:
+            KnownAddressCache.forget(user_id=f"{user.id}", kind=KnownAddressCache.IP, value=ip)
+        else:
+            KnownAddressCache.invalidate_user(user_id=f"{user.id}")
+
         resp.message = f"Whitelisted IP address {ip if ip else _id} deleted for {user.email}."
         resp.data = cls.get_whitelisted_ips(user=user).data
         resp.status_code = status.HTTP_200_OK
@@ -679,8 +726,9 @@ class UserModelHelpers:
                     "mac": mac,
                     "timestampUtc": datetime.utcnow()
                 }
-                _ = SynchronousMethods.insert_one(
+                _ = SynchronousMethods.insert(
                     data=data, collection=DatabaseCollections.user_mac_addresses)
+                KnownAddressCache.remember(user_id=user, kind=KnownAddressCache.MAC, value=mac)
             except Exception as ex:
                 logger.warn(f"{ex}")
 
@@ -817,7 +865,7 @@ class UserTokenHelpers:
 
         data = {
             "user": f"{user.id}",
-            "token": make_password(token_part),
+            "token": UserTokenUtils.hash_token(token_part),
             "alias": alias,
             "expires_at": expires_at
         }
@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-18 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_app', '0006_remove_usertoken_user_app_us_token_edeb74_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='usertoken',
+            index=models.Index(fields=['token'], name='user_app_us_token_edeb74_idx'),
+        ),
+    ]
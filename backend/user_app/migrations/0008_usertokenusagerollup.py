@@ -0,0 +1,43 @@
+# Generated by Django 4.2 on 2026-10-18 11:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_app', '0007_usertoken_user_app_us_token_edeb74_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserTokenUsageRollup',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False, unique=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('window', models.DateTimeField()),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('token', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='user_app.usertoken')),
+            ],
+            options={
+                'verbose_name': 'User Token Usage Rollup',
+                'verbose_name_plural': 'User Token Usage Rollups',
+                'ordering': ('-window', 'id'),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='usertokenusagerollup',
+            index=models.Index(fields=['id'], name='user_app_us_id_30359e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usertokenusagerollup',
+            index=models.Index(fields=['token', 'window'], name='user_app_us_token_i_59112b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usertokenusagerollup',
+            index=models.Index(fields=['window'], name='user_app_us_window_0882e2_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2 on 2026-10-18 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_app', '0008_usertokenusagerollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userloginotp',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userpasswordresettoken',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -3,8 +3,10 @@ from uuid import uuid4
 
 from django.contrib.auth.models import AbstractUser
 from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.core.validators import EmailValidator, RegexValidator
 from django.db import models
+from django.db.models.functions import Upper
 from django.template.defaultfilters import slugify
 from django.utils import timezone
 
@@ -68,7 +70,10 @@ class User(AbstractUser):
             models.Index(fields=('id',)),
             models.Index(fields=('username',)),
             models.Index(fields=('email',)),
-            models.Index(fields=('slug',))
+            models.Index(fields=('slug',)),
+            ## (prithoo): Trigram indexes serve the `contains` lookups of `UserModelHelpers.search`.
+            GinIndex(fields=('username',), name='user_username_trgm_idx', opclasses=('gin_trgm_ops',)),
+            GinIndex(fields=('email',), name='user_email_trgm_idx', opclasses=('gin_trgm_ops',))
         )
 
 
@@ -127,6 +132,9 @@ class UserProfile(TemplateModel):
         indexes = (
             models.Index(fields=('user',)),
             models.Index(fields=('first_name', 'last_name')),
+            ## (prithoo): Names are title-cased, so they are searched with `icontains`, i.e. on `UPPER(...)`.
+            GinIndex(OpClass(Upper('first_name'), name='gin_trgm_ops'), name='profile_first_name_trgm_idx'),
+            GinIndex(OpClass(Upper('last_name'), name='gin_trgm_ops'), name='profile_last_name_trgm_idx'),
         )
 
 
@@ -134,6 +142,7 @@ class UserLoginOTP(TemplateModel):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     otp = models.CharField(max_length=1024)
     otp_expires_at = models.DateTimeField()
+    attempts = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return f"OTP for {self.user.email} expiring at {self.otp_expires_at}"
@@ -160,6 +169,7 @@ class UserPasswordResetToken(TemplateModel):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     token = models.CharField(max_length=1024)
     token_expires_at = models.DateTimeField()
+    attempts = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return f"Password reset token for {self.user.email} expiring at {self.token_expires_at}"
@@ -211,6 +221,7 @@ class UserToken(TemplateModel):
         indexes = (
             models.Index(fields=('id',)),
             models.Index(fields=('user',)),
+            models.Index(fields=('token',)),
             models.Index(fields=('alias',)),
             models.Index(fields=('expires_at',))
         )
@@ -234,4 +245,30 @@ class UserTokenUsage(TemplateModel):
             models.Index(fields=('id',)),
             models.Index(fields=('token',)),
             models.Index(fields=('created',))
-        )
\ No newline at end of file
+        )
+
+
+class UserTokenUsageRollup(TemplateModel):
+    """
+    Number of requests made with a token during one minute, written in bulk by `user_app.usage.TokenUsageCounter`.
+    Rows are additive: sum `hits` over the windows of interest to get the usage of a token.
+    """
+    token = models.ForeignKey(UserToken, on_delete=models.CASCADE)
+    window = models.DateTimeField()
+    hits = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Token '{self.token_id}' used {self.hits} time(s) in the minute starting at {self.window}"
+
+    def __repr__(self):
+        return self.__str__()
+
+    class Meta:
+        verbose_name = 'User Token Usage Rollup'
+        verbose_name_plural = 'User Token Usage Rollups'
+        ordering = ('-window', 'id')
+        indexes = (
+            models.Index(fields=('id',)),
+            models.Index(fields=('token', 'window')),
+            models.Index(fields=('window',))
+        )
@@ -1,5 +1,6 @@
 from django.db.models.signals import post_save, pre_save, post_delete, pre_delete
 
+from auth.context import UserCache, TokenCache
 from user_app.models import User, UserProfile, UserLoginOTP, UserToken, UserTokenUsage
 from user_app.serializers import ShowUserSerializer
 from user_app.helpers import UserModelHelpers
@@ -19,10 +20,12 @@ class UserSignalReciever:
     @classmethod
     def updated(cls, sender, instance: User, created, *args, **kwargs):
         if not created:
+            UserCache.evict(user_id=instance.id)
             logger.info(f"User: '{instance.email}' updated.")
 
     @classmethod
     def pre_delete(cls, sender, instance, *args, **kwargs):
+        UserCache.evict(user_id=instance.id)
         _ = UserModelHelpers.insert_deleted_user_into_mongo(
             data=ShowUserSerializer(instance=instance).data)
 
@@ -48,7 +51,7 @@ class UserProfileSignalReciever:
         if not created:
             instance.user.first_name = instance.first_name
             instance.user.last_name = instance.last_name
-            instance.user.save()
+            instance.user.save(update_fields=["first_name", "last_name", "updated"])
 
             logger.info(f"Profile for user: '{instance.user.email}' updated.")
 
@@ -89,10 +92,12 @@ class UserTokenSignalReciever:
             logger.info(f"Token {instance.alias} for user: '{instance.user.email}' created.")
         
         else:
+            TokenCache.evict(hashed=instance.token)
             logger.info(f"Token {instance.alias} for user: '{instance.user.email}' updated.")
 
     @classmethod
     def post_delete(cls, sender, instance: UserToken, *args, **kwargs):
+        TokenCache.evict(hashed=instance.token)
         logger.info(f"Token {instance.alias} for user: '{instance.user.email}' deleted.")
 
 
@@ -0,0 +1,217 @@
+from datetime import datetime, timedelta
+from hashlib import sha256
+from hmac import compare_digest, new as hmac_new
+from uuid import uuid4
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password
+from django.db.models import F
+from django.utils import timezone
+
+from rest_framework import status
+
+from core.boilerplate.response_template import Resp
+from user_app.models import User, UserLoginOTP, UserPasswordResetToken
+
+from user_app import logger
+
+
+class ShortLivedSecretStore:
+    """
+    Storage for short-lived, single-use secrets (login OTPs, password reset tokens).
+
+    A 6 digit OTP that lives for 5 minutes gains nothing from a deliberately slow password hash: the secrets are stored as
+    a HMAC-SHA256 keyed with `SHORT_SECRET_PEPPER` and compared in constant time. A secret is consumed by its first
+    successful use and burnt after `MAX_ATTEMPTS` wrong guesses.
+
+    With `SHORT_SECRETS_IN_REDIS` the secrets are Redis hashes that expire on their own instead of rows, so nothing has to
+    clean them up; the model instances handed out are then unsaved and only carry the values.
+    Subclasses bind the store to a model.
+    """
+    MODEL = None
+    SECRET_FIELD: str = None
+    EXPIRY_FIELD: str = None
+    LABEL: str = None
+
+    KEY_PREFIX: str = "short_secret"
+    HMAC_PREFIX: str = "hmac_sha256$"
+    PEPPER: bytes = settings.SHORT_SECRET_PEPPER.encode("utf8")
+    MAX_ATTEMPTS: int = settings.SHORT_SECRET_MAX_ATTEMPTS
+
+    @classmethod
+    def get_redis(cls):
+        if not settings.SHORT_SECRETS_IN_REDIS:
+            return None
+        return settings.REDIS_CONN
+
+    @classmethod
+    def redis_key(cls, secret_id: str) -> str:
+        return f"{cls.KEY_PREFIX}:{cls.MODEL._meta.model_name}:{secret_id}"
+
+    @classmethod
+    def digest(cls, user_id: str, secret: str) -> str:
+        message = f"{cls.MODEL._meta.model_name}|{user_id}|{secret}".encode("utf8")
+        return f"{cls.HMAC_PREFIX}{hmac_new(cls.PEPPER, message, sha256).hexdigest()}"
+
+    @classmethod
+    def matches(cls, instance, secret: str = None) -> bool:
+        stored = getattr(instance, cls.SECRET_FIELD)
+        if not secret or not stored:
+            return False
+
+        #(prithoo): Secrets issued before this store were password hashes; they expire within minutes anyway.
+        if not stored.startswith(cls.HMAC_PREFIX):
+            return check_password(secret, stored)
+
+        return compare_digest(stored, cls.digest(user_id=instance.user_id, secret=secret))
+
+    @classmethod
+    def issue(cls, user: User, secret: str, expiry_minutes: int):
+        now = timezone.now()
+        instance = cls.MODEL(
+            id=uuid4(),
+            user=user,
+            created=now,
+            **{
+                cls.SECRET_FIELD: cls.digest(user_id=user.id, secret=secret),
+                cls.EXPIRY_FIELD: now + timedelta(minutes=expiry_minutes)
+            }
+        )
+
+        redis = cls.get_redis()
+        if redis:
+            key = cls.redis_key(instance.id)
+            pipe = redis.pipeline()
+            pipe.hset(
+                key,
+                mapping={
+                    "user": f"{user.id}",
+                    "secret": getattr(instance, cls.SECRET_FIELD),
+                    "created": now.isoformat(),
+                    "expires": getattr(instance, cls.EXPIRY_FIELD).isoformat(),
+                    "attempts": 0
+                }
+            )
+            pipe.expire(key, timedelta(minutes=expiry_minutes))
+            pipe.execute()
+            return instance
+
+        instance.save()
+        return instance
+
+    @classmethod
+    def get(cls, secret_id: str = None):
+        """
+        Load a secret and count one attempt against it; returns `(instance, attempts)`.
+        """
+        redis = cls.get_redis()
+        if redis:
+            key = cls.redis_key(secret_id)
+            pipe = redis.pipeline()
+            pipe.hgetall(key)
+            pipe.hincrby(key, "attempts", 1)
+            record, attempts = pipe.execute()
+            if not record:
+                redis.delete(key)
+                return None, 0
+
+            record = {field.decode("utf8"): value.decode("utf8") for field, value in record.items()}
+            instance = cls.MODEL(
+                id=secret_id,
+                user_id=record.get("user"),
+                created=datetime.fromisoformat(record.get("created")),
+                **{
+                    cls.SECRET_FIELD: record.get("secret"),
+                    cls.EXPIRY_FIELD: datetime.fromisoformat(record.get("expires"))
+                }
+            )
+            return instance, attempts
+
+        ## (prithoo): The attempt is counted before the row is read, so every concurrent guess reads a count that
+        ##            includes its own increment and the `MAX_ATTEMPTS` check cannot be raced past.
+        if not cls.MODEL.objects.filter(pk=secret_id).update(attempts=F("attempts") + 1):
+            return None, 0
+
+        instance = cls.MODEL.objects.filter(pk=secret_id).select_related("user").first()
+        if not instance:
+            return None, 0
+        return instance, instance.attempts
+
+    @classmethod
+    def discard(cls, instance) -> bool:
+        """
+        Delete the secret; returns whether this call is the one that deleted it.
+        """
+        redis = cls.get_redis()
+        if redis:
+            return redis.delete(cls.redis_key(instance.id)) == 1
+
+        _, deleted = cls.MODEL.objects.filter(pk=instance.pk).delete()
+        return deleted.get(cls.MODEL._meta.label, 0) == 1
+
+    @classmethod
+    def verify(cls, secret_id: str = None, secret: str = None) -> Resp:
+        """
+        Check `secret` against the secret `secret_id`.
+
+        On success `resp.data` is the (consumed) instance. On a wrong guess `resp.error` is set and `resp.data` is
+        still the instance, so that the caller can hold the attempt against its user; on any other error it is None.
+        """
+        resp = Resp()
+
+        try:
+            instance, attempts = cls.get(secret_id=secret_id)
+        except Exception as ex:
+            logger.warn(f"Could not load {cls.LABEL} '{secret_id}': {ex}")
+            instance, attempts = None, 0
+
+        if not instance:
+            resp.error = f"Invalid {cls.LABEL}"
+            resp.message = f"The {cls.LABEL} entered is invalid."
+            resp.status_code = status.HTTP_400_BAD_REQUEST
+            return resp
+
+        if getattr(instance, cls.EXPIRY_FIELD) < timezone.now():
+            cls.discard(instance=instance)
+
+            resp.error = f"{cls.LABEL} Expired"
+            resp.message = f"The {cls.LABEL} entered is expired; please request a new one."
+            resp.status_code = status.HTTP_400_BAD_REQUEST
+            return resp
+
+        if not cls.matches(instance=instance, secret=secret):
+            resp.error = f"Invalid {cls.LABEL}"
+            resp.message = f"The {cls.LABEL} entered is invalid."
+            resp.data = instance
+            resp.status_code = status.HTTP_400_BAD_REQUEST
+
+            if attempts >= cls.MAX_ATTEMPTS:
+                cls.discard(instance=instance)
+                resp.message = f"Too many wrong attempts; please request a new {cls.LABEL}."
+            return resp
+
+        ## Of concurrent correct submissions, only the one that consumes the secret succeeds.
+        if not cls.discard(instance=instance):
+            resp.error = f"Invalid {cls.LABEL}"
+            resp.message = f"The {cls.LABEL} entered was already used."
+            resp.status_code = status.HTTP_400_BAD_REQUEST
+            return resp
+
+        resp.data = instance
+        resp.message = f"{cls.LABEL} verified."
+        resp.status_code = status.HTTP_200_OK
+        return resp
+
+
+class LoginOTPStore(ShortLivedSecretStore):
+    MODEL = UserLoginOTP
+    SECRET_FIELD: str = "otp"
+    EXPIRY_FIELD: str = "otp_expires_at"
+    LABEL: str = "OTP"
+
+
+class PasswordResetTokenStore(ShortLivedSecretStore):
+    MODEL = UserPasswordResetToken
+    SECRET_FIELD: str = "token"
+    EXPIRY_FIELD: str = "token_expires_at"
+    LABEL: str = "Password Reset Token"
@@ -1,14 +1,20 @@
+from collections import Counter
 from jose import jwt
 from datetime import datetime, timedelta
+from unittest import mock, skipUnless
 
 from django.conf import settings
-from django.contrib.auth.hashers import make_password, check_password
-from django.test import TestCase
+from django.contrib.auth.hashers import make_password
+from django.test import TestCase, override_settings
 from django.utils import timezone
 
-from user_app.models import User, UserLoginOTP
+from auth.context import TokenCache, UserCache
+
+from user_app.models import User, UserLoginOTP, UserToken, UserTokenUsageRollup
 from user_app.helpers import UserModelHelpers
-from user_app.utils import JWTUtils, LoginOTPUtils, UserTokenUtils
+from user_app.stores import LoginOTPStore
+from user_app.usage import TokenUsageCounter
+from user_app.utils import JWTUtils, LoginAttemptUtils, LoginOTPUtils, UserTokenUtils
 
 from user_app import logger
 
@@ -66,6 +72,11 @@ class JWTUtilsTestCase(TestCase):
         tokens = JWTUtils.get_tokens_for_user(invalid_user)
         self.assertIsNone(tokens)
 
+    def test_get_tokens_for_users(self):
+        tokens = JWTUtils.get_tokens_for_users(user_ids=[self.user.id, "00000000-0000-0000-0000-000000000000"])
+        self.assertEqual(list(tokens.keys()), [str(self.user.id)])
+        self.assertIsInstance(tokens[str(self.user.id)]['accessToken'], str)
+
 
 class LoginOTPUtilsTestCase(TestCase):
 
@@ -110,7 +121,8 @@ class LoginOTPUtilsTestCase(TestCase):
         otp_instance = LoginOTPUtils.assign_otp_to_user(self.user, otp)
         self.assertIsNotNone(otp_instance)
         self.assertEqual(otp_instance.user, self.user)
-        self.assertTrue(check_password(otp, otp_instance.otp))
+        self.assertTrue(LoginOTPStore.matches(otp_instance, otp))
+        self.assertFalse(LoginOTPStore.matches(otp_instance, otp[::-1] + "X"))
         self.assertTrue(otp_instance.otp_expires_at > timezone.now())
         self.assertTrue(otp_instance.otp_expires_at <= timezone.now(
         ) + timedelta(minutes=LoginOTPUtils.OTP_EXPIRY_MINUTES))
@@ -162,5 +174,272 @@ class UserTokenUtilsTestCase(TestCase):
         user_id = UserTokenUtils.get_user_id(token=token)
         self.assertEqual(user_id, str(self.user.id))
 
+    def test_hash_token(self):
+        token = UserTokenUtils.create_permanent_token(self.user)
+        _, token_part = UserTokenUtils.split_parts(token)
+        hashed = UserTokenUtils.hash_token(token_part)
+        self.assertEqual(hashed, UserTokenUtils.hash_token(token_part))
+        self.assertNotEqual(hashed, UserTokenUtils.hash_token(token_part + "0"))
+        self.assertFalse(UserTokenUtils.is_legacy_hash(hashed))
+        self.assertTrue(UserTokenUtils.is_legacy_hash(make_password(token_part)))
+
     def setDown(self) -> None:
         self.user.delete()
+
+
+class UserCacheTestCase(TestCase):
+
+    def setUp(self) -> None:
+        UserCache._users.clear()
+        self.user = User.objects.create(username="test.user.001", email="test.user.001@test.com", password="Te$tpassw0rd")
+
+    def tearDown(self) -> None:
+        UserCache._users.clear()
+
+    def test_second_get_skips_the_database(self):
+        _ = UserCache.get(user_id=self.user.id)
+        with self.assertNumQueries(0):
+            cached = UserCache.get(user_id=self.user.id)
+
+        self.assertEqual(cached.pk, self.user.pk)
+
+    def test_callers_get_their_own_copy(self):
+        first = UserCache.get(user_id=self.user.id)
+        first.first_name = "Changed"
+
+        self.assertNotEqual(UserCache.get(user_id=self.user.id).first_name, "Changed")
+
+    def test_saving_the_user_evicts_it(self):
+        _ = UserCache.get(user_id=self.user.id)
+        self.user.first_name = "Renamed"
+        self.user.save()
+
+        self.assertEqual(UserCache.get(user_id=self.user.id).first_name, "Renamed")
+
+    def test_cache_is_bounded(self):
+        other = User.objects.create(username="test.user.002", email="test.user.002@test.com", password="Te$tpassw0rd")
+        with mock.patch.object(UserCache, "MAX_SIZE", 1):
+            _ = UserCache.get(user_id=self.user.id)
+            _ = UserCache.get(user_id=other.id)
+
+        self.assertEqual(list(UserCache._users.keys()), [f"{other.id}"])
+
+
+class TokenCacheTestCase(TestCase):
+
+    def setUp(self) -> None:
+        TokenCache._tokens.clear()
+        UserCache._users.clear()
+        self.user = User.objects.create(username="test.user.001", email="test.user.001@test.com", password="Te$tpassw0rd")
+        self.token = UserToken.objects.create(user=self.user, token="digest", alias="cached")
+
+    def tearDown(self) -> None:
+        TokenCache._tokens.clear()
+        UserCache._users.clear()
+
+    def test_cached_token_carries_its_user(self):
+        TokenCache.set(hashed=self.token.token, token=self.token)
+        _ = UserCache.get(user_id=self.user.id)
+
+        with self.assertNumQueries(0):
+            cached = TokenCache.get(hashed=self.token.token)
+
+        self.assertEqual(cached.pk, self.token.pk)
+        self.assertEqual(cached.user.pk, self.user.pk)
+        self.assertIsNot(cached, self.token)
+
+    def test_expired_token_is_not_cached(self):
+        self.token.expires_at = timezone.now() - timedelta(seconds=1)
+        TokenCache.set(hashed=self.token.token, token=self.token)
+
+        self.assertIsNone(TokenCache.get(hashed=self.token.token))
+
+    def test_deleting_the_token_evicts_it(self):
+        TokenCache.set(hashed=self.token.token, token=self.token)
+        self.token.delete()
+
+        self.assertIsNone(TokenCache.get(hashed="digest"))
+
+
+@override_settings(LOGIN_ATTEMPTS_IN_REDIS=False)
+class LoginAttemptUtilsTestCase(TestCase):
+
+    def setUp(self) -> None:
+        user_data = {
+            "username": "test.user.001",
+            "password": "Te$tpassw0rd",
+            "email": "test.user.001@test.com"
+        }
+        try:
+            resp = UserModelHelpers.create(data=user_data)
+            if resp.error:
+                raise Exception(resp.to_text())
+            self.user = User.objects.filter(pk=resp.data.get('id')).first()
+            if not self.user:
+                raise Exception("User not created")
+        except Exception as ex:
+            logger.exception(ex)
+
+    def test_record_failure_counts_in_the_database(self):
+        stale = User.objects.get(pk=self.user.pk)
+
+        self.assertEqual(LoginAttemptUtils.record_failure(user=self.user), 1)
+        # `stale` was loaded before the first failure; the count must still come from the database.
+        self.assertEqual(LoginAttemptUtils.record_failure(user=stale), 2)
+        self.assertEqual(User.objects.get(pk=self.user.pk).unsuccessful_login_attempts, 2)
+
+    def test_record_failure_blocks_past_the_limit(self):
+        for attempt in range(1, LoginAttemptUtils.LIMIT + 1):
+            self.assertEqual(LoginAttemptUtils.record_failure(user=self.user), attempt)
+
+        self.assertGreater(LoginAttemptUtils.record_failure(user=self.user), LoginAttemptUtils.LIMIT)
+        user = User.objects.get(pk=self.user.pk)
+        self.assertEqual(user.unsuccessful_login_attempts, 0)
+        self.assertGreater(user.blocked_until, timezone.now())
+        self.assertEqual(self.user.blocked_until, user.blocked_until)
+
+    def test_record_success_resets(self):
+        _ = LoginAttemptUtils.record_failure(user=self.user)
+        LoginAttemptUtils.block(user=self.user)
+        LoginAttemptUtils.record_success(user=self.user)
+
+        user = User.objects.get(pk=self.user.pk)
+        self.assertEqual(user.unsuccessful_login_attempts, 0)
+        self.assertIsNone(user.blocked_until)
+        self.assertIsNotNone(user.last_login)
+
+    def test_writes_evict_the_user_cache(self):
+        _ = UserCache.get(user_id=self.user.id)
+        _ = LoginAttemptUtils.record_failure(user=self.user)
+        self.assertNotIn(f"{self.user.id}", UserCache._users)
+
+        _ = UserCache.get(user_id=self.user.id)
+        LoginAttemptUtils.block(user=self.user)
+        self.assertIsNotNone(UserCache.get(user_id=self.user.id).blocked_until)
+
+
+@override_settings(SHORT_SECRETS_IN_REDIS=False)
+class LoginOTPStoreTestCase(TestCase):
+
+    def setUp(self) -> None:
+        user_data = {
+            "username": "test.user.001",
+            "password": "Te$tpassw0rd",
+            "email": "test.user.001@test.com"
+        }
+        try:
+            resp = UserModelHelpers.create(data=user_data)
+            if resp.error:
+                raise Exception(resp.to_text())
+            self.user = User.objects.filter(pk=resp.data.get('id')).first()
+            if not self.user:
+                raise Exception("User not created")
+        except Exception as ex:
+            logger.exception(ex)
+
+        self.otp = LoginOTPUtils.generate_numeric_otp()
+        self.instance = LoginOTPStore.issue(user=self.user, secret=self.otp, expiry_minutes=5)
+
+    def test_verify_consumes_the_secret(self):
+        resp = LoginOTPStore.verify(secret_id=self.instance.id, secret=self.otp)
+        self.assertIsNone(resp.error)
+        self.assertEqual(resp.data.user_id, self.user.id)
+
+        resp = LoginOTPStore.verify(secret_id=self.instance.id, secret=self.otp)
+        self.assertIsNotNone(resp.error)
+
+    def test_get_counts_every_attempt(self):
+        _, attempts = LoginOTPStore.get(secret_id=self.instance.id)
+        self.assertEqual(attempts, 1)
+        _, attempts = LoginOTPStore.get(secret_id=self.instance.id)
+        self.assertEqual(attempts, 2)
+        self.assertEqual(UserLoginOTP.objects.get(pk=self.instance.id).attempts, 2)
+
+    def test_too_many_wrong_guesses_burn_the_secret(self):
+        wrong = "X" * len(self.otp)
+        for _ in range(LoginOTPStore.MAX_ATTEMPTS):
+            resp = LoginOTPStore.verify(secret_id=self.instance.id, secret=wrong)
+            self.assertIsNotNone(resp.error)
+
+        self.assertFalse(UserLoginOTP.objects.filter(pk=self.instance.id).exists())
+        resp = LoginOTPStore.verify(secret_id=self.instance.id, secret=self.otp)
+        self.assertIsNotNone(resp.error)
+
+    def test_discard_reports_a_single_consumer(self):
+        self.assertTrue(LoginOTPStore.discard(instance=self.instance))
+        self.assertFalse(LoginOTPStore.discard(instance=self.instance))
+
+
+class UserSearchTestCase(TestCase):
+
+    def setUp(self) -> None:
+        # Usernames that only differ after the search term rank exactly the same, so pages break inside a tie.
+        for i in range(settings.MAX_ITEMS_PER_PAGE * 2 + 3):
+            resp = UserModelHelpers.create(data={
+                "username": f"tieuser.{i:03d}",
+                "password": "Te$tpassw0rd",
+                "email": f"tie.{i:03d}@test.com"
+            })
+            if resp.error:
+                logger.warning(resp.to_text())
+
+    def test_ranked_search_pages_through_ties(self):
+        seen = []
+        results, cursor = UserModelHelpers.ranked_search(term="tieuser")
+        seen.extend(profile.id for profile in results)
+        while cursor:
+            results, cursor = UserModelHelpers.ranked_search(term="tieuser", cursor=cursor)
+            seen.extend(profile.id for profile in results)
+
+        self.assertEqual(len(seen), settings.MAX_ITEMS_PER_PAGE * 2 + 3)
+        self.assertEqual(len(set(seen)), len(seen))
+
+    def test_ranked_search_rejects_a_bad_cursor(self):
+        resp = UserModelHelpers.search(term="tieuser", cursor="not-a-cursor")
+        self.assertEqual(resp.error, "Invalid Cursor")
+
+
+class TokenUsageCounterTestCase(TestCase):
+
+    def setUp(self) -> None:
+        user = User.objects.create(username="test.user.001", email="test.user.001@test.com", password="Te$tpassw0rd")
+        self.token = UserToken.objects.create(user=user, token="hashed", alias="usage")
+        self.window = TokenUsageCounter.current_window() - TokenUsageCounter.WINDOW_SIZE
+
+    def test_write_rolls_up_hits_per_minute(self):
+        token_id = f"{self.token.id}"
+        batch = [(token_id, self.window)] * 3 + [(token_id, self.window - TokenUsageCounter.WINDOW_SIZE)]
+
+        written = TokenUsageCounter.write(counts=Counter(batch))
+
+        self.assertEqual(written, 2)
+        self.assertEqual(
+            sorted(UserTokenUsageRollup.objects.filter(token=self.token).values_list("hits", flat=True)), [1, 3]
+        )
+
+    def test_write_drops_deleted_tokens(self):
+        counts = {(f"{self.token.id}", self.window): 2, ("00000000-0000-0000-0000-000000000000", self.window): 5}
+
+        written = TokenUsageCounter.write(counts=counts)
+
+        self.assertEqual(written, 1)
+        self.assertEqual(UserTokenUsageRollup.objects.get().hits, 2)
+
+    @skipUnless(settings.USE_REDIS, "Redis is off.")
+    def test_flush_claims_finished_minutes_only(self):
+        current = self.window + TokenUsageCounter.WINDOW_SIZE
+        with mock.patch.object(TokenUsageCounter, "KEY_PREFIX", "test:token_usage"), \
+                mock.patch.object(TokenUsageCounter, "WINDOWS_KEY", "test:token_usage:windows"), \
+                mock.patch("user_app.usage.time", return_value=current + 1):
+            for _ in range(2):
+                TokenUsageCounter.hit(token_id=self.token.id)
+            settings.REDIS_CONN.hincrby(TokenUsageCounter.redis_key(self.window), f"{self.token.id}", 4)
+            settings.REDIS_CONN.sadd(TokenUsageCounter.WINDOWS_KEY, self.window)
+
+            written = TokenUsageCounter.flush()
+            pending = settings.REDIS_CONN.smembers(TokenUsageCounter.WINDOWS_KEY)
+            settings.REDIS_CONN.delete(TokenUsageCounter.WINDOWS_KEY, TokenUsageCounter.redis_key(current))
+
+        self.assertEqual(written, 1)
+        self.assertEqual(UserTokenUsageRollup.objects.get().hits, 4)
+        self.assertEqual(pending, {f"{current}".encode("utf8")})
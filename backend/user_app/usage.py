@@ -0,0 +1,143 @@
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+from time import time
+from typing import Dict, List, Tuple
+from uuid import uuid4
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from middleware_app.writers import BufferedWriter
+from user_app.models import UserToken, UserTokenUsageRollup
+
+from user_app import logger
+
+
+class TokenUsageCounter:
+    """
+    Count permanent token hits per token per minute off the request path and write them as `UserTokenUsageRollup` rows.
+
+    With Redis, every hit is a pipelined `HINCRBY` on a hash per minute shared by all workers; the `FlushTokenUsage` cron
+    claims the minutes that are over and bulk-inserts one row per token per minute.
+    Without Redis (or if it is unreachable), hits go to an in-process `BufferedWriter` that aggregates and writes them
+    from its own thread.
+    """
+    KEY_PREFIX: str = "token_usage"
+    WINDOWS_KEY: str = f"{KEY_PREFIX}:windows"
+    KEY_TTL: int = 24 * 60 * 60  #(prithoo): Counts the cron has not claimed in a day are given up on.
+    WINDOW_SIZE: int = 60
+    BATCH_SIZE: int = 1_000
+
+    @classmethod
+    def get_redis(cls):
+        if not settings.USE_REDIS:
+            return None
+        return settings.REDIS_CONN
+
+    @classmethod
+    def current_window(cls) -> int:
+        return int(time()) // cls.WINDOW_SIZE * cls.WINDOW_SIZE
+
+    @classmethod
+    def redis_key(cls, window: int) -> str:
+        return f"{cls.KEY_PREFIX}:{window}"
+
+    @classmethod
+    def hit(cls, token_id: str = None) -> None:
+        if not token_id:
+            return
+
+        window = cls.current_window()
+        redis = cls.get_redis()
+        if redis:
+            try:
+                pipe = redis.pipeline(transaction=False)
+                pipe.hincrby(cls.redis_key(window), f"{token_id}", 1)
+                pipe.expire(cls.redis_key(window), cls.KEY_TTL)
+                pipe.sadd(cls.WINDOWS_KEY, window)
+                pipe.execute()
+                return
+            except Exception as ex:
+                logger.warn(f"Could not count the use of token '{token_id}' in Redis: {ex}")
+
+        local_token_usage_writer.append((f"{token_id}", window))
+
+    @classmethod
+    def write(cls, counts: Dict[Tuple[str, int], int]) -> int:
+        """
+        Insert one rollup row per `(token_id, window)`; hits of tokens deleted in the meantime are discarded.
+        """
+        if not counts:
+            return 0
+
+        token_ids = {token_id for token_id, _ in counts.keys()}
+        existing = {f"{pk}" for pk in UserToken.objects.filter(pk__in=token_ids).values_list('pk', flat=True)}
+
+        rows: List[UserTokenUsageRollup] = [
+            UserTokenUsageRollup(
+                token_id=token_id,
+                window=datetime.fromtimestamp(window, tz=dt_timezone.utc),
+                hits=hits
+            ) for (token_id, window), hits in counts.items() if token_id in existing
+        ]
+        _ = UserTokenUsageRollup.objects.bulk_create(rows, batch_size=cls.BATCH_SIZE)
+        return len(rows)
+
+    @classmethod
+    def flush(cls) -> int:
+        """
+        Claim every finished minute counted in Redis and write it; returns the number of rows written.
+        """
+        redis = cls.get_redis()
+        if not redis:
+            local_token_usage_writer.flush()
+            return 0
+
+        current = cls.current_window()
+        counts: Dict[Tuple[str, int], int] = {}
+        claimed: List[str] = []
+
+        for member in redis.smembers(cls.WINDOWS_KEY):
+            window = int(member)
+            if window >= current:
+                continue
+
+            ## (prithoo): RENAME is atomic, so two overlapping flushes can never both read the same minute.
+            claim = f"{cls.redis_key(window)}:flushing:{uuid4().hex}"
+            try:
+                redis.rename(cls.redis_key(window), claim)
+            except Exception:
+                redis.srem(cls.WINDOWS_KEY, member)
+                continue
+
+            for token_id, hits in redis.hgetall(claim).items():
+                counts[(token_id.decode("utf8"), window)] = int(hits)
+            claimed.append(claim)
+            redis.srem(cls.WINDOWS_KEY, member)
+
+        try:
+            written = cls.write(counts=counts)
+        except Exception as ex:
+            logger.warn(f"Could not write {len(counts)} token usage count(s); putting them back: {ex}")
+            pipe = redis.pipeline(transaction=False)
+            for (token_id, window), hits in counts.items():
+                pipe.hincrby(cls.redis_key(window), token_id, hits)
+                pipe.expire(cls.redis_key(window), cls.KEY_TTL)
+                pipe.sadd(cls.WINDOWS_KEY, window)
+            pipe.execute()
+            written = 0
+
+        if claimed:
+            redis.delete(*claimed)
+
+        return written
+
+
+def write_local_token_usage(batch: List[Tuple[str, int]]) -> None:
+    try:
+        _ = TokenUsageCounter.write(counts=Counter(batch))
+    finally:
+        close_old_connections()
+
+
+local_token_usage_writer = BufferedWriter(name="token-usage", flush_func=write_local_token_usage)
@@ -1,15 +1,20 @@
-from datetime import datetime, timedelta
+from datetime import timedelta
+from hashlib import sha256
+from hmac import new as hmac_new
 from secrets import choice, token_hex
-from pytz import timezone
+from typing import Dict, Iterable
 from uuid import uuid4
 
 from django.conf import settings
-from django.contrib.auth.hashers import make_password, check_password
+from django.contrib.auth.hashers import check_password
+from django.db.models import Case, F, Value, When
+from django.utils import timezone as dj_timezone
 
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from auth.context import UserCache
 from user_app.models import User, UserLoginOTP
-from user_app.serializers import UserLoginOTPInputSerializer
+from user_app.stores import LoginOTPStore
 
 from user_app import logger
 
@@ -19,23 +24,50 @@ class JWTUtils:
     Utilities for basic operation on JWT.
     """
     @classmethod
-    def get_tokens_for_user(cls, user: User = None):
+    def issue(cls, user: User) -> Dict[str, str]:
+        refresh = RefreshToken.for_user(user)
+
+        return {
+            'refreshToken': str(refresh),
+            'accessToken': str(refresh.access_token),
+        }
+
+    @classmethod
+    def get_tokens_for_user(cls, user: User = None, verify: bool = False):
+        """
+        Issue a refresh/access token pair for a saved `user`.
+
+        An instance loaded from (or saved to) the database is trusted as is; pass `verify=True` to also confirm that
+        the row still exists, which costs a single primary-key `exists()` query.
+        """
         if not user:
             logger.warn(f'Invalid argument(s) NULL `user` passed.')
             return None
         if not isinstance(user, User):
             logger.warn(f'Invalid argument(s) `user` passed.')
             return None
-        
-        if not user in User.objects.all():
+
+        #(prithoo): `User.id` has a default, so an unsaved instance does have a pk; `_state.adding` tells them apart.
+        if user._state.adding or (verify and not User.objects.filter(pk=user.pk).exists()):
             logger.warn(f'Invalid argument(s) `user` does not exist.')
             return None
-        refresh = RefreshToken.for_user(user)
 
-        return {
-            'refreshToken': str(refresh),
-            'accessToken': str(refresh.access_token),
-        }
+        return cls.issue(user=user)
+
+    @classmethod
+    def get_tokens_for_users(cls, users: Iterable[User] = None, user_ids: Iterable[str] = None) -> Dict[str, Dict[str, str]]:
+        """
+        Issue token pairs for many users at once (service accounts, load tests), keyed by user ID.
+
+        `users` are trusted the same way `get_tokens_for_user` trusts them; `user_ids` are loaded in a single query and
+        only active users get tokens. Unknown IDs are left out of the result.
+        """
+        users = [user for user in (users or []) if isinstance(user, User) and not user._state.adding]
+
+        if user_ids:
+            users += list(User.objects.filter(pk__in=list(user_ids), is_active=True))
+
+        return {f"{user.id}": cls.issue(user=user) for user in users}
 
 
 class LoginOTPUtils:
@@ -83,19 +115,112 @@ class LoginOTPUtils:
                 f"Invalid argument(s) `otp` passed.")
             return None
 
-        data = {
-            "user": f"{user.id}",
-            "otp": make_password(otp),
-            "otp_expires_at": datetime.now(timezone(settings.TIME_ZONE)) + timedelta(minutes=cls.OTP_EXPIRY_MINUTES)
-        }
+        try:
+            return LoginOTPStore.issue(user=user, secret=otp, expiry_minutes=cls.OTP_EXPIRY_MINUTES)
+        except Exception as ex:
+            logger.exception(f"Error: {ex}")
+            return None
+
 
-        deserialized = UserLoginOTPInputSerializer(data=data)
-        if not deserialized.is_valid():
-            logger.exception(f"Error: {deserialized.errors}")
+class LoginAttemptUtils:
+    """
+    Failed login bookkeeping that costs at most one write per attempt.
+
+    By default the counter lives in `User.unsuccessful_login_attempts` and a failure is a single conditional UPDATE
+    that increments it, or resets it and sets `blocked_until` once the limit is reached. With `LOGIN_ATTEMPTS_IN_REDIS`
+    failures are an `INCR` in Redis and Postgres is only written to when the user gets blocked.
+    None of these writes go through `User.save()`, so they do not fire the `User` signals either; every one of them
+    evicts the user from this process's `UserCache` itself.
+    """
+    KEY_PREFIX: str = "login_attempts"
+
+    LIMIT: int = settings.OTP_ATTEMPT_LIMIT
+    TIMEOUT: int = settings.OTP_ATTEMPT_TIMEOUT
+    WINDOW: int = settings.LOGIN_ATTEMPT_WINDOW
+
+    @classmethod
+    def get_redis(cls):
+        if not settings.LOGIN_ATTEMPTS_IN_REDIS:
             return None
+        return settings.REDIS_CONN
+
+    @classmethod
+    def redis_key(cls, user: User) -> str:
+        return f"{cls.KEY_PREFIX}:{user.id}"
+
+    @classmethod
+    def block(cls, user: User, minutes: int = TIMEOUT) -> None:
+        blocked_until = dj_timezone.now() + timedelta(minutes=minutes)
+        _ = User.objects.filter(pk=user.pk).update(unsuccessful_login_attempts=0, blocked_until=blocked_until)
+        UserCache.evict(user_id=user.id)
+
+        user.unsuccessful_login_attempts = 0
+        user.blocked_until = blocked_until
+
+    @classmethod
+    def record_failure(cls, user: User) -> int:
+        """
+        Count a failed attempt for `user` and block them once it goes over `LIMIT`; returns the number of consecutive
+        failures, this one included.
+        """
+        redis = cls.get_redis()
+        if redis:
+            try:
+                pipe = redis.pipeline()
+                pipe.incr(cls.redis_key(user))
+                pipe.expire(cls.redis_key(user), cls.WINDOW)
+                attempts, _ = pipe.execute()
+            except Exception as ex:
+                logger.warn(f"Could not count the failed login of '{user.id}' in Redis: {ex}")
+            else:
+                if attempts > cls.LIMIT:
+                    cls.block(user=user)
+                    redis.delete(cls.redis_key(user))
+                return attempts
 
-        deserialized.save()
-        return deserialized.instance
+        ## (prithoo): Every SET expression sees the row as it was before the UPDATE, so both `Case`s test the old count.
+        blocked_until = dj_timezone.now() + timedelta(minutes=cls.TIMEOUT)
+        _ = User.objects.filter(pk=user.pk).update(
+            unsuccessful_login_attempts=Case(
+                When(unsuccessful_login_attempts__gte=cls.LIMIT, then=Value(0)),
+                default=F("unsuccessful_login_attempts") + 1
+            ),
+            blocked_until=Case(
+                When(unsuccessful_login_attempts__gte=cls.LIMIT, then=Value(blocked_until)),
+                default=F("blocked_until")
+            )
+        )
+        UserCache.evict(user_id=user.id)
+
+        ## (prithoo): Concurrent failures are only ordered by the database, so the outcome is read back from it
+        ##            rather than derived from the count this instance was loaded with.
+        user.refresh_from_db(fields=["unsuccessful_login_attempts", "blocked_until"])
+        if user.unsuccessful_login_attempts == 0 and user.blocked_until == blocked_until:
+            return cls.LIMIT + 1
+
+        return user.unsuccessful_login_attempts
+
+    @classmethod
+    def record_success(cls, user: User) -> None:
+        """
+        Reset the failure streak of `user`, lift any expired block and set `last_login`, in a single UPDATE.
+        """
+        redis = cls.get_redis()
+        if redis:
+            try:
+                redis.delete(cls.redis_key(user))
+            except Exception as ex:
+                logger.warn(f"Could not reset the failed logins of '{user.id}' in Redis: {ex}")
+
+        user.last_login = dj_timezone.now()
+        user.unsuccessful_login_attempts = 0
+        user.blocked_until = None
+        _ = User.objects.filter(pk=user.pk).update(
+            last_login=user.last_login,
+            unsuccessful_login_attempts=0,
+            blocked_until=None
+        )
+        UserCache.evict(user_id=user.id)
 
 
 class UserTokenUtils:
@@ -110,6 +235,8 @@ class UserTokenUtils:
     UUID_LENGTH: int = 36 #(prithoo): The length of a typical UUIDv4 value.
     SALT_01_SIZE: int = settings.SALT_01_SIZE
     SALT_02_SIZE: int = settings.SALT_02_SIZE
+    HMAC_PREFIX: str = "hmac_sha256$"
+    HMAC_KEY: bytes = settings.USER_TOKEN_HMAC_KEY.encode("utf8")
 
     @classmethod
     def generate_hex_token(cls, token_size: int = None) -> str:
@@ -131,6 +258,27 @@ class UserTokenUtils:
     def create_permanent_token(cls, usr:User) -> str:
         return f"{cls.process_user_salt(usr)}{cls.generate_hex_token()}"
     
+    @classmethod
+    def hash_token(cls, token_part:str) -> str:
+        """
+        Keyed digest stored in `UserToken.token`.
+
+        The token part is 32 random bytes, so a single HMAC-SHA256 is as safe to store as a slow password hash, and
+        unlike a salted hash it is deterministic: the row can be looked up by its digest instead of hashing the
+        candidate against every token of the user.
+        """
+        if not token_part:
+            return None
+
+        return f"{cls.HMAC_PREFIX}{hmac_new(cls.HMAC_KEY, token_part.encode('utf8'), sha256).hexdigest()}"
+
+    @classmethod
+    def is_legacy_hash(cls, hashed:str) -> bool:
+        """
+        Tokens issued before `hash_token` were stored as Django password hashes; they are re-hashed on their next use.
+        """
+        return not f"{hashed}".startswith(cls.HMAC_PREFIX)
+
     @classmethod
     def split_parts(cls, token:str):
         if not token or token == "":
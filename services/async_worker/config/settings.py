@@ -1,7 +1,7 @@
 from os import path, makedirs
 from pydantic import BaseSettings
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 
 
 class Settings(BaseSettings):
@@ -30,6 +30,16 @@ class Settings(BaseSettings):
     MONGO_USER:Optional[str]
     MONGO_PASSWORD:Optional[str]
 
+    MONGO_MAX_POOL_SIZE: int = 100
+    MONGO_MIN_POOL_SIZE: int = 0
+    MONGO_MAX_IDLE_TIME_MS: int = 60_000
+    MONGO_WAIT_QUEUE_TIMEOUT_MS: int = 5_000
+    MONGO_CONNECT_TIMEOUT_MS: int = 5_000
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = 5_000
+    MONGO_SOCKET_TIMEOUT_MS: int = 30_000
+    MONGO_READ_PREFERENCE: str = "primary"
+    MONGO_WRITE_CONCERN: str = "1"
+
     SNS_SENDER_ID: str
     AWS_ACCESS_KEY_ID:str
     AWS_SECRET_ACCESS_KEY:str
@@ -38,6 +48,29 @@ class Settings(BaseSettings):
     BASE_PATH = Path(__file__).resolve().parent.parent
     MAX_ITEMS_PER_PAGE: int = 15
 
+    SPACY_MODEL: str = "en_core_web_md"
+    ## Pipes that similarity and language detection never read; they stay loaded but are skipped on every parse.
+    SPACY_DISABLED_PIPES: List[str] = ["parser", "ner", "lemmatizer"]
+    SPACY_MAX_LENGTH: int = 2_000_000
+    SPACY_BATCH_SIZE: int = 256
+    ## Processes `nlp.pipe` spreads a batched parse over; each one holds its own copy of the model.
+    SPACY_N_PROCESS: int = 1
+
+    POST_INDEX_DIR: Path = BASE_PATH / "data" / "post_index"
+    ## How often a worker looks for posts written since its index was last synced.
+    POST_INDEX_SYNC_SECONDS: int = 60
+    ## Rows embedded since the last snapshot that make a worker write a new one.
+    POST_INDEX_COMPACT_ROWS: int = 1_000
+    SIMILAR_POSTS_LIMIT: int = 100
+
+    ## Processes running spaCy for the API, each with its own model; 0 runs it in a thread of the API process instead.
+    INFERENCE_PROCESSES: int = 2
+    INFERENCE_TIMEOUT_SECONDS: float = 30.0
+    ## Searches served at once by a worker; the others wait up to `SEARCH_QUEUE_TIMEOUT_SECONDS` for a slot, then get a 503.
+    SEARCH_MAX_CONCURRENCY: int = 8
+    SEARCH_QUEUE_TIMEOUT_SECONDS: float = 2.0
+    SEARCH_TIMEOUT_SECONDS: float = 15.0
+
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,48 @@
+from fastapi import APIRouter, status
+from fastapi.responses import JSONResponse
+
+from config.settings import settings
+from database.asynchrous import client as async_client
+from database.synchronous import cluster as sync_client
+from utils.inference import InferencePool
+from utils.post_index import post_index
+
+router = APIRouter(
+    prefix='/health',
+    tags=['health']
+)
+
+@router.get("/live/", status_code=status.HTTP_200_OK)
+async def live():
+    return {"live": True}
+
+
+@router.get("/ready/", status_code=status.HTTP_200_OK)
+async def ready():
+    """
+    Ready once the language model and the post index are loaded in this process; until then the search would stall on them.
+    """
+    state = {
+        "model": settings.SPACY_MODEL,
+        "modelLoaded": InferencePool.is_ready(),
+        "indexLoaded": post_index.is_ready(),
+        "indexedPosts": len(post_index),
+    }
+    if not (state["modelLoaded"] and state["indexLoaded"]):
+        return JSONResponse(
+            content={"ready": False, **state},
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+
+    return {"ready": True, **state}
+
+
+@router.get("/database/", status_code=status.HTTP_200_OK)
+async def database_pools():
+    """
+    Connection pool counters of this process's MongoDB clients.
+    """
+    return {
+        "async": async_client.metrics.snapshot(),
+        "sync": sync_client.metrics.snapshot(),
+    }
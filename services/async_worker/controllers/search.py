@@ -1,9 +1,14 @@
-from typing import List
+import asyncio
+import json
+from typing import AsyncGenerator, List
 
-from fastapi import APIRouter, status, Body
+from fastapi import APIRouter, HTTPException, status, Body
 from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 
+from config.settings import settings
 from utils.post_utils import PostUtils
+from utils import logger
 from schema.response_schema import AlikeSearchResponse
 from schema.request_schema import AlikeSearchRequest
 
@@ -12,11 +17,65 @@ router = APIRouter(
     tags=['search']
 )
 
+## Searches are CPU-heavy: past this many at once, more would only queue up in the inference pool.
+search_slots = asyncio.Semaphore(settings.SEARCH_MAX_CONCURRENCY)
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+async def to_ndjson(results: AsyncGenerator, phrase: str = None) -> AsyncGenerator[bytes, None]:
+    ## The status line is already sent: a failure past this point can only end the body, with a last line saying so.
+    deadline = asyncio.get_running_loop().time() + settings.SEARCH_TIMEOUT_SECONDS
+    try:
+        while True:
+            try:
+                match = await asyncio.wait_for(results.__anext__(), timeout=deadline - asyncio.get_running_loop().time())
+            except StopAsyncIteration:
+                return
+            yield f"{json.dumps(match)}\n".encode("utf8")
+    except Exception as ex:
+        logger.warn(f"Streaming the matches for '{phrase}' failed: {ex}")
+        yield f"{json.dumps({'error': 'The stream ended early; retry the search.'})}\n".encode("utf8")
+    finally:
+        await results.aclose()
+
+
 @router.post("/", response_model=list[AlikeSearchResponse], status_code=status.HTTP_200_OK)
 async def search_alike_post(term: AlikeSearchRequest = Body(...)):
-    term = jsonable_encoder(term).get("phrase")
-    resp = await PostUtils.search_for_posts_like_phrase(term=term)
-    if resp.error:
-        raise resp.to_exception()
-    
-    return resp.data
\ No newline at end of file
+    """
+    Posts similar to `phrase`, best first, `top_k` at a time; pass back the `X-Next-Cursor` header as `cursor` for the
+    next page. With `stream`, matches are sent as NDJSON, one per line, as soon as they are available.
+    """
+    request = jsonable_encoder(term)
+    phrase = request.get("phrase")
+
+    try:
+        await asyncio.wait_for(search_slots.acquire(), timeout=settings.SEARCH_QUEUE_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many searches in progress; please retry shortly."
+        )
+
+    ## The slot covers finding the matches; a stream only reads their documents once they are known.
+    try:
+        search = PostUtils.stream_posts_like_phrase if request.get("stream") else PostUtils.search_for_posts_like_phrase
+        resp = await asyncio.wait_for(
+            search(term=phrase, top_k=request.get("top_k"), cursor=request.get("cursor")),
+            timeout=settings.SEARCH_TIMEOUT_SECONDS
+        )
+        if resp.error:
+            raise resp.to_exception()
+
+        headers = {NEXT_CURSOR_HEADER: resp.data.get("next")} if resp.data.get("next") else None
+        if request.get("stream"):
+            return StreamingResponse(to_ndjson(resp.data.get("results"), phrase=phrase), media_type="application/x-ndjson", headers=headers)
+
+        return JSONResponse(content=resp.data.get("results"), headers=headers)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=f"The search for '{phrase}' took too long."
+        )
+    finally:
+        search_slots.release()
@@ -1,7 +1,6 @@
 import motor.motor_asyncio
 
-from config.settings import settings
-# MONGO_HOST, MONGO_NAME, MONGO_PASSWORD, MONGO_PORT, MONGO_URI, MONGO_USER
+from database.clients import LazyClient, LazyDatabase
 
-client = motor.motor_asyncio.AsyncIOMotorClient(settings.MONGO_URI)
-as_db = client[settings.MONGO_NAME]
\ No newline at end of file
+client = LazyClient(motor.motor_asyncio.AsyncIOMotorClient)
+as_db = LazyDatabase(client)
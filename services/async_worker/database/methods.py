@@ -34,12 +34,28 @@ class AsynchronousMethods:
 
     @classmethod
     async def find(cls, filter_dict: dict = None, collection: str = None, page: int = 1) -> list:
-        if not filter_dict:
-            results = await cls.db[collection].find().skip((page-1)*settings.MAX_ITEMS_PER_PAGE).limit(settings.MAX_ITEMS_PER_PAGE)
-        else:
-            results = await cls.db[collection].find(filter_dict).skip((page-1)*settings.MAX_ITEMS_PER_PAGE).limit(settings.MAX_ITEMS_PER_PAGE)
+        ## Motor cursors are not awaitable themselves; `to_list` runs the query.
+        cursor = cls.db[collection].find(filter_dict or {}).skip((page-1)*settings.MAX_ITEMS_PER_PAGE).limit(settings.MAX_ITEMS_PER_PAGE)
+        return await cursor.to_list(length=settings.MAX_ITEMS_PER_PAGE)
 
-        return list(results)
+    @classmethod
+    async def find_many(cls, filter_dict: dict = None, collection: str = None, projection: dict = None, limit: int = None) -> list:
+        """
+        Every matching document (up to `limit`), unpaginated.
+        """
+        cursor = cls.db[collection].find(filter_dict or {}, projection)
+        if limit:
+            cursor = cursor.limit(limit)
+        return await cursor.to_list(length=limit)
+
+    @classmethod
+    async def batches(cls, filter_dict: dict = None, collection: str = None, projection: dict = None, batch_size: int = 256):
+        """
+        Iterate over every matching document, `batch_size` documents at a time.
+        """
+        cursor = cls.db[collection].find(filter_dict or {}, projection).batch_size(batch_size)
+        while batch := await cursor.to_list(length=batch_size):
+            yield batch
 
     @classmethod
     async def find_distinct(cls, filter_dict: dict = None, collection: str = None, page: int = 1) -> list:
@@ -170,5 +186,8 @@ class SynchronousMethods:
         return True
     
     @classmethod
-    def all(cls, collection:str=None) -> pymongo.CursorType:
-        return cls.db[collection].find()
+    def all(cls, collection:str=None, filter_dict:dict=None, projection:dict=None, batch_size:int=0) -> pymongo.CursorType:
+        """
+        Cursor over every matching document; `projection` limits the fields fetched, `batch_size` the documents per round-trip.
+        """
+        return cls.db[collection].find(filter_dict or {}, projection, batch_size=batch_size)
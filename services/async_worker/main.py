@@ -1,7 +1,44 @@
+import asyncio
+from contextlib import suppress
+
 from fastapi import FastAPI
 
-from controllers import search
+from config.settings import settings
+from controllers import health, search
+from utils.inference import InferencePool
+from utils.post_index import post_index
+
+from utils import logger
 
 app = FastAPI()
 
+app.include_router(health.router)
 app.include_router(search.router)
+
+
+async def keep_post_index_in_sync():
+    ## Loading happens in the background so the process starts serving `/health/` right away;
+    ## `/health/ready/` tells when the model and the index are loaded.
+    while True:
+        try:
+            if not InferencePool.is_ready():
+                await InferencePool.warm_up()
+            _ = await asyncio.to_thread(post_index.sync, True)
+        except Exception as ex:
+            logger.warn(f"Could not {'sync the post index' if InferencePool.is_ready() else 'warm up the inference pool'}: {ex}")
+        await asyncio.sleep(settings.POST_INDEX_SYNC_SECONDS)
+
+
+@app.on_event("startup")
+async def start_inference():
+    InferencePool.start()
+    post_index.embedder = InferencePool.embed
+    app.state.post_index_sync = asyncio.create_task(keep_post_index_in_sync())
+
+
+@app.on_event("shutdown")
+async def stop_inference():
+    app.state.post_index_sync.cancel()
+    with suppress(asyncio.CancelledError):
+        await app.state.post_index_sync
+    InferencePool.shutdown()
@@ -1,6 +1,11 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List
 
+from config.settings import settings
+
 
 class AlikeSearchRequest(BaseModel):
-    phrase: Optional[str]
\ No newline at end of file
+    phrase: Optional[str]
+    top_k: int = Field(settings.SIMILAR_POSTS_LIMIT, ge=1, le=settings.SIMILAR_POSTS_LIMIT)
+    cursor: Optional[str]
+    stream: bool = False
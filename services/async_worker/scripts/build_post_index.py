@@ -0,0 +1,9 @@
+"""
+Backfill the post embedding index: `python -m scripts.build_post_index` from the service's root.
+"""
+from utils.post_index import post_index
+
+
+if __name__ == "__main__":
+    embedded = post_index.rebuild()
+    print(f"Embedded {embedded} post(s) into '{post_index.directory}'.")
@@ -0,0 +1,94 @@
+import unittest
+from datetime import datetime
+from tempfile import TemporaryDirectory
+
+import numpy as np
+
+from utils.post_index import PostEmbeddingIndex
+from utils.post_utils import SearchCursor
+
+
+class PostEmbeddingIndexTestCase(unittest.TestCase):
+
+    ## Three posts tie at every score, so pages have to break ties on the post id.
+    VECTORS = {
+        **{f"post-a{n}": [1.0, 0.0] for n in range(3)},
+        **{f"post-b{n}": [1.0, 1.0] for n in range(3)},
+        **{f"post-c{n}": [0.0, 1.0] for n in range(3)},
+    }
+
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.index = PostEmbeddingIndex(directory=self.directory.name)
+        self.index.embedder = lambda texts: PostEmbeddingIndex.normalize([self.VECTORS[text.split()[0]] for text in texts])
+        self.index.upsert([
+            {"_id": _id, "title": _id, "blurb": "", "updated": datetime(2026, 1, 1)} for _id in self.VECTORS
+        ])
+        self.query = np.array([1.0, 0.2], dtype=np.float32)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def walk(self, k: int) -> list:
+        seen, after = [], None
+        while True:
+            page = self.index.search(query_vector=self.query, k=k, after=after)
+            if not page:
+                return seen
+            seen.extend(page)
+            after = (page[-1][1], page[-1][0])
+
+    def test_search_orders_by_similarity_then_id(self):
+        results = self.index.search(query_vector=self.query, k=4)
+
+        self.assertEqual([post_id for post_id, _ in results], ["post-a0", "post-a1", "post-a2", "post-b0"])
+        self.assertGreater(results[0][1], results[3][1])
+
+    def test_pages_through_ties_without_gaps_or_repeats(self):
+        for k in (1, 2, 4):
+            seen = self.walk(k=k)
+            self.assertEqual([post_id for post_id, _ in seen], sorted(self.VECTORS, key=lambda _id: (_id[5], _id)))
+
+    def test_same_page_from_the_snapshot(self):
+        before = self.walk(k=2)
+        self.index.save()
+
+        self.assertEqual(len(self.index.delta_ids), 0)
+        self.assertEqual([post_id for post_id, _ in self.walk(k=2)], [post_id for post_id, _ in before])
+
+    def test_min_score_leaves_poor_matches_out(self):
+        results = self.index.search(query_vector=self.query, k=10, min_score=0.5)
+
+        self.assertEqual({post_id[5] for post_id, _ in results}, {"a", "b"})
+
+    def test_upsert_replaces_a_post(self):
+        self.index.save()
+        self.index.upsert([{"_id": "post-c0", "title": "post-a0", "blurb": ""}])
+
+        seen = [post_id for post_id, _ in self.walk(k=2)]
+        self.assertEqual(seen.count("post-c0"), 1)
+        self.assertIn("post-c0", seen[:4])
+
+
+class SearchCursorTestCase(unittest.TestCase):
+
+    def test_round_trip(self):
+        score = float(np.float32(0.123456789))
+
+        self.assertEqual(SearchCursor.decode(SearchCursor.encode(score, "post-1")), (score, "post-1"))
+
+    def test_invalid_cursor(self):
+        for cursor in ("not a cursor", SearchCursor.encode(0.5, "post-1")[:-3]):
+            with self.assertRaises(ValueError):
+                _ = SearchCursor.decode(cursor)
+
+    def test_is_after(self):
+        self.assertTrue(SearchCursor.is_after(0.4, "post-1", (0.5, "post-9")))
+        self.assertTrue(SearchCursor.is_after(0.5, "post-2", (0.5, "post-1")))
+        self.assertFalse(SearchCursor.is_after(0.5, "post-1", (0.5, "post-1")))
+        self.assertFalse(SearchCursor.is_after(0.6, "post-0", (0.5, "post-1")))
+        self.assertTrue(SearchCursor.is_after(0.9, "post-0"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,3 @@
+import logging
+
+logger = logging.getLogger('logger.' + __name__)
@@ -1,12 +1,79 @@
+from os import getpid
+from threading import Event, Lock
+from typing import Any, Generator, Iterable, Tuple
+
 import spacy
 from spacy.language import Language as ln
 from spacy_langdetect import LanguageDetector
-import en_core_web_md
 
 from fastapi import status
 from fastapi.exceptions import HTTPException
 
 from config.constants import ProjectConstants
+from config.settings import settings
+
+from utils import logger
+
+
+class LanguageModels:
+    '''
+    Registry of the spaCy model shared by everything in a worker process.
+
+    The model is loaded once, on first use (or by `warm_up()` at startup), with `settings.SPACY_DISABLED_PIPES` disabled.
+    Loading it is what costs seconds and hundreds of MB, parsing a text with it does not, so no request should ever load it.
+    The pid is tracked so that a forked process loads its own copy instead of using one built in its parent.
+    '''
+    _nlp: ln = None
+    _detector: LanguageDetector = None
+    _pid: int = None
+    _lock = Lock()
+    _ready = Event()
+
+    @classmethod
+    def load(cls) -> ln:
+        nlp = spacy.load(settings.SPACY_MODEL, disable=settings.SPACY_DISABLED_PIPES)
+        nlp.max_length = settings.SPACY_MAX_LENGTH
+        return nlp
+
+    @classmethod
+    def get(cls) -> ln:
+        if cls._nlp is not None and cls._pid == getpid():
+            return cls._nlp
+
+        with cls._lock:
+            if cls._nlp is None or cls._pid != getpid():
+                cls._ready.clear()
+                logger.info(f"Loading spaCy model '{settings.SPACY_MODEL}' in process {getpid()}.")
+                cls._nlp = cls.load()
+                cls._detector = None
+                cls._pid = getpid()
+                cls._ready.set()
+
+        return cls._nlp
+
+    @classmethod
+    def detector(cls) -> LanguageDetector:
+        '''
+        The language detector is applied to docs on its own rather than added to the shared pipeline,
+        so similarity parses do not pay for it.
+        '''
+        nlp = cls.get()
+        if cls._detector is None:
+            cls._detector = create_lang_detector(nlp=nlp, name="language_detector")
+        return cls._detector
+
+    @classmethod
+    def warm_up(cls) -> None:
+        '''
+        Load the model and run one parse through it, so the first request does not pay for either.
+        '''
+        nlp = cls.get()
+        _ = nlp("Warming up the language model.").vector
+        logger.info(f"spaCy model '{settings.SPACY_MODEL}' is ready in process {getpid()}.")
+
+    @classmethod
+    def is_ready(cls) -> bool:
+        return cls._ready.is_set() and cls._pid == getpid()
 
 
 class LanguageHandlers:
@@ -15,7 +82,7 @@ class LanguageHandlers:
     '''
     input_text: str = None
     confidence_threshold: float = 0.82
-    max_length: int = 2_000_000
+    max_length: int = settings.SPACY_MAX_LENGTH
 
     def __init__(self, input_text: str):
         '''
@@ -34,20 +101,11 @@ class LanguageHandlers:
         Method to detect the language of the passed text:
         '''
         try:
-            ## MAJOR CHANGE in Spacy v3:
-            ## Language.factory() no longer accepts a class directly as the first arg.
-            ## Instead, now it calls a tagged decorator that calls a function that return the class-pointer.
-            ln.factory("language_detector", func=create_lang_detector)
-
-            ## Loading the NLP model to the nlp object
-            nlp = en_core_web_md.load(disable=[None])
-
-            nlp.max_length = self.max_length
-
-            nlp.add_pipe("language_detector", last=True)
+            ## The shared model is loaded once per process; the detector is registered once at import, below.
+            nlp = LanguageModels.get()
 
             ## Initial parsing of the text by the nlp object
-            doc = nlp(self.input_text)
+            doc = LanguageModels.detector()(nlp(self.input_text))
             lang_code = doc._.language.get("language")
             confidence_score = doc._.language.get("score")
 
@@ -75,26 +133,49 @@ class LanguageHandlers:
         """
 
         try:
-            nlp = en_core_web_md.load(disable=[None])
-            nlp.max_length = cls.max_length
+            nlp = LanguageModels.get()
 
             sample_doc = nlp(sample_text)
             tested_doc = nlp(tested_text)
 
-            sim_index = sample_doc.similarity(tested_doc)
+            return cls.similarity_result(sim_index=sample_doc.similarity(tested_doc))
+        except Exception as ex:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"{ex}"
+            )
 
-            if sim_index >= cls.confidence_threshold:
-                resp = {
-                    "are_alike": True,
-                    "confidence": sim_index,
-                }
-            else:
-                resp = {
-                    "are_alike": False,
-                    "confidence": sim_index,
-                }
+    @classmethod
+    def similarity_result(cls, sim_index: float) -> dict:
+        return {
+            "are_alike": sim_index >= cls.confidence_threshold,
+            "confidence": sim_index,
+        }
+
+    @classmethod
+    def pipe(cls, texts: Iterable, as_tuples: bool = False, batch_size: int = settings.SPACY_BATCH_SIZE,
+             n_process: int = settings.SPACY_N_PROCESS) -> Generator:
+        """
+        Parse `texts` with the shared model in batches of `batch_size`, spread over `n_process` processes.
+        With `as_tuples`, `texts` are `(text, context)` pairs and `(doc, context)` pairs are yielded.
+        """
+        nlp = LanguageModels.get()
+        yield from nlp.pipe(texts, as_tuples=as_tuples, batch_size=batch_size, n_process=n_process)
+
+    @classmethod
+    def score_similarity(cls, sample_text: str, tested_texts: Iterable[Tuple[str, Any]],
+                         batch_size: int = settings.SPACY_BATCH_SIZE,
+                         n_process: int = settings.SPACY_N_PROCESS) -> Generator[Tuple[dict, Any], None, None]:
+        """
+        Batched `check_if_similiar`: parse `sample_text` once and score every `(text, context)` of `tested_texts` against it.
+        Yields `(result, context)` as the batches come out of `nlp.pipe`, so neither the texts nor the docs are ever all
+        held in memory; `context` (e.g. the source document) is passed through untouched.
+        """
+        try:
+            sample_doc = LanguageModels.get()(sample_text)
 
-            return resp
+            for tested_doc, context in cls.pipe(tested_texts, as_tuples=True, batch_size=batch_size, n_process=n_process):
+                yield cls.similarity_result(sim_index=sample_doc.similarity(tested_doc)), context
         except Exception as ex:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
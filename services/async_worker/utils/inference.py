@@ -0,0 +1,146 @@
+import asyncio
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from multiprocessing import get_context
+from typing import Callable, List
+
+import numpy as np
+
+from config.settings import settings
+from utils.general_utils import LanguageHandlers, LanguageModels
+from utils.post_index import PostEmbeddingIndex
+
+from utils import logger
+
+
+def init_worker() -> None:
+    LanguageModels.warm_up()
+
+
+def is_worker_ready() -> bool:
+    return LanguageModels.is_ready()
+
+
+def embed_texts(texts: List[str]) -> np.ndarray:
+    return PostEmbeddingIndex.embed(texts)
+
+
+def score_texts(sample_text: str, texts: List[str]) -> List[float]:
+    ## A worker is already one of several processes, so it parses its batch by itself.
+    return [
+        is_alike.get("confidence")
+        for is_alike, _ in LanguageHandlers.score_similarity(
+            sample_text=sample_text, tested_texts=((text, None) for text in texts), n_process=1
+        )
+    ]
+
+
+class InferencePool:
+    """
+    Bounded pool of processes running the CPU-bound spaCy work of the API, so that it never blocks the event loop.
+
+    Every process loads and warms the model once, in its initializer; tasks only ship texts in and floats/vectors out.
+    Processes are spawned, not forked: the API process holds MongoDB clients and threads that must not be inherited.
+    With `INFERENCE_PROCESSES=0` the work runs in a thread of the API process instead.
+
+    A timed out task cannot be stopped once a process picked it up, so a slot (one per process) is held from submission
+    until the task itself finishes, not until its caller gives up: abandoned tasks never pile up behind the pool.
+    A pool whose process died is replaced by a new one.
+    """
+    executor: ProcessPoolExecutor = None
+    slots: asyncio.Semaphore = None
+    loop: asyncio.AbstractEventLoop = None
+    ready: bool = False
+
+    @classmethod
+    def start(cls) -> None:
+        if cls.executor or settings.INFERENCE_PROCESSES <= 0:
+            return
+
+        cls.executor = ProcessPoolExecutor(
+            max_workers=settings.INFERENCE_PROCESSES,
+            mp_context=get_context("spawn"),
+            initializer=init_worker
+        )
+        if not cls.slots:
+            cls.slots = asyncio.Semaphore(settings.INFERENCE_PROCESSES)
+            cls.loop = asyncio.get_running_loop()
+
+    @classmethod
+    def shutdown(cls) -> None:
+        if cls.executor:
+            cls.executor.shutdown(wait=False, cancel_futures=True)
+        cls.executor = None
+        cls.ready = False
+
+    @classmethod
+    def restart(cls, broken: ProcessPoolExecutor) -> None:
+        ## Every task that saw the pool break ends up here; only the first one replaces it.
+        if cls.executor is not broken:
+            return
+
+        logger.warn("A process of the inference pool died; starting a new pool.")
+        broken.shutdown(wait=False, cancel_futures=True)
+        cls.executor = None
+        cls.start()
+
+    @classmethod
+    async def warm_up(cls) -> None:
+        """
+        Start every process of the pool (each loads its model) and wait until they are all up.
+        """
+        if not cls.executor:
+            await asyncio.to_thread(LanguageModels.warm_up)
+        else:
+            ## Loading the model is the slow part, so it is not held to the timeout of a task.
+            _ = await asyncio.gather(*[cls.run(is_worker_ready, timeout=None) for _ in range(settings.INFERENCE_PROCESSES)])
+        cls.ready = True
+
+    @classmethod
+    def is_ready(cls) -> bool:
+        return cls.ready
+
+    @classmethod
+    async def run(cls, func: Callable, *args, timeout: float = settings.INFERENCE_TIMEOUT_SECONDS):
+        """
+        Run `func(*args)` in the pool; raises `asyncio.TimeoutError` after `timeout` seconds, waiting for a slot included.
+        """
+        if not cls.executor:
+            return await asyncio.wait_for(asyncio.to_thread(func, *args), timeout=timeout)
+
+        return await asyncio.wait_for(cls.submit(func, *args), timeout=timeout)
+
+    @classmethod
+    async def submit(cls, func: Callable, *args):
+        await cls.slots.acquire()
+
+        loop = asyncio.get_running_loop()
+        executor = cls.executor
+        try:
+            future: Future = executor.submit(partial(func, *args))
+        except BaseException:
+            cls.slots.release()
+            raise
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(cls.slots.release))
+
+        try:
+            ## Shielded: a caller timing out only cancels a task that has not started yet.
+            return await asyncio.shield(asyncio.wrap_future(future))
+        except asyncio.CancelledError:
+            _ = future.cancel()
+            raise
+        except BrokenProcessPool:
+            cls.restart(broken=executor)
+            raise
+
+    @classmethod
+    def embed(cls, texts: List[str]) -> np.ndarray:
+        """
+        Blocking `embed_texts` for code running in another thread than the event loop, e.g. the post index sync thread.
+        The task goes through `run` on the API's loop, so it takes a slot like any other.
+        """
+        if not cls.executor:
+            return embed_texts(texts=texts)
+
+        return asyncio.run_coroutine_threadsafe(cls.run(embed_texts, list(texts)), cls.loop).result()
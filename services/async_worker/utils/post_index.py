@@ -0,0 +1,276 @@
+import json
+from datetime import datetime
+from itertools import islice
+from os import replace
+from pathlib import Path
+from threading import Event, Lock
+from time import monotonic, time
+from typing import Callable, Dict, Iterable, List, Tuple
+from uuid import uuid4
+
+import numpy as np
+
+from config.settings import settings
+from database.collections import UserPostCollections
+from database.methods import SynchronousMethods
+from utils.general_utils import LanguageHandlers, LanguageModels
+
+from utils import logger
+
+
+class PostEmbeddingIndex:
+    """
+    Document vectors of every `userPosts` document, kept as one contiguous, L2-normalized float32 matrix.
+
+    Posts are embedded once: on a full build, then incrementally by `sync()`, which embeds the posts `updated` since the
+    last one. A query is embedded once and scored against every post with a single matrix-vector product, and the top `k`
+    are picked with `argpartition`, so a search costs one parse instead of one per post.
+
+    Snapshots live in `settings.POST_INDEX_DIR` as `vectors-<token>.npy` (memory-mapped on load, so the OS shares the
+    pages between workers) and `ids-<token>.json`, and `current.json` names the latest one; it is swapped with an atomic
+    rename, so a reader never sees half a snapshot. Rows embedded since the snapshot are held in memory until there are
+    `POST_INDEX_COMPACT_ROWS` of them, then merged into a new snapshot.
+    Deleted posts are only dropped by a rebuild; callers read the matched documents back and skip the missing ones.
+    """
+    CURRENT_FILE: str = "current.json"
+    STALE_SNAPSHOT_SECONDS: int = 60 * 60
+    PROJECTION: dict = {"title": 1, "blurb": 1, "updated": 1}
+
+    def __init__(self, directory: Path = settings.POST_INDEX_DIR):
+        self.directory = Path(directory)
+        self._lock = Lock()
+        self._sync_lock = Lock()
+        self._ready = Event()
+        ## Called with a list of texts, returns their normalized vectors; the API swaps in its process pool.
+        self.embedder: Callable[[List[str]], np.ndarray] = self.embed
+        self.synced_at: float = None
+        self.watermark: datetime = None
+        self.reset()
+
+    def __repr__(self):
+        return f"PostEmbeddingIndex({self.directory}, rows={len(self)})"
+
+    def __len__(self):
+        return len(self.ids) + len(self.delta_ids)
+
+    def reset(self) -> None:
+        self.ids: List[str] = []
+        self.vectors: np.ndarray = np.zeros((0, 0), dtype=np.float32)
+        self.alive: np.ndarray = np.zeros(0, dtype=bool)
+        self.positions: Dict[str, int] = {}
+
+        self.delta_ids: List[str] = []
+        self.delta_vectors: List[np.ndarray] = []
+        self.delta_positions: Dict[str, int] = {}
+
+    def is_ready(self) -> bool:
+        return self._ready.is_set()
+
+    @classmethod
+    def post_text(cls, document: dict) -> str:
+        return f"{document.get('title')} {document.get('blurb')}"
+
+    @classmethod
+    def normalize(cls, matrix: np.ndarray) -> np.ndarray:
+        matrix = np.asarray(matrix, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+        #(prithoo): A text with no known word has a zero vector; it stays zero, i.e. similar to nothing.
+        return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+    @classmethod
+    def embed(cls, texts: Iterable[str]) -> np.ndarray:
+        vectors = [doc.vector for doc in LanguageHandlers.pipe(texts)]
+        if not vectors:
+            return np.zeros((0, LanguageModels.get().vocab.vectors_length), dtype=np.float32)
+        return cls.normalize(np.vstack(vectors))
+
+    def snapshot_paths(self, token: str) -> Tuple[Path, Path]:
+        return self.directory / f"vectors-{token}.npy", self.directory / f"ids-{token}.json"
+
+    def load(self) -> bool:
+        """
+        Open the latest snapshot; returns False when there is none.
+        """
+        try:
+            token = json.loads((self.directory / self.CURRENT_FILE).read_text()).get("token")
+            vectors_path, ids_path = self.snapshot_paths(token=token)
+            meta = json.loads(ids_path.read_text())
+            vectors = np.load(vectors_path, mmap_mode="r")
+        except (OSError, ValueError) as ex:
+            logger.warn(f"No usable post index snapshot in '{self.directory}': {ex}")
+            return False
+
+        self.reset()
+        self.ids = meta.get("ids", [])
+        self.vectors = vectors
+        self.alive = np.ones(len(self.ids), dtype=bool)
+        self.positions = {_id: position for position, _id in enumerate(self.ids)}
+        self.watermark = datetime.fromisoformat(meta["watermark"]) if meta.get("watermark") else None
+        return True
+
+    def save(self) -> None:
+        """
+        Merge the in-memory rows into the snapshot, write it and switch `current.json` over to it.
+        """
+        ids = [_id for _id, alive in zip(self.ids, self.alive) if alive] + self.delta_ids
+        if not ids:
+            return
+
+        parts = [np.asarray(self.vectors[self.alive])] if len(self.ids) else []
+        if self.delta_vectors:
+            parts.append(np.vstack(self.delta_vectors))
+        vectors = np.ascontiguousarray(np.vstack(parts), dtype=np.float32)
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        token = uuid4().hex
+        vectors_path, ids_path = self.snapshot_paths(token=token)
+        np.save(vectors_path, vectors)
+        ids_path.write_text(json.dumps({
+            "ids": ids,
+            "watermark": self.watermark.isoformat() if self.watermark else None
+        }))
+
+        current = self.directory / f"{self.CURRENT_FILE}.{token}"
+        current.write_text(json.dumps({"token": token}))
+        replace(current, self.directory / self.CURRENT_FILE)
+
+        _ = self.load()
+        self.prune(keep=token)
+
+    def prune(self, keep: str = None) -> None:
+        """
+        Delete snapshots older than an hour; another worker may still be opening a recent one.
+        """
+        cutoff = time() - self.STALE_SNAPSHOT_SECONDS
+        for path in list(self.directory.glob("vectors-*.npy")) + list(self.directory.glob("ids-*.json")):
+            try:
+                if keep not in path.name and path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except OSError:
+                continue
+
+    def upsert(self, documents: List[dict]) -> None:
+        ## Embedding is the slow part and needs no lock; searches only wait for the rows to be swapped in.
+        vectors = self.embedder([self.post_text(document) for document in documents])
+        with self._lock:
+            for document, vector in zip(documents, vectors):
+                _id = f"{document.get('_id')}"
+                if _id in self.positions:
+                    self.alive[self.positions.pop(_id)] = False
+
+                if _id in self.delta_positions:
+                    self.delta_vectors[self.delta_positions[_id]] = vector
+                else:
+                    self.delta_positions[_id] = len(self.delta_ids)
+                    self.delta_ids.append(_id)
+                    self.delta_vectors.append(vector)
+
+                updated = document.get("updated")
+                if isinstance(updated, datetime) and (not self.watermark or updated > self.watermark):
+                    self.watermark = updated
+
+    def sync(self, force: bool = False) -> int:
+        """
+        Embed the posts written since the last sync, at most once every `POST_INDEX_SYNC_SECONDS` unless forced;
+        returns the number of posts embedded.
+        """
+        if not force and self.synced_at and monotonic() - self.synced_at < settings.POST_INDEX_SYNC_SECONDS:
+            return 0
+
+        with self._sync_lock:
+            if not force and self.synced_at and monotonic() - self.synced_at < settings.POST_INDEX_SYNC_SECONDS:
+                return 0
+
+            if self.synced_at is None:
+                with self._lock:
+                    if not self.load():
+                        self.reset()
+                        self.watermark = None
+
+            ## `$gte`, since MongoDB keeps milliseconds: a post sharing the watermark's millisecond is embedded again
+            ## rather than missed.
+            filter_dict = {"updated": {"$gte": self.watermark}} if self.watermark else {}
+            embedded = 0
+            cursor = SynchronousMethods.all(
+                collection=UserPostCollections.user_posts,
+                filter_dict=filter_dict,
+                projection=self.PROJECTION,
+                batch_size=settings.SPACY_BATCH_SIZE
+            )
+            while batch := list(islice(cursor, settings.SPACY_BATCH_SIZE)):
+                self.upsert(documents=batch)
+                embedded += len(batch)
+
+            if len(self.delta_ids) >= settings.POST_INDEX_COMPACT_ROWS or (embedded and not len(self.ids)):
+                with self._lock:
+                    self.save()
+
+            self.synced_at = monotonic()
+            self._ready.set()
+
+        if embedded:
+            logger.info(f"Embedded {embedded} post(s) into the post index.")
+        return embedded
+
+    def rebuild(self) -> int:
+        """
+        Embed every post from scratch and write a new snapshot; this also drops deleted posts.
+        """
+        with self._sync_lock, self._lock:
+            self.reset()
+            self.watermark = None
+            self.synced_at = monotonic()
+
+        embedded = self.sync(force=True)
+        with self._lock:
+            if self.delta_ids:
+                self.save()
+        return embedded
+
+    def search(self, query_vector: np.ndarray = None, k: int = settings.SIMILAR_POSTS_LIMIT, after: Tuple[float, str] = None,
+               min_score: float = None) -> List[Tuple[str, float]]:
+        """
+        The `k` posts most cosine-similar to `query_vector`, as `(post_id, similarity)` ordered by similarity then id.
+        `after` is the last `(similarity, post_id)` of the previous page; posts scoring under `min_score` are left out.
+        """
+        query = self.normalize(query_vector)
+        if not len(self) or not query.any() or k <= 0:
+            return []
+
+        with self._lock:
+            ids, vectors, alive = self.ids, self.vectors, self.alive
+            delta_ids = list(self.delta_ids)
+            delta_vectors = np.vstack(self.delta_vectors) if self.delta_vectors else None
+
+        def post_id(position: int) -> str:
+            return ids[position] if position < len(ids) else delta_ids[position - len(ids)]
+
+        parts = []
+        if len(ids):
+            scores = vectors @ query
+            scores[~alive] = -np.inf
+            parts.append(scores)
+        if delta_vectors is not None:
+            parts.append(delta_vectors @ query)
+        scores = np.concatenate(parts)
+
+        if min_score is not None:
+            scores[scores < min_score] = -np.inf
+        if after:
+            last_score, last_id = after
+            ties = np.flatnonzero(scores == last_score)
+            scores[scores > last_score] = -np.inf
+            scores[[position for position in ties if post_id(position) <= last_id]] = -np.inf
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        #(prithoo): `argpartition` picks arbitrarily among posts tied with the k-th score; take them all so that
+        #           the id order, which the next cursor relies on, decides.
+        if np.isfinite(scores[top].min()):
+            top = np.union1d(top, np.flatnonzero(scores == scores[top].min()))
+        top = sorted((position for position in top if np.isfinite(scores[position])), key=lambda position: (-scores[position], post_id(position)))
+
+        return [(post_id(position), float(scores[position])) for position in top[:k]]
+
+
+post_index = PostEmbeddingIndex()
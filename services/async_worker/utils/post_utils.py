@@ -1,36 +1,172 @@
+import asyncio
+import heapq
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from typing import AsyncGenerator, List, Tuple
+
 from fastapi import status
+from fastapi.encoders import jsonable_encoder
 
+from config.settings import settings
 from database.collections import UserPostCollections
-from database.methods import SynchronousMethods
-from schema.request_schema import AlikeSearchRequest
-from schema.response_schema import  StoryResponse
+from database.methods import AsynchronousMethods
 from templates.func_response import Resp
 from utils.general_utils import LanguageHandlers
+from utils.inference import InferencePool, embed_texts, score_texts
+from utils.post_index import PostEmbeddingIndex, post_index
+
+
+class SearchCursor:
+    """
+    Opaque cursor over similar-post results: the `(confidence, post_id)` of the last match of a page.
+    """
+
+    @classmethod
+    def encode(cls, confidence: float, post_id: str) -> str:
+        return urlsafe_b64encode(json.dumps([confidence, post_id]).encode("utf8")).decode("ascii")
+
+    @classmethod
+    def decode(cls, cursor: str) -> Tuple[float, str]:
+        try:
+            confidence, post_id = json.loads(urlsafe_b64decode(cursor.encode("ascii")))
+            return float(confidence), f"{post_id}"
+        except Exception as ex:
+            raise ValueError(f"Invalid cursor '{cursor}'.") from ex
+
+    @classmethod
+    def is_after(cls, confidence: float, post_id: str, after: Tuple[float, str] = None) -> bool:
+        if not after:
+            return True
+        return confidence < after[0] or (confidence == after[0] and post_id > after[1])
+
 
 class PostUtils:
-    
+
+    ## Only the fields of `StoryResponse` are read back.
+    STORY_PROJECTION = {"title": 1, "blurb": 1, "author": 1, "tags": 1, "created": 1, "updated": 1}
+
+    @classmethod
+    def to_match(cls, item: dict, confidence: float) -> dict:
+        """
+        A match shaped like `AlikeSearchResponse`; built by hand, since validating every match through pydantic
+        costs more than scoring it.
+        """
+        return jsonable_encoder({
+            'story': item,
+            'confidence': f"{confidence}"
+        })
+
     @classmethod
-    async def search_for_posts_like_phrase(cls, term:str=None)->Resp:
-        records = SynchronousMethods.all(collection=UserPostCollections.user_posts)
-        results = []
+    def invalid_cursor(cls, cursor: str) -> Resp:
         resp = Resp()
+        resp.error = "Invalid Cursor"
+        resp.message = f"'{cursor}' is not a cursor returned by this search."
+        resp.status_code = status.HTTP_400_BAD_REQUEST
+        return resp
 
-        for item in records:
-            text = f"{item.get('title')} {item.get('blurb')}"
-            is_alike = LanguageHandlers.check_if_similiar(sample_text=term, tested_text=text)
+    @classmethod
+    async def match_posts_like_phrase(cls, term:str=None, top_k:int=settings.SIMILAR_POSTS_LIMIT, after:Tuple[float, str]=None)->List[Tuple[str, float]]:
+        """
+        The ids and confidences of the `top_k` posts most similar to `term`, from the post embedding index.
 
-            if is_alike.get('are_alike', False):
-                sim_dict = {
-                    'story': item,
-                    'confidence': is_alike.get('confidence')
-                }
-                results.append(sim_dict)
+        The query is embedded in the inference pool and the index is scored in a thread (NumPy releases the GIL),
+        so the event loop is never blocked.
+        """
+        query_vector = (await InferencePool.run(embed_texts, [term or ""]))[0]
+        return await asyncio.to_thread(post_index.search, query_vector, top_k, after, LanguageHandlers.confidence_threshold)
 
-        results = sorted(
-            results, key=lambda data: data['confidence'], reverse=True)
+    @classmethod
+    async def read_matches(cls, matches:List[Tuple[str, float]])->AsyncGenerator[dict, None]:
+        """
+        Read the documents of `matches` with Motor, a page at a time, and yield them as matches in the same order.
+        Posts deleted since they were indexed are no longer in the collection and are skipped.
+        """
+        for start in range(0, len(matches), settings.MAX_ITEMS_PER_PAGE):
+            chunk = matches[start:start + settings.MAX_ITEMS_PER_PAGE]
+            records = {
+                item.get("_id"): item
+                for item in await AsynchronousMethods.find_many(
+                    filter_dict={"_id": {"$in": [post_id for post_id, _ in chunk]}},
+                    collection=UserPostCollections.user_posts,
+                    projection=cls.STORY_PROJECTION
+                )
+            }
+            for post_id, confidence in chunk:
+                if post_id in records:
+                    yield cls.to_match(item=records[post_id], confidence=confidence)
+
+    @classmethod
+    async def scan_posts_like_phrase(cls, term:str=None, after:Tuple[float, str]=None)->AsyncGenerator[List[Tuple[float, str, dict]], None]:
+        """
+        Score every post against `term`, for while the post index is still loading; yields the matches of each batch
+        as `(confidence, post_id, document)`. Batches are read with Motor and scored in the inference pool.
+        """
+        async for batch in AsynchronousMethods.batches(collection=UserPostCollections.user_posts, projection=cls.STORY_PROJECTION, batch_size=settings.SPACY_BATCH_SIZE):
+            scores = await InferencePool.run(score_texts, term or "", [PostEmbeddingIndex.post_text(item) for item in batch])
+            yield [
+                (confidence, item.get('_id'), item) for confidence, item in zip(scores, batch)
+                if confidence >= LanguageHandlers.confidence_threshold and SearchCursor.is_after(confidence, item.get('_id'), after)
+            ]
+
+    @classmethod
+    async def search_for_posts_like_phrase(cls, term:str=None, top_k:int=settings.SIMILAR_POSTS_LIMIT, cursor:str=None)->Resp:
+        """
+        The `top_k` posts whose title and blurb are similar to `term`, best first, after `cursor`.
+        `resp.data` holds the `results` and the cursor of the `next` page (None on the last one).
+        """
+        resp = Resp()
+        try:
+            after = SearchCursor.decode(cursor) if cursor else None
+        except ValueError:
+            return cls.invalid_cursor(cursor=cursor)
+
+        if post_index.is_ready():
+            matches = await cls.match_posts_like_phrase(term=term, top_k=top_k, after=after)
+            results = [match async for match in cls.read_matches(matches=matches)]
+        else:
+            best = []
+            async for batch in cls.scan_posts_like_phrase(term=term, after=after):
+                best = heapq.nsmallest(top_k, best + batch, key=lambda match: (-match[0], match[1]))
+            matches = [(post_id, confidence) for confidence, post_id, _ in best]
+            results = [cls.to_match(item=item, confidence=confidence) for confidence, _, item in best]
 
         resp.message = f"Found matches for '{term}'."
-        resp.data = results
+        resp.data = {
+            "results": results,
+            "next": SearchCursor.encode(matches[-1][1], matches[-1][0]) if len(matches) == top_k else None
+        }
+        resp.status_code = status.HTTP_200_OK
+
+        return resp
+
+    @classmethod
+    async def stream_posts_like_phrase(cls, term:str=None, top_k:int=settings.SIMILAR_POSTS_LIMIT, cursor:str=None)->Resp:
+        """
+        Like `search_for_posts_like_phrase`, but `resp.data["results"]` is an async generator of matches, best first.
+
+        The matches are found up front, so the generator only reads their documents. Streaming needs the post index:
+        while it is loading, scoring would have to run while the response is sent, outside of the search's slot and
+        timeout, so the search is refused instead.
+        """
+        resp = Resp()
+        try:
+            after = SearchCursor.decode(cursor) if cursor else None
+        except ValueError:
+            return cls.invalid_cursor(cursor=cursor)
+
+        if not post_index.is_ready():
+            resp.error = "Index Not Ready"
+            resp.message = "Matches cannot be streamed while the post index is loading; retry later or without `stream`."
+            resp.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+            return resp
+
+        matches = await cls.match_posts_like_phrase(term=term, top_k=top_k, after=after)
+
+        resp.message = f"Streaming matches for '{term}'."
+        resp.data = {
+            "results": cls.read_matches(matches=matches),
+            "next": SearchCursor.encode(matches[-1][1], matches[-1][0]) if len(matches) == top_k else None
+        }
         resp.status_code = status.HTTP_200_OK
 
         return resp